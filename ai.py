@@ -1,7 +1,12 @@
 import random
-from functools import lru_cache
+import time
+from collections import Counter, deque
+from typing import TYPE_CHECKING
 
-from . import engine
+from . import cache, engine
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor  # imported on use, it takes longer to import than the rest of ai
 
 def _evaluate_discard(hand: tuple[int, ...], draw_no_flowers: list[int]) -> list[tuple[int, int]]:
     scores = []
@@ -16,14 +21,16 @@ def _evaluate_discard(hand: tuple[int, ...], draw_no_flowers: list[int]) -> list
 
 
 def get_discard(hand: tuple[int, ...], draw_no_flowers: list[int], avoid: tuple[int, ...]) -> list[tuple[int, int]]:
-    type_counter = engine.get_type_counter(hand)
+    tile_info = engine.TILE_INFO
+    type_counter = Counter(tile_info[t].type_value for t in hand)
     scores = []
 
     for score, tile in _evaluate_discard(tuple(hand), draw_no_flowers):
         if tile in avoid:
             continue
-        score += 10 * type_counter[engine.get_tile_type(tile)]  # keep more types if the scores are the same
-        score += abs(5 - engine.get_tile_idx(tile))  # keep tiles closer to middle
+        info = tile_info[tile]
+        score += 10 * type_counter[info.type_value]  # keep more types if the scores are the same
+        score += abs(5 - info.idx)  # keep tiles closer to middle
         scores.append((score, tile))
     if not scores:
         return get_discard(hand, draw_no_flowers, avoid[:-1])
@@ -33,84 +40,147 @@ def get_discard(hand: tuple[int, ...], draw_no_flowers: list[int], avoid: tuple[
 
 
 def _evaluate(hand: tuple[int, ...], draw_no_flowers: list[int]) -> int:
+    score, ready = _evaluate_hand(hand)
+    for ready_score, candidates in ready:
+        if draw_no_flowers:
+            ready_score += _get_distance_score(candidates, draw_no_flowers)
+        score = max(score, ready_score)
+    return score
+
+
+def _get_distance_score(candidates: tuple[int, ...], draw_no_flowers: list[int]) -> int:
+    distance_score = 0
+    for i, t in enumerate(draw_no_flowers):
+        if t in candidates:
+            distance_score += (20 - i) * 2000
+    return distance_score
+
+
+@cache.lru_cache(maxsize=65536, name="ai._evaluate_hand")
+def _evaluate_hand(hand: tuple[int, ...]) -> tuple[int, tuple[tuple[int, tuple[int, ...]], ...]]:
+    """
+    The part of _evaluate() without the upcoming draws.
+    :return: best score of the hands not ready, (score, candidates) of ready hands.
+        _evaluate() is the max of them after adding the distance score of the candidates to the ready ones
+    """
     if len(hand) == 2 and hand[0] == hand[1]:  # goal
-        return 999999
+        return 999999, ()
 
     if len(hand) not in (1, 4, 7, 10, 13, 16):
-        return max(_evaluate_discard(hand, draw_no_flowers))[0]
+        results = [_evaluate_hand(hand[:i] + hand[i + 1:]) for i in range(len(hand)) if i == 0 or hand[i] != hand[i - 1]]
+        return _merge_evaluations(results)
 
     if len(hand) in (1, 4):
         # reduced_hand must be [hand] due to the above logic. Hence, we only check the following if it's possible to goal
         candidates = engine.get_candidates(tuple(hand))
         if candidates:
-            distance_score = 0
-            for i, t in enumerate(draw_no_flowers):
-                if t in candidates:
-                    distance_score += (20 - i) * 2000
             counts = 0
-            tile_counter = engine.get_tile_counter(hand)
+            hand_counts = engine.HandCounts(hand)
             for candidate in candidates:
-                counts += 4 - tile_counter.get(candidate, 0)
-            return 8000 * counts + distance_score
+                counts += 4 - hand_counts.count(candidate)
+            return -999999999, ((8000 * counts, tuple(candidates)),)
+        if hand[0] == hand[-1]:  # ready but dead, the wait is a 5th copy
+            return -999999999, ((0, ()),)
 
-    score = _evaluate_reduced(hand)
+    results = [(_evaluate_reduced(hand), ())]
     for _hand in engine.reduce_hand(hand):
         if hand == _hand:
             continue
-        score = max(score, _evaluate(_hand, draw_no_flowers))
-    return score
+        results.append(_evaluate_hand(_hand))
+    return _merge_evaluations(results)
+
+
+def _merge_evaluations(
+    results: list[tuple[int, tuple[tuple[int, tuple[int, ...]], ...]]]
+) -> tuple[int, tuple[tuple[int, tuple[int, ...]], ...]]:
+    score = max(s for s, _ in results)
+    ready = [r for _, _ready in results for r in _ready]
+    if len(ready) <= 1:
+        return score, tuple(ready)
+
+    best: dict[tuple[int, ...], int] = {}  # only the best score matters for the same candidates
+    for ready_score, candidates in ready:
+        if best.get(candidates, ready_score - 1) < ready_score:
+            best[candidates] = ready_score
+    return score, tuple((s, c) for c, s in best.items())
+
+
+def set_cache_size(maxsize: int):
+    """
+    :param maxsize: max number of hands in the cache of _evaluate(), see cache.resize_cache()
+    """
+    cache.resize_cache("ai._evaluate_hand", maxsize)
+
+
+def clear_cache():
+    """
+    clear the cache of _evaluate(), e.g. between games to bound the memory of long running bots
+    """
+    cache.clear_caches("ai._evaluate_hand", "ai._evaluate_reduced")
 
-@lru_cache(maxsize=8192)
+
+def get_cache_info() -> dict[str, tuple]:
+    """
+    :return: {name: (hits, misses, maxsize, currsize)}
+    """
+    return {
+        "evaluate": _evaluate_hand.cache_info(),
+        "evaluate_reduced": _evaluate_reduced.cache_info(),
+    }
+
+
+@cache.lru_cache(maxsize=8192, name="ai._evaluate_reduced")
 def _evaluate_reduced(hand: tuple[int, ...]) -> int:
-    tile_counter = engine.get_tile_counter(hand)
+    counts = engine.HandCounts(hand).counts
 
     score = 0
     single_count = 0
     single_penalty = 0
-    for tile, count in tile_counter.items():
-        if engine.get_tile_type(tile) in engine.HONOR_TYPES:
-            if count == 1:  # single honor
-                score -= 10000
-            elif count == 3:
-                if engine.get_tile_type(tile) == engine.TileType.DRAGON:
-                    score += 500
-                score += 1000
-
-    for suit in engine.SUIT_TYPE_VALUES:  # alone 1 and 9
-        if tile_counter.get(suit + 1) == 1:
-            if (suit + 2) not in tile_counter:
-                if (suit + 3) not in tile_counter:  # single 1
+    for slot in range(27, engine.NUMBER_SLOTS):  # honors
+        if counts[slot] == 1:  # single honor
+            score -= 10000
+        elif counts[slot] == 3:
+            if slot >= 31:  # dragon
+                score += 500
+            score += 1000
+
+    suits = [b"\0" + counts[base:base + 9] for base in (0, 9, 18)]  # suit[v] is the count of v
+
+    for suit in suits:  # alone 1 and 9
+        if suit[1] == 1:
+            if not suit[2]:
+                if not suit[3]:  # single 1
                     single_penalty += 4000
                     single_count += 1
                 score -= 1000  # 1, 3
-            if (suit + 3) not in tile_counter:
+            if not suit[3]:
                 score -= 300
 
-        if tile_counter.get(suit + 9) == 1:
-            if (suit + 8) not in tile_counter:
-                if (suit + 7) not in tile_counter:  # single 9
+        if suit[9] == 1:
+            if not suit[8]:
+                if not suit[7]:  # single 9
                     single_penalty += 4000
                     single_count += 1
                 score -= 1000  # 7, 9
-            if (suit + 7) not in tile_counter:
+            if not suit[7]:
                 score -= 300
 
-    for suit in engine.SUIT_TYPE_VALUES:  # alone 2 and 8
-        if tile_counter.get(suit + 2) == 1 and (suit + 1) not in tile_counter and (suit + 3) not in tile_counter:
-            if (suit + 4) not in tile_counter:  # single 2
+    for suit in suits:  # alone 2 and 8
+        if suit[2] == 1 and not suit[1] and not suit[3]:
+            if not suit[4]:  # single 2
                 single_penalty += 3500
                 single_count += 1
             score -= 900  # 2, 4
-        if tile_counter.get(suit + 8) == 1 and (suit + 9) not in tile_counter and (suit + 7) not in tile_counter:
-            if (suit + 6) not in tile_counter:  # single 8
+        if suit[8] == 1 and not suit[9] and not suit[7]:
+            if not suit[6]:  # single 8
                 single_penalty += 3500
                 single_count += 1
             score -= 900  # 6, 8
 
-    for suit in engine.SUIT_TYPE_VALUES:  # alone 3, 4, 5, 6, 7
+    for suit in suits:  # alone 3, 4, 5, 6, 7
         for v in (3, 4, 5, 6, 7):
-            if tile_counter.get(suit + v) == 1 and (suit + v + 1) not in tile_counter and (suit + v - 1) not in tile_counter:
-                if (suit + v + 2) not in tile_counter and (suit + v - 2) not in tile_counter:  # single
+            if suit[v] == 1 and not suit[v + 1] and not suit[v - 1]:
+                if not suit[v + 2] and not suit[v - 2]:  # single
                     single_penalty += 3000
                     single_count += 1
                 score -= 600  # 3, 5, 7
@@ -119,7 +189,7 @@ def _evaluate_reduced(hand: tuple[int, ...]) -> int:
         single_penalty //= 2  # we can simply drop this tile
     score -= single_penalty
 
-    if len(hand) < 8 and len(hand) == len(tile_counter):  # no pair
+    if len(hand) < 8 and all(c <= 1 for c in counts):  # no pair
         score -= 2000
 
     score += 3000 * (16 - len(hand))
@@ -135,13 +205,14 @@ def get_action(
         if action in (engine.Action.GOAL, engine.Action.SELF_GOAL):
             return action, target
     for action, target in actions:
-        if engine.get_tile_type(target) == engine.TileType.DRAGON:
+        if engine.TILE_INFO[target].type_value == engine.TileType.DRAGON.value:
             if action == engine.Action.EXTEND_KONG:
                 return action, target
             if action == engine.Action.SELF_KONG:
                 return action, target
             if owner != 3 and action == engine.Action.KONG:
                 return action, target
+    hand_counts = engine.HandCounts(hand)
     scores: list[tuple[int, tuple[engine.Action, int]]] = []
     if owner == 3:
         scores.append((_evaluate(tuple(hand), draw_no_flowers) + 1500, (engine.Action.PASS, 0)))
@@ -151,67 +222,59 @@ def get_action(
     for action, target in actions:
         match action:
             case engine.Action.KONG:
-                _new_hand = hand.copy()
-                _new_hand.remove(target)
-                _new_hand.remove(target)
-                _new_hand.remove(target)
-                _new_hand.append(supply_no_flowers)
-                _new_hand.sort()
-                scores.append((_evaluate(tuple(_new_hand), draw_no_flowers) + 1000 + 750 * (3 - owner), (action, target)))
+                _new_hand = hand_counts.copy()
+                for _ in range(3):
+                    _new_hand.remove(target)
+                _new_hand.add(supply_no_flowers)
+                scores.append((_evaluate(_new_hand.tiles(), draw_no_flowers) + 1000 + 750 * (3 - owner), (action, target)))
 
             case engine.Action.SELF_KONG:
-                _new_hand = hand.copy()
-                _new_hand.remove(target)
-                _new_hand.remove(target)
-                _new_hand.remove(target)
-                _new_hand.remove(target)
-                _new_hand.append(supply_no_flowers)
-                _new_hand.sort()
-                scores.append((_evaluate(tuple(_new_hand), draw_no_flowers) + 3000, (action, target)))
+                _new_hand = hand_counts.copy()
+                for _ in range(4):
+                    _new_hand.remove(target)
+                _new_hand.add(supply_no_flowers)
+                scores.append((_evaluate(_new_hand.tiles(), draw_no_flowers) + 3000, (action, target)))
 
             case engine.Action.EXTEND_KONG:
-                _new_hand = hand.copy()
+                _new_hand = hand_counts.copy()
                 _new_hand.remove(target)
-                _new_hand.append(supply_no_flowers)
-                _new_hand.sort()
-                scores.append((_evaluate(tuple(_new_hand), draw_no_flowers) + 3000, (action, target)))
+                _new_hand.add(supply_no_flowers)
+                scores.append((_evaluate(_new_hand.tiles(), draw_no_flowers) + 3000, (action, target)))
 
             case engine.Action.PONG:
-                _new_hand = hand.copy()
+                _new_hand = hand_counts.copy()
                 _new_hand.remove(target)
                 _new_hand.remove(target)
-                scores.append((_evaluate(tuple(_new_hand), draw_no_flowers) + 750 * (3 - owner), (action, target)))
+                scores.append((_evaluate(_new_hand.tiles(), draw_no_flowers) + 750 * (3 - owner), (action, target)))
 
             case engine.Action.CHOW_LEFT:
-                _new_hand = hand.copy()
+                _new_hand = hand_counts.copy()
                 _new_hand.remove(target + 1)
                 _new_hand.remove(target + 2)
-                scores.append((_evaluate(tuple(_new_hand), draw_no_flowers), (action, target)))
+                scores.append((_evaluate(_new_hand.tiles(), draw_no_flowers), (action, target)))
 
             case engine.Action.CHOW_MIDDLE:
-                _new_hand = hand.copy()
+                _new_hand = hand_counts.copy()
                 _new_hand.remove(target - 1)
                 _new_hand.remove(target + 1)
-                scores.append((_evaluate(tuple(_new_hand), draw_no_flowers), (action, target)))
+                scores.append((_evaluate(_new_hand.tiles(), draw_no_flowers), (action, target)))
 
             case engine.Action.CHOW_RIGHT:
-                _new_hand = hand.copy()
+                _new_hand = hand_counts.copy()
                 _new_hand.remove(target - 2)
                 _new_hand.remove(target - 1)
-                scores.append((_evaluate(tuple(_new_hand), draw_no_flowers), (action, target)))
+                scores.append((_evaluate(_new_hand.tiles(), draw_no_flowers), (action, target)))
 
     scores.sort(reverse=True)
     return max(scores)[1]
 
 
-def _get_no_flower(tiles: list[int], look_ahead: int = 0) -> tuple[list[int], int]:
-    no_flower =  list(filter(lambda _t: engine.get_tile_type(_t) != engine.TileType.FLOWER, tiles))
-    supply = no_flower.pop(-1)
-    return no_flower[:look_ahead], supply
+def _get_no_flower(mj_game: engine.MahjongGame, look_ahead: int = 0) -> tuple[list[int], int]:
+    return mj_game.get_upcoming_tiles(look_ahead), mj_game.get_supply_tile()
 
 
 def get_discard_action(pid, actions, owner, mj_game, look_ahead: int = 0) -> tuple[engine.Action, int]:
-    no_flowers, supply = _get_no_flower(list(mj_game.tiles), look_ahead)
+    no_flowers, supply = _get_no_flower(mj_game, look_ahead)
 
     tiles = mj_game.player_tiles[pid]
 
@@ -220,7 +283,7 @@ def get_discard_action(pid, actions, owner, mj_game, look_ahead: int = 0) -> tup
 
 
 def get_draw_action(pid, actions, mj_game, temperature, avoid: bool = False, look_ahead: int = 0) -> tuple[engine.Action, int]:
-    no_flowers, supply = _get_no_flower(list(mj_game.tiles), look_ahead)
+    no_flowers, supply = _get_no_flower(mj_game, look_ahead)
 
     tiles = mj_game.player_tiles[pid]
     _action = engine.Action.DISCARD
@@ -237,7 +300,7 @@ def get_draw_action(pid, actions, mj_game, temperature, avoid: bool = False, loo
             for i, pt in enumerate(mj_game.player_tiles):
                 if i == pid:
                     continue
-                for _c in engine.get_candidates(tuple(pt.hand)):
+                for _c in sorted(pt.waits):
                     _c_set.add(_c)
             avoid_tiles = tuple(_c_set)
         else:
@@ -250,3 +313,130 @@ def get_draw_action(pid, actions, mj_game, temperature, avoid: bool = False, loo
             scores.sort(reverse=True)
         _target = scores[0][1]
     return _action, _target
+
+
+def _determinize(mj_game: engine.MahjongGame, pid: int, rng: random.Random):
+    """
+    Shuffle what pid cannot see, i.e. the hands of the other players and the wall.
+    Flowers stay where they are in the wall, so hands never get flowers.
+    """
+    hidden = []
+    for i, pt in enumerate(mj_game.player_tiles):
+        if i != pid:
+            hidden += pt.hand
+    wall = list(mj_game.tiles)
+    hidden += [t for t in wall if t not in engine.FLOWER_TILES]
+    rng.shuffle(hidden)
+
+    for i, pt in enumerate(mj_game.player_tiles):
+        if i != pid:
+            size = len(pt.hand)
+            pt.hand = sorted(hidden[-size:])
+            del hidden[-size:]
+    mj_game.tiles = deque(t if t in engine.FLOWER_TILES else hidden.pop() for t in wall)
+
+
+def _rollout(
+    snapshot: engine.GameSnapshot, pid: int, discard: int, seed: int, look_ahead: int = 0, deadline: float | None = None,
+) -> int | None:
+    """
+    Discard from the snapshot, which waits for the CHECK_DRAW_ACTION of pid, and play the game out with
+    get_draw_action() and get_discard_action() of all players.
+    :param deadline: time.time() to give up the game, also in another process
+    :return: points pid gets (or pays if negative), None if given up
+    """
+    mj_game = engine.MahjongGame(snapshot.player_count, {}, headless=True)
+    mj_game.restore(snapshot)
+    _determinize(mj_game, pid, random.Random(seed))
+
+    _pid, state, target, actions = mj_game.get_next_state()
+    assert _pid == pid and state == engine.GameState.CHECK_DRAW_ACTION
+    _pid, state, target, actions = mj_game.perform_action(engine.Action.DISCARD, discard)
+    while state != engine.GameState.END:
+        match state:
+            case engine.GameState.CHECK_DRAW_ACTION:
+                if deadline is not None and time.time() >= deadline:
+                    return None
+                action, _target = get_draw_action(_pid, actions, mj_game, 0, False, look_ahead)
+                _pid, state, target, actions = mj_game.perform_action(action, _target)
+            case engine.GameState.CHECK_DISCARD_ACTION:
+                action, _target = get_discard_action(_pid, actions, target, mj_game, look_ahead)
+                _pid, state, target, actions = mj_game.perform_action(action, _target)
+            case _:
+                _pid, state, target, actions = mj_game.get_next_state()
+
+    banker = _pid
+    winner, losers = target
+    if winner < 0:
+        return 0
+    payments = engine.get_payments(banker, winner, losers, actions)
+    if winner == pid:
+        return sum(payments.values())
+    return -payments.get(pid, 0)
+
+
+def get_draw_action_mc(
+    pid, actions, mj_game, rollouts: int = 16, time_budget: float = 0.5, candidates: int = 4,
+    look_ahead: int = 0, executor: "Executor | None" = None, seed: int | None = None,
+) -> tuple[engine.Action, int]:
+    """
+    Same as get_draw_action(), but the discard is chosen from the best candidates of get_discard() by playing
+    the game out from random guesses of the hidden tiles.
+    :param rollouts: games played per candidate
+    :param time_budget: seconds to stop playing, games not finished by then are given up. 0 for no limit
+    :param candidates: number of discards to compare
+    :param executor: play the games in the executor (e.g. ProcessPoolExecutor) instead of the current process
+    :param seed: seed of the guesses
+    """
+    t0 = time.perf_counter()
+    _action, _target = get_draw_action(pid, actions, mj_game, 0, False, look_ahead)
+    if _action != engine.Action.DISCARD:
+        return _action, _target
+
+    no_flowers, _ = _get_no_flower(mj_game, look_ahead)
+    scores = get_discard(tuple(sorted(mj_game.player_tiles[pid].hand)), no_flowers, tuple())
+    discards = [t for _, t in scores[:candidates]]
+    if len(discards) == 1:
+        return _action, discards[0]
+
+    rng = random.Random(seed)
+    snapshot = mj_game.snapshot()
+    # the same guesses for every candidate, so they are compared on the same games
+    jobs = [(discard, rng.randrange(2 ** 31)) for _ in range(rollouts) for discard in discards]
+    points = {discard: [] for discard in discards}
+
+    def timeout():
+        return time_budget - (time.perf_counter() - t0) if time_budget > 0 else None
+
+    deadline = time.time() + timeout() if time_budget > 0 else None
+    if executor is None:
+        for discard, _seed in jobs:
+            if time_budget > 0 and timeout() <= 0:
+                break
+            result = _rollout(snapshot, pid, discard, _seed, look_ahead, deadline)
+            if result is not None:
+                points[discard].append(result)
+    else:
+        from concurrent.futures import FIRST_COMPLETED, wait
+        futures = {
+            executor.submit(_rollout, snapshot, pid, discard, _seed, look_ahead, deadline): discard
+            for discard, _seed in jobs
+        }
+        not_done = set(futures)
+        while not_done:
+            remaining = timeout()
+            if remaining is not None and remaining <= 0:
+                break
+            done, not_done = wait(not_done, remaining, FIRST_COMPLETED)
+            for future in done:
+                if future.result() is not None:
+                    points[futures[future]].append(future.result())
+        for future in not_done:  # the running ones stop by the deadline
+            future.cancel()
+
+    # only compare the rounds every candidate has finished, ties are broken by the order of get_discard()
+    played = min(len(p) for p in points.values())
+    if not played:
+        return _action, discards[0]
+    best = max(discards, key=lambda d: (sum(points[d][:played]), -discards.index(d)))
+    return _action, best
@@ -0,0 +1,138 @@
+"""
+Score many hands at once with numpy, e.g. for offline analysis of recorded games.
+Hands are given as an (N, 34) count matrix in the slot order of engine.SLOT_TILES, so they have no flowers.
+"""
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+
+from . import engine
+
+_POW5 = np.array(engine._POW5, dtype=np.int64)
+_GROUP_SIZES = (9, 9, 9, 7)
+
+# score of an alone 3, 4, 5, 6, 7. see _evaluate_reduced()
+_MIDDLE_SCORES = np.array([-600 + 200 * abs(5 - v) for v in (3, 4, 5, 6, 7)], dtype=np.int64)
+
+
+def hands_to_counts(hands: Iterable[Iterable[int]]) -> np.ndarray:
+    """
+    :return: (N, 34) uint8 counts of the hands. flowers are ignored
+    """
+    data = b"".join(bytes(engine.HandCounts(hand).counts) for hand in hands)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, engine.NUMBER_SLOTS)
+
+
+def evaluate_reduced(counts: np.ndarray) -> np.ndarray:
+    """
+    Same as ai._evaluate_reduced() for every row.
+    :param counts: (N, 34) counts
+    :return: (N,) int64 scores
+    """
+    counts = np.asarray(counts, dtype=np.int64).reshape(-1, engine.NUMBER_SLOTS)
+    n = counts.shape[0]
+    size = counts.sum(axis=1)
+    score = np.zeros(n, dtype=np.int64)
+
+    honors = counts[:, 27:]
+    score -= 10000 * (honors == 1).sum(axis=1)  # single honor
+    score += 1000 * (honors == 3).sum(axis=1)
+    score += 500 * (honors[:, 4:] == 3).sum(axis=1)  # dragon
+
+    # suits[:, s, v] is the count of v in suit s, suits[:, :, 0] is always 0
+    suits = np.zeros((n, 3, 10), dtype=np.int64)
+    suits[:, :, 1:] = counts[:, :27].reshape(n, 3, 9)
+
+    single_count = np.zeros(n, dtype=np.int64)
+    single_penalty = np.zeros(n, dtype=np.int64)
+
+    for v, near, far in ((1, 2, 3), (9, 8, 7)):  # alone 1 and 9
+        alone = suits[:, :, v] == 1
+        no_near = alone & (suits[:, :, near] == 0)  # 1, 3 or 7, 9
+        single = no_near & (suits[:, :, far] == 0)
+        single_penalty += 4000 * single.sum(axis=1)
+        single_count += single.sum(axis=1)
+        score -= 1000 * no_near.sum(axis=1)
+        score -= 300 * (alone & (suits[:, :, far] == 0)).sum(axis=1)
+
+    for v, outer, inner, far in ((2, 1, 3, 4), (8, 9, 7, 6)):  # alone 2 and 8
+        alone = (suits[:, :, v] == 1) & (suits[:, :, outer] == 0) & (suits[:, :, inner] == 0)
+        single = alone & (suits[:, :, far] == 0)
+        single_penalty += 3500 * single.sum(axis=1)
+        single_count += single.sum(axis=1)
+        score -= 900 * alone.sum(axis=1)
+
+    # alone 3, 4, 5, 6, 7
+    alone = (suits[:, :, 3:8] == 1) & (suits[:, :, 4:9] == 0) & (suits[:, :, 2:7] == 0)
+    single = alone & (suits[:, :, 5:10] == 0) & (suits[:, :, 1:6] == 0)
+    single_penalty += 3000 * single.sum(axis=(1, 2))
+    single_count += single.sum(axis=(1, 2))
+    score += (alone * _MIDDLE_SCORES).sum(axis=(1, 2))
+
+    single_penalty = np.where(single_count == 1, single_penalty // 2, single_penalty)  # we can simply drop this tile
+    score -= single_penalty
+
+    score -= 2000 * ((size < 8) & (counts <= 1).all(axis=1))  # no pair
+    score += 3000 * (16 - size)
+    return score
+
+
+@lru_cache(maxsize=None)
+def _get_group_codes() -> tuple[np.ndarray, ...]:
+    """
+    :return: for each group, code[key] is 1 for melds, 2 for melds + 1 pair, 0 otherwise
+    """
+    codes = []
+    for size, (melds, melds_pair) in zip(_GROUP_SIZES, engine._GROUP_TABLES):
+        code = np.zeros(5 ** size, dtype=np.int8)
+        code[np.fromiter(melds, dtype=np.int64, count=len(melds))] = 1
+        code[np.fromiter(melds_pair, dtype=np.int64, count=len(melds_pair))] = 2
+        codes.append(code)
+    return tuple(codes)
+
+
+def get_win_masks(counts: np.ndarray) -> np.ndarray:
+    """
+    Same as engine.get_candidates() for every row.
+    :param counts: (N, 34) counts
+    :return: (N, 34) bool, True for the slots of the winning tiles
+    """
+    counts = np.asarray(counts, dtype=np.int64).reshape(-1, engine.NUMBER_SLOTS)
+    n = counts.shape[0]
+    group_codes = _get_group_codes()
+    # a count over 4 can't be encoded, such hands never win
+    valid = (counts <= 4).all(axis=1) & (counts.sum(axis=1) % 3 == 1)
+    clipped = np.minimum(counts, 4)
+
+    keys = np.empty((n, 4), dtype=np.int64)
+    codes = np.empty((n, 4), dtype=np.int8)
+    for g, size in enumerate(_GROUP_SIZES):
+        keys[:, g] = clipped[:, 9 * g:9 * g + size] @ _POW5[:size]
+        codes[:, g] = group_codes[g][keys[:, g]]
+
+    masks = np.zeros((n, engine.NUMBER_SLOTS), dtype=bool)
+    for slot in range(engine.NUMBER_SLOTS):
+        g, digit = divmod(slot, 9)
+        can_add = valid & (counts[:, slot] < 4)
+        new_code = group_codes[g][np.where(can_add, keys[:, g] + _POW5[digit], 0)]
+        others = np.delete(codes, g, axis=1)
+        pairs = (new_code == 2).astype(np.int64) + (others == 2).sum(axis=1)
+        masks[:, slot] = can_add & (new_code > 0) & (others > 0).all(axis=1) & (pairs == 1)
+    return masks
+
+
+def evaluate_hands(counts: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :param counts: (N, 34) counts
+    :return: scores of evaluate_reduced(), ready flags, masks of get_win_masks()
+    """
+    masks = get_win_masks(counts)
+    return evaluate_reduced(counts), masks.any(axis=1), masks
+
+
+def masks_to_tiles(masks: np.ndarray) -> list[list[int]]:
+    """
+    :return: winning tiles of each row, the same as engine.get_candidates()
+    """
+    return [[engine.SLOT_TILES[slot] for slot in np.flatnonzero(row)] for row in masks]
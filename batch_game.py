@@ -0,0 +1,133 @@
+"""
+Many games stepped in lock-step for reinforcement learning, with numpy arrays at the interface.
+
+    games = BatchMahjongGame(256, seed=612116)
+    games.reset()
+    while training:
+        masks = games.legal_actions()  # (B, engine.ACTION_SPACE_SIZE)
+        rewards, dones = games.step(policy(masks))
+
+Every game is a headless engine.MahjongGame, so the rules are the same as a normal game.
+Throughput is bound by the state machine of every game, not by the masks: about 17k steps/s with a random policy
+on one core, 25k with the wait index file (see engine.load_wait_index()). Run more processes for more.
+"""
+import numpy as np
+
+from . import engine, observation
+
+
+class BatchMahjongGame:
+    def __init__(self, batch_size: int, seed: int = 0, player_count: int = 4):
+        """
+        :param seed: game i uses seed + i, random if 0
+        """
+        self.batch_size = batch_size
+        self.player_count = player_count
+        self.games = [
+            engine.MahjongGame(player_count, {}, seed + i if seed else 0, headless=True) for i in range(batch_size)
+        ]
+        self.states: list[tuple[int, engine.GameState, object, list]] = [None] * batch_size
+
+        self.pids = np.zeros(batch_size, dtype=np.int64)  # player to decide
+        self.decisions = np.zeros(batch_size, dtype=np.int64)  # CHECK_DRAW_ACTION or CHECK_DISCARD_ACTION
+        # the masks are written by PlayerTiles.get_*_action_mask() into rows of one buffer, seen by numpy as bools
+        size = engine.ACTION_SPACE_SIZE
+        self._mask_buffer = bytearray(batch_size * size)
+        self._masks = np.frombuffer(self._mask_buffer, dtype=bool).reshape(batch_size, size)
+        self._mask_rows = [memoryview(self._mask_buffer)[i * size:(i + 1) * size] for i in range(batch_size)]
+        self._targets = [0] * batch_size  # see engine.index_to_action()
+
+    def reset(self):
+        """
+        start a new game on every table
+        """
+        for i in range(self.batch_size):
+            self._new_game(i)
+
+    def _new_game(self, i: int):
+        mj_game = self.games[i]
+        mj_game.new_game()
+        self._set_state(i, mj_game.get_next_state())
+
+    def _set_state(self, i: int, state: tuple):
+        pid, game_state, target, actions = state
+        assert game_state in (engine.GameState.CHECK_DRAW_ACTION, engine.GameState.CHECK_DISCARD_ACTION)
+        self.states[i] = state
+        self.pids[i] = pid
+        self.decisions[i] = game_state
+
+        mj_game = self.games[i]
+        pt = mj_game.player_tiles[pid]
+        row = self._mask_rows[i]
+        if game_state == engine.GameState.CHECK_DRAW_ACTION:  # any tile in hand can be discarded
+            pt.get_draw_action_mask(mj_game._can_goal[pid], mj_game._can_kong, row)
+            self._targets[i] = pt.recent_tile
+        else:
+            # the actions of a player can be split by priority between opponents, so only those offered are legal
+            row[:] = bytes(engine.ACTION_SPACE_SIZE)
+            for action, tile in actions:
+                row[engine.action_to_index(action, tile)] = 1
+            self._targets[i] = actions[0][1]
+
+    def legal_actions(self) -> np.ndarray:
+        """
+        :return: (B, ACTION_SPACE_SIZE) bool, legal actions of the player to decide on each table. don't modify it
+        """
+        return self._masks
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Perform one action on every table. A table whose game ends starts the next game, with the banker moved on.
+        :param actions: (B,) action indexes, see engine.action_to_index()
+        :return: (B, player_count) points won (negative if paid) by each player, (B,) whether the game ended
+        :raise ValueError: an action is not legal
+        """
+        actions = np.asarray(actions).reshape(self.batch_size)
+        if not self._masks[np.arange(self.batch_size), actions].all():
+            raise ValueError("illegal actions")
+
+        rewards = np.zeros((self.batch_size, self.player_count), dtype=np.int64)
+        dones = np.zeros(self.batch_size, dtype=bool)
+        for i, index in enumerate(actions.tolist()):
+            mj_game = self.games[i]
+            state = mj_game.perform_action(*engine.index_to_action(index, self._targets[i]))
+            if state[1] == engine.GameState.END:
+                banker, _, (winner, losers), game_result = state
+                if winner >= 0:
+                    for loser, paid in engine.get_payments(banker, winner, losers, game_result).items():
+                        rewards[i, loser] -= paid
+                        rewards[i, winner] += paid
+                dones[i] = True
+                self._new_game(i)
+            else:
+                self._set_state(i, state)
+        return rewards, dones
+
+    def get_hand_counts(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        :param out: (B, player_count, 34) uint8 array to write into
+        :return: concealed tiles of every player in slot counts
+        """
+        if out is None:
+            out = np.empty((self.batch_size, self.player_count, engine.NUMBER_SLOTS), dtype=np.uint8)
+        for i, mj_game in enumerate(self.games):
+            for pid, pt in enumerate(mj_game.player_tiles):
+                out[i, pid] = np.frombuffer(pt.counts.counts, dtype=np.uint8)
+        return out
+
+    def get_observations(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        :param out: (B, *observation.get_observation_shape()) array to write into, float32 if not given
+        :return: observation of the player to decide on each table
+        """
+        if out is None:
+            out = np.empty((self.batch_size, *observation.get_observation_shape(self.player_count)), dtype=np.float32)
+        for i, mj_game in enumerate(self.games):
+            observation.encode_observation(mj_game, self.states[i][0], out[i])
+        return out
+
+    def get_wall_sizes(self) -> np.ndarray:
+        """
+        :return: (B,) number of tiles left in the wall
+        """
+        return np.fromiter((len(mj_game.tiles) for mj_game in self.games), dtype=np.int64, count=self.batch_size)
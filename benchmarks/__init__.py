@@ -0,0 +1,6 @@
+"""
+Benchmarks of the engine and the AI.
+
+python -m mahjong16tw_core.benchmarks --json result.json
+python -m mahjong16tw_core.benchmarks --compare result.json
+"""
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable
+
+from . import corpus
+from .. import ai, cache, engine, simulate
+
+
+# each benchmark takes a scale and returns (work, number of operations). work() runs all operations once
+
+def bench_reduce_hand(scale: int) -> tuple[Callable, int]:
+    hands = corpus.get_hands(16, 200 * scale) + corpus.get_hands(17, 200 * scale)
+
+    def work():
+        for hand in hands:
+            engine.reduce_hand(hand)
+    return work, len(hands)
+
+
+def bench_get_candidates(scale: int) -> tuple[Callable, int]:
+    hands = corpus.get_hands(16, 400 * scale)
+
+    def work():
+        for hand in hands:
+            engine.get_candidates(hand)
+    return work, len(hands)
+
+
+def bench_get_discard_actions(scale: int) -> tuple[Callable, int]:
+    player_tiles = corpus.get_player_tiles(100 * scale)
+    for pt in player_tiles:
+        pt._remove_hand(pt.recent_tile)  # 16 tiles waiting for a discard of other players
+    targets = engine.SLOT_TILES
+
+    def work():
+        for pt in player_tiles:
+            for target in targets:
+                pt.get_discard_actions(target, 1, True)
+    return work, len(player_tiles) * len(targets)
+
+
+def bench_get_draw_actions(scale: int) -> tuple[Callable, int]:
+    player_tiles = corpus.get_player_tiles(400 * scale)
+
+    def work():
+        for pt in player_tiles:
+            pt.get_draw_actions(True, True)
+    return work, len(player_tiles)
+
+
+def bench_game_result(scale: int) -> tuple[Callable, int]:
+    games = corpus.get_finished_games(10 * scale)
+
+    def work():
+        for _ in range(20):
+            for mj_game, winner, losers in games:
+                mj_game.game_result(winner, losers)
+    return work, 20 * len(games)
+
+
+def bench_ai_get_discard(scale: int) -> tuple[Callable, int]:
+    hands = corpus.get_hands(17, 20 * scale)
+    draws = corpus.get_hands(8, 1)[0]
+
+    def work():
+        for hand in hands:
+            ai.get_discard(hand, list(draws), tuple())
+    return work, len(hands)
+
+
+def bench_ai_get_action(scale: int) -> tuple[Callable, int]:
+    hands = corpus.get_hands(16, 20 * scale)
+    cases = []
+    for hand in hands:
+        tile = hand[len(hand) // 2]
+        actions = [(engine.Action.PONG, tile)] if hand.count(tile) >= 2 else []
+        if engine.get_tile_type(tile) in engine.SUIT_TYPES and engine.get_tile_idx(tile) >= 3:
+            if tile - 1 in hand and tile - 2 in hand:
+                actions.append((engine.Action.CHOW_RIGHT, tile))
+        cases.append((list(hand), actions))
+
+    def work():
+        for hand, actions in cases:
+            ai.get_action(3, hand, actions, [], engine.SLOT_TILES[0])
+    return work, len(cases)
+
+
+def bench_games(scale: int) -> tuple[Callable, int]:
+    """
+    complete seeded games of 4 AI players, the same games in every run
+    """
+    games = 5 * scale
+
+    def work():
+        mj_game = engine.MahjongGame(4, {}, corpus.SEED, headless=True)
+        for _ in range(games):
+            simulate.play_game(mj_game, temperature=0)
+    return work, games
+
+
+def bench_startup(scale: int) -> tuple[Callable, int]:
+    """
+    new processes which import the AI and check a first hand, as a worker does. Includes the start of python
+    """
+    processes = scale
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(package_dir))
+    code = (
+        f"from {engine.__package__} import ai, engine\n"
+        "engine.HandCounts([201, 201, 202, 203, 204]).is_goal()\n"
+    )
+
+    def work():
+        for _ in range(processes):
+            subprocess.run([sys.executable, "-c", code], env=env, check=True)
+    return work, processes
+
+
+BENCHMARKS: dict[str, Callable[[int], tuple[Callable, int]]] = {
+    "reduce_hand": bench_reduce_hand,
+    "get_candidates": bench_get_candidates,
+    "get_discard_actions": bench_get_discard_actions,
+    "get_draw_actions": bench_get_draw_actions,
+    "game_result": bench_game_result,
+    "ai.get_discard": bench_ai_get_discard,
+    "ai.get_action": bench_ai_get_action,
+    "games": bench_games,
+    "startup": bench_startup,
+}
+
+
+def run(names: list[str] | None = None, repeat: int = 5, scale: int = 1, warm: bool = False) -> dict:
+    """
+    :param names: benchmarks to run, all if None
+    :param repeat: the best and the median of the repeats are reported
+    :param warm: keep the caches between repeats. Caches are cleared before every repeat by default
+    :return: {"python": ..., "platform": ..., "benchmarks": {name: {"ops", "best", "median", "us_per_op"}}}
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        work, ops = BENCHMARKS[name](scale)
+        seconds = []
+        for _ in range(repeat):
+            if not warm:
+                cache.clear_caches()
+            t0 = time.perf_counter()
+            work()
+            seconds.append(time.perf_counter() - t0)
+        results[name] = {
+            "ops": ops,
+            "best": min(seconds),
+            "median": statistics.median(seconds),
+            "us_per_op": min(seconds) / ops * 1e6,
+        }
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "scale": scale,
+        "warm": warm,
+        "benchmarks": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks of the engine and the AI")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run, all by default: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=1, help="multiply the number of operations")
+    parser.add_argument("--warm", action="store_true", help="keep the caches between repeats")
+    parser.add_argument("--json", help="save the result to the file")
+    parser.add_argument("--compare", help="compare with the result saved by --json")
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+    result = run(args.names, args.repeat, args.scale, args.warm)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["benchmarks"]
+
+    for name, r in result["benchmarks"].items():
+        line = f"{name:<20}{r['us_per_op']:>12.2f} us/op{r['best']:>10.3f}s best{r['median']:>10.3f}s median"
+        if name in baseline:
+            line += f"{baseline[name]['us_per_op'] / r['us_per_op']:>8.2f}x"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,64 @@
+"""
+Fixed inputs of the benchmarks. Everything is generated from constant seeds, so every run sees the same hands.
+"""
+import random
+
+from .. import engine, simulate
+
+SEED = 612116
+
+_SUITS = tuple(t for t in engine.SLOT_TILES if engine.get_tile_type(t) in engine.SUIT_TYPES)
+
+
+def get_hands(size: int, count: int, seed: int = SEED, noise: int = 3) -> list[tuple[int, ...]]:
+    """
+    :param size: tiles in each hand
+    :param noise: max number of tiles replaced by random ones. hands are close to ready with a small noise
+    :return: sorted hands with at most 4 copies of each tile and no flowers
+    """
+    rng = random.Random(seed)
+    hands = []
+    while len(hands) < count:
+        hand = [rng.choice(engine.SLOT_TILES)] * 2
+        while len(hand) < size:
+            if rng.random() < 0.3:
+                hand += [rng.choice(engine.SLOT_TILES)] * 3
+            else:
+                t = rng.choice([t for t in _SUITS if engine.get_tile_idx(t) <= 7])
+                hand += [t, t + 1, t + 2]
+        del hand[size:]
+        for _ in range(rng.randint(0, noise)):
+            hand[rng.randrange(size)] = rng.choice(engine.SLOT_TILES)
+        if any(hand.count(t) > 4 for t in hand):
+            continue
+        hands.append(tuple(sorted(hand)))
+    return hands
+
+
+def get_player_tiles(count: int, seed: int = SEED) -> list[engine.PlayerTiles]:
+    """
+    :return: players who just drew the last tile of their hands (17 tiles)
+    """
+    player_tiles = []
+    for hand in get_hands(engine.NUMBER_TILES_IN_HAND + 1, count, seed):
+        pt = engine.PlayerTiles()
+        hand = list(hand)
+        recent_tile = hand.pop(len(hand) // 2)
+        pt.hand = hand
+        pt.append_hand(recent_tile)
+        pt.sort()
+        player_tiles.append(pt)
+    return player_tiles
+
+
+def get_finished_games(count: int, seed: int = SEED) -> list[tuple[engine.MahjongGame, int, tuple[int, ...]]]:
+    """
+    :return: (game, winner, losers) of seeded games played by the AI, skipping draws
+    """
+    mj_game = engine.MahjongGame(4, {}, seed, headless=True)
+    games = []
+    while len(games) < count:
+        winner, losers, _ = simulate.play_game(mj_game, temperature=0)
+        if winner >= 0:
+            games.append((mj_game.clone(), winner, losers))
+    return games
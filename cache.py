@@ -0,0 +1,285 @@
+"""
+Caches of the engine and the AI, registered by name so they can be inspected and sized at runtime.
+
+    cache.get_stats()                 # hit rate, entries and approximate bytes of every cache
+    cache.resize_cache("engine.reduce_hand", 16384)
+    cache.set_memory_budget(64 << 20)  # scale all caches to fit in 64 MiB
+"""
+import marshal
+import os
+import sys
+from collections import OrderedDict, namedtuple
+from functools import update_wrapper
+from itertools import islice
+from typing import Any, Callable, Hashable
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+_MISSING = object()
+
+_ENTRY_OVERHEAD = 100  # bytes of the OrderedDict per entry, roughly
+_DEFAULT_ENTRY_BYTES = 512  # for an empty cache, whose entries can't be measured
+_SAMPLE_SIZE = 64
+
+
+def _sizeof(obj: Any) -> int:
+    """
+    :return: approximate bytes of obj and the containers in it. shared objects are counted every time
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        size += sum(_sizeof(o) for o in obj)
+    elif isinstance(obj, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in obj.items())
+    return size
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used mapping with hit/miss counters. Unlike functools.lru_cache, it can be resized.
+    """
+    def __init__(self, maxsize: int = 4096):
+        """
+        :param maxsize: max number of entries, None for unbounded
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable):
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def resize(self, maxsize: int):
+        """
+        drop the least recently used entries if the cache is larger than maxsize
+        """
+        self.maxsize = maxsize
+        if maxsize is not None:
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def entries(self, limit: int | None = None) -> list[tuple[Hashable, Any]]:
+        """
+        :param limit: only the most recently used entries
+        :return: (key, value) from the least recently used to the most
+        """
+        if limit is None or limit >= len(self._data):
+            return list(self._data.items())
+        entries = list(islice(reversed(self._data.items()), limit))
+        entries.reverse()
+        return entries
+
+    def update(self, entries: list[tuple[Hashable, Any]]):
+        """
+        put the entries, given from the least recently used to the most, see entries()
+        """
+        data = self._data
+        for key, value in entries:
+            data[key] = value
+            data.move_to_end(key)
+        self.resize(self.maxsize)
+
+    def entry_bytes(self) -> int:
+        """
+        :return: approximate bytes per entry, measured on a sample of the most recently used entries
+        """
+        if not self._data:
+            return _DEFAULT_ENTRY_BYTES
+        sample = self.entries(_SAMPLE_SIZE)
+        return _ENTRY_OVERHEAD + sum(_sizeof(k) + _sizeof(v) for k, v in sample) // len(sample)
+
+    def approximate_bytes(self) -> int:
+        return len(self._data) * self.entry_bytes() if self._data else 0
+
+
+_DUMP_MAGIC = b"MJ16CACHE\x01"
+
+_caches: dict[str, LRUCache] = {}
+_default_sizes: dict[str, int] = {}
+_memory_budget: int | None = None
+
+
+def lru_cache(maxsize: int = 4096, name: str | None = None) -> Callable[[Callable], Callable]:
+    """
+    Same as functools.lru_cache for functions of hashable positional arguments, plus cache_resize() and .cache
+    :param name: register the cache under this name, see get_stats()
+    """
+    def decorator(func: Callable) -> Callable:
+        cache = LRUCache(maxsize)
+        data = cache._data
+
+        def wrapper(*args):
+            value = data.get(args, _MISSING)
+            if value is _MISSING:
+                cache.misses += 1
+                value = func(*args)
+                cache.put(args, value)
+            else:
+                cache.hits += 1
+                data.move_to_end(args)
+            return value
+
+        wrapper.cache = cache
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_resize = cache.resize
+        if name is not None:
+            register(name, cache)
+        return update_wrapper(wrapper, func)
+    return decorator
+
+
+def register(name: str, cache: LRUCache):
+    """
+    :raise ValueError: the name is taken
+    """
+    if name in _caches:
+        raise ValueError(f"cache {name} is already registered")
+    _caches[name] = cache
+    _default_sizes[name] = cache.maxsize
+    if _memory_budget is not None:
+        set_memory_budget(_memory_budget)
+
+
+def get_caches() -> dict[str, LRUCache]:
+    return dict(_caches)
+
+
+def get_stats() -> dict[str, dict]:
+    """
+    :return: {name: {"hits", "misses", "hit_rate", "maxsize", "currsize", "bytes"}}, bytes are approximate
+    """
+    stats = {}
+    for name, cache in _caches.items():
+        lookups = cache.hits + cache.misses
+        stats[name] = {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "hit_rate": cache.hits / lookups if lookups else 0.0,
+            "maxsize": cache.maxsize,
+            "currsize": len(cache),
+            "bytes": cache.approximate_bytes(),
+        }
+    return stats
+
+
+def get_total_bytes() -> int:
+    return sum(cache.approximate_bytes() for cache in _caches.values())
+
+
+def resize_cache(name: str, maxsize: int):
+    """
+    Set the size of a cache, kept as its default size: a memory budget scales it from there, see set_memory_budget()
+    :raise KeyError: no such cache
+    """
+    _caches[name].resize(maxsize)
+    _default_sizes[name] = maxsize
+    if _memory_budget is not None:
+        set_memory_budget(_memory_budget)
+
+
+def clear_caches(*names: str):
+    """
+    :param names: all caches if not given
+    :raise KeyError: no such cache
+    """
+    for name in names or _caches:
+        _caches[name].clear()
+
+
+def set_memory_budget(budget: int | None):
+    """
+    Scale the max sizes of all caches by the same factor, so that they fit in the budget when full.
+    Entry sizes are measured on the current entries, so set it again after a warm-up for a better estimate.
+    :param budget: bytes, None to restore the default sizes
+    """
+    global _memory_budget
+    _memory_budget = budget
+    if budget is None:
+        for name, cache in _caches.items():
+            cache.resize(_default_sizes[name])
+        return
+
+    full_bytes = {
+        name: _default_sizes[name] * cache.entry_bytes()
+        for name, cache in _caches.items() if _default_sizes[name] is not None
+    }
+    scale = budget / sum(full_bytes.values()) if full_bytes else 0.0
+    for name in full_bytes:
+        _caches[name].resize(max(1, int(_default_sizes[name] * scale)))
+
+
+def get_memory_budget() -> int | None:
+    return _memory_budget
+
+
+def save_caches(path: str, version: str, names: list[str] | None = None, limit: int | None = None) -> int:
+    """
+    Write the entries of the caches to a file, to warm up other processes with load_caches().
+    Keys and values must be supported by marshal, e.g. tuples, lists, ints, strings.
+    :param version: of the code whose results are cached. load_caches() ignores files of other versions
+    :param names: all caches by default
+    :param limit: max entries of each cache, the most recently used ones
+    :return: number of entries written
+    """
+    data = {name: _caches[name].entries(limit) for name in names or _caches}
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_DUMP_MAGIC + marshal.dumps((version, data)))
+    os.replace(tmp, path)
+    return sum(len(entries) for entries in data.values())
+
+
+def load_caches(path: str, version: str) -> int:
+    """
+    Put the entries saved by save_caches() into the caches of the same names. Unknown caches are skipped.
+    :return: number of entries loaded, 0 if the file is of another version
+    :raise OSError: the file can't be read
+    :raise ValueError: the file is broken
+    """
+    with open(path, "rb") as f:
+        content = f.read()  # much faster than marshal.load(f)
+    if not content.startswith(_DUMP_MAGIC):
+        raise ValueError("not a cache file")
+    try:
+        file_version, data = marshal.loads(content[len(_DUMP_MAGIC):])
+    except (EOFError, TypeError) as e:
+        raise ValueError("broken cache file") from e
+    if file_version != version:
+        return 0
+
+    loaded = 0
+    for name, entries in data.items():
+        cache = _caches.get(name)
+        if cache is None:
+            continue
+        cache.update(entries)
+        loaded += len(entries)
+    return loaded
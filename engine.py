@@ -1,9 +1,18 @@
+import copy
+import hashlib
+import marshal
+import mmap
+import os
 import random
+import sys
+from array import array
 from collections import Counter, deque
 from enum import Enum, IntEnum, auto
-from functools import lru_cache
-from itertools import groupby
-from typing import Deque, Iterable, Any
+from itertools import groupby, islice
+from types import CodeType
+from typing import Deque, Iterable, Any, NamedTuple
+
+from . import cache
 
 
 class TileType(Enum):
@@ -41,6 +50,8 @@ TOTAL_TILES = len(ALL_TILES)  # 144
 NUMBER_TILES_IN_HAND = 16
 RESERVED_TILES = 16
 
+MAX_MELDS = (NUMBER_TILES_IN_HAND + 1) // 3  # 5 melds + 1 pair
+
 
 class Action(IntEnum):
     # the greater value the higher priority
@@ -113,14 +124,707 @@ def get_type_counter(hand: Iterable[int]) -> dict[TileType, int]:
 
 
 def get_tile_type(value: int) -> TileType:
-    return TileType(value // 10 * 10)
+    try:
+        return _TILE_TYPES[value]
+    except KeyError:
+        return TileType(value // 10 * 10)  # ValueError
 
 
 def get_tile_idx(value: int) -> int:
     return value % 10
 
 
-@lru_cache(maxsize=8192)
+class TileInfo(NamedTuple):
+    type: TileType
+    type_value: int  # compare with TileType.value in hot paths, not with the enum
+    idx: int
+
+
+# TileType of every value // 10 * 10, including the values of abstract types, without building an enum per call
+_TILE_TYPES: dict[int, TileType] = {m.value + i: m for m in TileType for i in range(10)}
+
+FLOWER_TILES = frozenset(t for t in VALID_TILES if _TILE_TYPES[t] == TileType.FLOWER)
+HONOR_TILES = frozenset(t for t in VALID_TILES if _TILE_TYPES[t] in HONOR_TYPES)
+SUIT_TILES = frozenset(t for t in VALID_TILES if _TILE_TYPES[t] in SUIT_TYPES)
+
+TILE_INFO: dict[int, TileInfo] = {t: TileInfo(_TILE_TYPES[t], _TILE_TYPES[t].value, get_tile_idx(t)) for t in VALID_TILES}
+
+
+# A hand can also be kept as tile counts over 34 slots: 萬1-9, 筒1-9, 條1-9, 東南西北, 中發白.
+# Each suit (and all honors together) is encoded as a count vector in base 5, digit i is the count of the i-th tile.
+# group 0, 1, 2: 萬筒條, digit 0-8 for 1-9
+# group 3: 東南西北中發白, digit 0-6
+SLOT_TILES = tuple(t for t in VALID_TILES if t not in FLOWER_TILES)
+NUMBER_SLOTS = len(SLOT_TILES)  # 34
+_TILE_SLOT: dict[int, int] = {t: i for i, t in enumerate(SLOT_TILES)}
+_POW5 = tuple(5 ** i for i in range(9))
+
+
+def get_tile_slot(value: int) -> int:
+    return _TILE_SLOT[value]
+
+
+# A fixed action space for policies: one index per (action, tile) a player can choose.
+# discard, self-kong and extend-kong have one index per slot, the others act on the tile of the state
+ACTION_DISCARD = 0
+ACTION_SELF_KONG = NUMBER_SLOTS
+ACTION_EXTEND_KONG = 2 * NUMBER_SLOTS
+_TARGET_ACTIONS = (
+    Action.CHOW_LEFT, Action.CHOW_MIDDLE, Action.CHOW_RIGHT, Action.PONG, Action.KONG,
+    Action.GOAL, Action.SELF_GOAL, Action.PASS,
+)
+_TARGET_ACTION_INDEX = {a: 3 * NUMBER_SLOTS + i for i, a in enumerate(_TARGET_ACTIONS)}
+ACTION_SPACE_SIZE = 3 * NUMBER_SLOTS + len(_TARGET_ACTIONS)  # 110
+
+
+def action_to_index(action: Action, target: int) -> int:
+    match action:
+        case Action.DISCARD:
+            return ACTION_DISCARD + _TILE_SLOT[target]
+        case Action.SELF_KONG:
+            return ACTION_SELF_KONG + _TILE_SLOT[target]
+        case Action.EXTEND_KONG:
+            return ACTION_EXTEND_KONG + _TILE_SLOT[target]
+    return _TARGET_ACTION_INDEX[action]
+
+
+def index_to_action(index: int, target: int) -> tuple[Action, int]:
+    """
+    :param target: tile of the state, i.e. the discarded tile, or the drawn tile for self-goal
+    """
+    if index < ACTION_SELF_KONG:
+        return Action.DISCARD, SLOT_TILES[index]
+    if index < ACTION_EXTEND_KONG:
+        return Action.SELF_KONG, SLOT_TILES[index - ACTION_SELF_KONG]
+    if index < 3 * NUMBER_SLOTS:
+        return Action.EXTEND_KONG, SLOT_TILES[index - ACTION_EXTEND_KONG]
+    return _TARGET_ACTIONS[index - 3 * NUMBER_SLOTS], target
+
+
+# bytes.translate() tables to turn slot counts into mask bits
+_NONZERO_BIT = bytes([0] + [1] * 255)
+_FOUR_BIT = bytes([0, 0, 0, 0, 1] + [0] * 251)
+
+
+def _build_meld_table(size: int, sequences: bool) -> tuple[frozenset[int], frozenset[int]]:
+    """
+    :param size: number of distinct tiles in the group
+    :param sequences: whether sequences are allowed (suits only)
+    :return: keys which can be fully decomposed into melds, keys which can be fully decomposed into melds + 1 pair
+    """
+    shapes = [(i, i, i) for i in range(size)]
+    if sequences:
+        shapes += [(i, i + 1, i + 2) for i in range(size - 2)]
+
+    frontier = {(0,) * size}
+    melds = set(frontier)
+    for _ in range(MAX_MELDS):
+        _next = set()
+        for counts in frontier:
+            for shape in shapes:
+                _counts = list(counts)
+                for i in shape:
+                    _counts[i] += 1
+                if all(_counts[i] <= 4 for i in shape):
+                    _next.add(tuple(_counts))
+        melds |= _next
+        frontier = _next
+
+    melds_pair = set()
+    for counts in melds:
+        for i in range(size):
+            if counts[i] <= 2:
+                _counts = list(counts)
+                _counts[i] += 2
+                melds_pair.add(tuple(_counts))
+
+    def encode(_counts):
+        return sum(c * _POW5[i] for i, c in enumerate(_counts))
+
+    return frozenset(map(encode, melds)), frozenset(map(encode, melds_pair))
+
+
+# Tables which take time to build are built on first use, or loaded from the file of save_tables() if present.
+# Read them with get_table(), or as attributes of the module from outside, e.g. engine._SUIT_TABLE
+_TABLE_BUILDERS = {
+    "_SUIT_TABLE": lambda: _build_meld_table(9, True),
+    "_HONOR_TABLE": lambda: _build_meld_table(7, False),
+}
+TABLES_MAGIC = b"MJ16TABL"
+DEFAULT_TABLES_PATH = os.environ.get(
+    "MAHJONG16TW_TABLES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables.bin")
+)
+_tables: dict[str, Any] = {}
+_tables_file_checked = False
+_group_tables: tuple[tuple[frozenset[int], frozenset[int]], ...] | None = None  # of the 4 groups, for hot paths
+
+
+def get_table(name: str) -> Any:
+    """
+    :raise KeyError: no such table
+    """
+    global _tables_file_checked
+    table = _tables.get(name)
+    if table is None:
+        if not _tables_file_checked:
+            _tables_file_checked = True
+            load_tables()
+        table = _tables.get(name)
+        if table is None:
+            table = _tables[name] = _TABLE_BUILDERS[name]()
+    return table
+
+
+def _get_group_tables() -> tuple[tuple[frozenset[int], frozenset[int]], ...]:
+    global _group_tables
+    if _group_tables is None:
+        suit = get_table("_SUIT_TABLE")
+        _group_tables = (suit, suit, suit, get_table("_HONOR_TABLE"))
+    return _group_tables
+
+
+def __getattr__(name: str) -> Any:
+    if name in _TABLE_BUILDERS:
+        return get_table(name)
+    if name == "_GROUP_TABLES":
+        return _get_group_tables()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_tables_version() -> str:
+    """
+    :return: hash of the code which builds the tables. load_tables() ignores files of other versions
+    """
+    digest = hashlib.sha256(repr(_POW5).encode())
+    codes = [_build_meld_table.__code__] + [builder.__code__ for builder in _TABLE_BUILDERS.values()]
+    while codes:
+        code = codes.pop()
+        digest.update(code.co_code)
+        digest.update(repr(code.co_names).encode())
+        for const in code.co_consts:
+            if isinstance(const, CodeType):
+                codes.append(const)
+            else:
+                digest.update(repr(const).encode())
+    return digest.hexdigest()
+
+
+def save_tables(path: str | None = None):
+    """
+    Build all tables and save them in one file, which load_tables() reads much faster than building them.
+    :param path: DEFAULT_TABLES_PATH by default
+    """
+    data = marshal.dumps((get_tables_version(), {name: get_table(name) for name in _TABLE_BUILDERS}))
+    path = path or DEFAULT_TABLES_PATH
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(TABLES_MAGIC + data)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_tables(path: str | None = None) -> bool:
+    """
+    :param path: DEFAULT_TABLES_PATH by default
+    :return: whether the file is loaded, not if it is of another version. tables not loaded are built on first use
+    """
+    try:
+        with open(path or DEFAULT_TABLES_PATH, "rb") as f:
+            content = f.read()
+        if not content.startswith(TABLES_MAGIC):
+            return False
+        version, tables = marshal.loads(content[len(TABLES_MAGIC):])
+    except (OSError, EOFError, ValueError, TypeError):
+        return False
+    if version != get_tables_version() or set(tables) != set(_TABLE_BUILDERS):
+        return False
+    _tables.update(tables)
+    return True
+
+
+def _is_goal_keys(keys: list[int]) -> bool:
+    has_pair = False
+    for key, (melds, melds_pair) in zip(keys, _group_tables or _get_group_tables()):
+        if key in melds:
+            continue
+        if has_pair or key not in melds_pair:
+            return False
+        has_pair = True
+    return has_pair
+
+
+class WaitIndex:
+    """
+    For every key of every group: whether it is melds or melds + 1 pair, and which tiles added to the group make it
+    melds or melds + 1 pair. The candidates of a hand are then read from 4 entries without any search.
+
+    An entry is (melds tiles << 11) | (melds_pair tiles << 2) | code, where code is 1 for melds, 2 for melds + 1 pair.
+    Bit i of the tiles is digit i of the group.
+
+    The file is the header followed by the entries of the suit group and the honor group, in little-endian uint32.
+    The header holds get_tables_version() of the tables it is built from, a file of other tables is not loaded.
+    """
+    MAGIC = b"MJ16WAIT"
+    VERSION = 2
+    _HEADER = 48
+    _SIZES = (5 ** 9, 5 ** 7)
+
+    def __init__(self, suit: Iterable[int], honor: Iterable[int]):
+        self._groups = (suit, suit, suit, honor)
+
+    @classmethod
+    def _get_header(cls) -> bytes:
+        return cls.MAGIC + cls.VERSION.to_bytes(4, "little") + bytes.fromhex(get_tables_version()) + bytes(4)
+
+    @staticmethod
+    def _build_group(size: int, melds: frozenset[int], melds_pair: frozenset[int]) -> array:
+        entries = array("I", bytes(4 * 5 ** size))
+        for code, keys in ((1, melds), (2, melds_pair)):
+            for key in keys:
+                entries[key] |= code
+                for digit in range(size):
+                    if key // _POW5[digit] % 5:
+                        entries[key - _POW5[digit]] |= 1 << (digit + (11 if code == 1 else 2))
+        return entries
+
+    @classmethod
+    def build(cls) -> "WaitIndex":
+        return cls(cls._build_group(9, *get_table("_SUIT_TABLE")), cls._build_group(7, *get_table("_HONOR_TABLE")))
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self._get_header())
+            for entries in (self._groups[0], self._groups[3]):
+                entries = array("I", entries)
+                if sys.byteorder != "little":
+                    entries.byteswap()
+                f.write(entries.tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> "WaitIndex":
+        """
+        memory-map the file, which is shared by all processes loading it
+        :raise ValueError: the file is not a wait index of this version and these tables
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if (
+            mapped[:cls._HEADER] != cls._get_header()
+            or len(mapped) != cls._HEADER + 4 * sum(cls._SIZES)
+        ):
+            mapped.close()
+            raise ValueError(f"{path} is not a wait index of version {cls.VERSION} and these tables")
+        if sys.byteorder != "little":
+            entries = array("I", mapped[cls._HEADER:])
+            entries.byteswap()
+            mapped.close()
+        else:
+            entries = memoryview(mapped)[cls._HEADER:].cast("I")
+        return cls(entries[:cls._SIZES[0]], entries[cls._SIZES[0]:])
+
+    def candidates(self, keys: list[int]) -> list[int]:
+        """
+        same as HandCounts.candidates() of a hand without flowers
+        """
+        entries = [group[key] for group, key in zip(self._groups, keys)]
+        codes = [e & 3 for e in entries]
+        if codes.count(0) > 1:
+            return []
+
+        candidates = []
+        for group, entry in enumerate(entries):
+            others = codes[:group] + codes[group + 1:]
+            if 0 in others:
+                continue
+            pairs = others.count(2)
+            if pairs == 0:
+                tiles = entry >> 2 & 0x1ff  # the new tile makes melds + 1 pair
+            elif pairs == 1:
+                tiles = entry >> 11 & 0x1ff  # the new tile makes melds
+            else:
+                continue
+            digit = 0
+            while tiles:
+                if tiles & 1:
+                    candidates.append(SLOT_TILES[9 * group + digit])
+                tiles >>= 1
+                digit += 1
+        return candidates
+
+
+_wait_index: WaitIndex | None = None
+DEFAULT_WAIT_INDEX_PATH = os.environ.get(
+    "MAHJONG16TW_WAIT_INDEX", os.path.join(os.path.dirname(os.path.abspath(__file__)), "wait_index.bin")
+)
+
+
+def load_wait_index(path: str | None = None) -> bool:
+    """
+    Use the wait index file for candidates. Without it, candidates are searched from the meld tables.
+    :param path: DEFAULT_WAIT_INDEX_PATH by default
+    :return: whether the file is loaded
+    """
+    global _wait_index
+    try:
+        _wait_index = WaitIndex.load(path or DEFAULT_WAIT_INDEX_PATH)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def unload_wait_index():
+    global _wait_index
+    _wait_index = None
+
+
+load_wait_index()
+
+
+# Shanten is counted on complete hands: the fewest tiles to draw to complete the hand, less the last one.
+# The shapes of a group are the max number of its tiles which k melds and p pairs of the group can use,
+# at index 2 * k + p, for k <= MAX_MELDS and p <= 1. A complete hand has at most 4 copies of a tile,
+# so a wait on a tile whose 4 copies are in hand is never counted.
+_NO_SHAPE = -1
+
+
+def _combine_shapes(shapes1, shapes2) -> tuple[int, ...]:
+    combined = [_NO_SHAPE] * (2 * MAX_MELDS + 2)
+    for i1, used1 in enumerate(shapes1):
+        if used1 == _NO_SHAPE:
+            continue
+        for i2 in range(len(combined) - i1):
+            used2 = shapes2[i2]
+            if used2 == _NO_SHAPE or i1 & i2 & 1:
+                continue
+            if combined[i1 + i2] < used1 + used2:
+                combined[i1 + i2] = used1 + used2
+    return tuple(combined)
+
+
+def _get_shanten_shapes(shapes1, shapes2, melds: int) -> int:
+    """
+    :raise ValueError: more than MAX_MELDS melds
+    """
+    if melds > MAX_MELDS:
+        raise ValueError(f"{melds} melds")
+    used = _NO_SHAPE
+    for i1 in range(2 * melds + 2):
+        used1 = shapes1[i1]
+        used2 = shapes2[2 * melds + 1 - i1]
+        if used1 != _NO_SHAPE and used2 != _NO_SHAPE and used < used1 + used2:
+            used = used1 + used2
+    return 3 * melds + 1 - used
+
+
+_EMPTY_SHAPES = (0,) + (_NO_SHAPE,) * (2 * MAX_MELDS + 1)
+
+
+@cache.lru_cache(maxsize=65536, name="engine._get_group_shapes")
+def _get_group_shapes(key: int, sequences: bool) -> tuple[int, ...]:
+    """
+    :param key: base-5 key of a group
+    :param sequences: whether sequences are allowed (suits only)
+    :return: max tiles of the group used by k melds and p pairs, at index 2 * k + p
+    """
+    shapes = list(_get_tail_shapes(key, 9 if sequences else 7, sequences, 0, 0))
+    # a meld or the pair can always be made of tiles neither in the hand nor in the other melds
+    for i in range(1, len(shapes)):
+        for j in (i - 1, i - 2):
+            if j >= 0 and (j & 1) <= (i & 1) and shapes[i] < shapes[j]:
+                shapes[i] = shapes[j]
+    return tuple(shapes)
+
+
+@cache.lru_cache(maxsize=65536, name="engine._get_tail_shapes")
+def _get_tail_shapes(key: int, size: int, sequences: bool, a: int, b: int) -> tuple[int, ...]:
+    """
+    Shapes of the last tiles of a group, from the first one of key.
+    Melds and pairs without tiles of the hand are left out, see _get_group_shapes()
+    :param size: number of tiles in key
+    :param a: sequences from the previous tile, which need this tile and the next one
+    :param b: sequences from the tile before, which need this tile
+    """
+    if not key and not a and not b:
+        return _EMPTY_SHAPES
+    count = key % 5
+    rest = key // 5
+    max_sequences = 0
+    if sequences and size > 2:
+        max_sequences = max(count, rest % 5, rest // 5 % 5)
+    sets = (0, 1) if count else (0,)
+    shapes = [_NO_SHAPE] * (2 * MAX_MELDS + 2)
+    for c in range(min(max_sequences, 4 - a - b) + 1):
+        tail = _get_tail_shapes(rest, size - 1, sequences, c, a)
+        for pong in sets:
+            for pair in sets:
+                n = a + b + c + 3 * pong + 2 * pair  # copies of this tile in the complete hand
+                if n > 4:
+                    continue
+                used = n if n < count else count
+                shift = 2 * (c + pong) + pair
+                for i in range(len(shapes) - shift):
+                    if tail[i] != _NO_SHAPE and (not pair or not i & 1) and shapes[i + shift] < tail[i] + used:
+                        shapes[i + shift] = tail[i] + used
+    return tuple(shapes)
+
+
+def _get_shanten_keys(keys: list[int], melds: int) -> int:
+    shapes = _combine_shapes(_get_group_shapes(keys[0], True), _get_group_shapes(keys[1], True))
+    shapes = _combine_shapes(shapes, _get_group_shapes(keys[2], True))
+    return _get_shanten_shapes(shapes, _get_group_shapes(keys[3], False), melds)
+
+
+def _get_flower_bit(tile: int) -> int:
+    if not TileType.FLOWER.value <= tile < TileType.FLOWER.value + 8:
+        raise ValueError(f"invalid tile {tile}")
+    return 1 << (tile - TileType.FLOWER.value)
+
+
+class HandCounts:
+    """
+    Tiles of a hand as counts per slot, updated in-place in O(1).
+    Flowers are kept as bits since every flower is unique.
+    """
+    __slots__ = ("counts", "keys", "flowers", "size", "_overflow")
+
+    def __init__(self, tiles: Iterable[int] = ()):
+        self.counts = bytearray(NUMBER_SLOTS)
+        self.keys = [0, 0, 0, 0]  # base-5 key of each group, see _build_meld_table()
+        self.flowers = 0
+        self.size = 0
+        self._overflow = 0  # number of slots with more than 4 tiles, which can only happen in tests
+        for tile in tiles:
+            self.add(tile)
+
+    @classmethod
+    def from_counts(cls, counts: Iterable[int]) -> "HandCounts":
+        """
+        :param counts: count of each slot, see SLOT_TILES
+        """
+        hand_counts = cls()
+        for slot, c in enumerate(counts):
+            for _ in range(c):
+                hand_counts.add(SLOT_TILES[slot])
+        return hand_counts
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, tile: int) -> bool:
+        return self.count(tile) > 0
+
+    def __iter__(self):
+        return iter(self.tiles())
+
+    def __repr__(self):
+        return f"HandCounts({list(self.tiles())})"
+
+    def copy(self) -> "HandCounts":
+        other = HandCounts.__new__(HandCounts)
+        other.counts = self.counts[:]
+        other.keys = self.keys.copy()
+        other.flowers = self.flowers
+        other.size = self.size
+        other._overflow = self._overflow
+        return other
+
+    def count(self, tile: int) -> int:
+        slot = _TILE_SLOT.get(tile)
+        if slot is not None:
+            return self.counts[slot]
+        if TileType.FLOWER.value <= tile < TileType.FLOWER.value + 8:
+            return self.flowers >> (tile - TileType.FLOWER.value) & 1
+        return 0
+
+    def add(self, tile: int):
+        slot = _TILE_SLOT.get(tile)
+        if slot is None:
+            bit = _get_flower_bit(tile)
+            if self.flowers & bit:
+                raise ValueError(f"flower {tile} is already in hand")
+            self.flowers |= bit
+        else:
+            if self.counts[slot] >= 4:
+                self._overflow += 1
+            else:
+                self.keys[slot // 9] += _POW5[slot % 9]
+            self.counts[slot] += 1
+        self.size += 1
+
+    def remove(self, tile: int):
+        slot = _TILE_SLOT.get(tile)
+        if slot is None:
+            bit = _get_flower_bit(tile) if tile else 0
+            if not self.flowers & bit:
+                raise ValueError(f"{tile} is not in hand")
+            self.flowers &= ~bit
+        else:
+            count = self.counts[slot]
+            if not count:
+                raise ValueError(f"{tile} is not in hand")
+            if count > 4:
+                self._overflow -= 1
+            else:
+                self.keys[slot // 9] -= _POW5[slot % 9]
+            self.counts[slot] = count - 1
+        self.size -= 1
+
+    def items(self) -> list[tuple[int, int]]:
+        items = [(TileType.FLOWER.value + i, 1) for i in range(8) if self.flowers >> i & 1]
+        items += [(SLOT_TILES[slot], c) for slot, c in enumerate(self.counts) if c]
+        return items
+
+    def tiles(self) -> tuple[int, ...]:
+        """
+        :return: sorted tiles
+        """
+        tiles = [TileType.FLOWER.value + i for i in range(8) if self.flowers >> i & 1]
+        for slot, c in enumerate(self.counts):
+            if c:
+                tiles += (SLOT_TILES[slot],) * c
+        return tuple(tiles)
+
+    def is_goal(self) -> bool:
+        return not self._overflow and not self.flowers and _is_goal_keys(self.keys)
+
+    def candidates(self) -> list[int]:
+        if self._overflow or self.flowers or self.size % 3 != 1:
+            return []
+        if _wait_index is not None:
+            return _wait_index.candidates(self.keys)
+
+        counts = self.counts
+        all_slots = set()
+        for slot, c in enumerate(counts):
+            if not c:
+                continue
+            all_slots.add(slot)
+            if slot >= 27:  # honors
+                continue
+            if slot % 9 != 0:
+                all_slots.add(slot - 1)
+            if slot % 9 != 8:
+                all_slots.add(slot + 1)
+
+        keys = self.keys.copy()
+        candidates = []
+        for slot in sorted(all_slots):
+            if counts[slot] == 4:  # all 4 tiles are in hand already
+                continue
+            group = slot // 9
+            keys[group] += _POW5[slot % 9]
+            if _is_goal_keys(keys):
+                candidates.append(SLOT_TILES[slot])
+            keys[group] -= _POW5[slot % 9]
+        return candidates
+
+    def shanten(self, melds: int | None = None) -> int:
+        """
+        :param melds: number of melds the hand still needs. len(self) // 3 by default
+        :return: number of tiles away from ready. 0 for ready, -1 for goal
+        """
+        if melds is None:
+            melds = (self.size - bin(self.flowers).count("1")) // 3
+        return _get_shanten_keys(self.keys, melds)
+
+
+def is_goal(hand: Iterable[int]) -> bool:
+    """
+    :param hand: concealed tiles, including the goal tile. the order doesn't matter
+    :return: whether the tiles are 5 melds (less the shown ones) + 1 pair
+    """
+    return HandCounts(hand).is_goal()
+
+
+def get_shanten(hand: Iterable[int], melds: int | None = None) -> int:
+    """
+    :param hand: concealed tiles
+    :param melds: number of melds the hand still needs. len(hand) // 3 by default
+    :return: number of tiles away from ready. 0 for ready, -1 for goal
+    """
+    if not isinstance(hand, HandCounts):
+        hand = HandCounts(hand)
+    return hand.shanten(melds)
+
+
+def _get_effective_slots(hand: HandCounts, visible: bytes, melds: int) -> tuple[list[int], int]:
+    counts = hand.counts
+    keys = hand.keys
+    group_shapes = [_get_group_shapes(key, group < 3) for group, key in enumerate(keys)]
+    other_shapes = []  # combined shapes of the other 3 groups
+    for group in range(4):
+        shapes = (0,) + (_NO_SHAPE,) * (2 * MAX_MELDS + 1)
+        for other in range(4):
+            if other != group:
+                shapes = _combine_shapes(shapes, group_shapes[other])
+        other_shapes.append(shapes)
+    shanten = _get_shanten_shapes(other_shapes[0], group_shapes[0], melds)
+
+    all_slots = set()
+    for slot, c in enumerate(counts):
+        if not c:
+            continue
+        all_slots.add(slot)
+        if slot >= 27:  # honors
+            continue
+        for neighbor in (slot - 2, slot - 1, slot + 1, slot + 2):
+            if neighbor // 9 == slot // 9 and neighbor >= 0:
+                all_slots.add(neighbor)
+
+    slots = []
+    left = 0
+    for slot in sorted(all_slots):
+        if counts[slot] >= 4:
+            continue
+        group = slot // 9
+        shapes = _get_group_shapes(keys[group] + _POW5[slot % 9], group < 3)
+        if _get_shanten_shapes(other_shapes[group], shapes, melds) < shanten:
+            slots.append(slot)
+            left += max(0, 4 - counts[slot] - visible[slot])
+    return slots, left
+
+
+def get_effective_tiles(
+    hand: Iterable[int], visible: HandCounts | None = None, melds: int | None = None
+) -> tuple[list[int], int]:
+    """
+    :param hand: concealed tiles waiting for a tile, i.e. 3n+1 tiles
+    :param visible: tiles which can't be drawn anymore, see MahjongGame.get_visible_tiles()
+    :param melds: number of melds the hand still needs. len(hand) // 3 by default
+    :return: tiles which reduce the shanten, number of those tiles not in hand and not visible
+    """
+    if not isinstance(hand, HandCounts):
+        hand = HandCounts(hand)
+    if melds is None:
+        melds = len(hand) // 3
+    slots, left = _get_effective_slots(hand, visible.counts if visible else bytes(NUMBER_SLOTS), melds)
+    return [SLOT_TILES[slot] for slot in slots], left
+
+
+def get_discard_effective_tiles(
+    hand: Iterable[int], visible: HandCounts | None = None, melds: int | None = None
+) -> dict[int, tuple[list[int], int]]:
+    """
+    :param hand: concealed tiles with 1 tile to discard, i.e. 3n+2 tiles
+    :param visible: tiles which can't be drawn anymore, see MahjongGame.get_visible_tiles()
+    :param melds: number of melds the hand still needs. len(hand) // 3 by default
+    :return: {discard: get_effective_tiles() after the discard}
+    """
+    hand = HandCounts(hand) if not isinstance(hand, HandCounts) else hand.copy()
+    if melds is None:
+        melds = len(hand) // 3
+    visible_counts = visible.counts if visible else bytes(NUMBER_SLOTS)
+
+    effective_tiles = {}
+    for tile, _ in hand.items():
+        if tile not in _TILE_SLOT:  # flower
+            continue
+        hand.remove(tile)
+        slots, left = _get_effective_slots(hand, visible_counts, melds)
+        effective_tiles[tile] = [SLOT_TILES[slot] for slot in slots], left
+        hand.add(tile)
+    return effective_tiles
+
+
+@cache.lru_cache(maxsize=8192, name="engine.reduce_hand")
 def reduce_hand(hand: tuple[int, ...]) -> tuple[tuple[int, ...], ...]:
     if len(hand) < 3:
         return hand,
@@ -132,7 +836,7 @@ def reduce_hand(hand: tuple[int, ...]) -> tuple[tuple[int, ...], ...]:
                 final.add(_h)
 
     for i, tile in enumerate(hand[:-2]):  # sequence
-        if get_tile_type(tile) in SUIT_TYPES and hand[i+1] == tile + 1 and tile + 2 in hand:
+        if tile in SUIT_TILES and hand[i+1] == tile + 1 and tile + 2 in hand:
             _new_hand = list(hand[:i] + hand[i+2:])
             _new_hand.remove(tile + 2)
             for _h in reduce_hand(tuple(_new_hand)):
@@ -143,25 +847,23 @@ def reduce_hand(hand: tuple[int, ...]) -> tuple[tuple[int, ...], ...]:
     return tuple(final)
 
 
-@lru_cache(maxsize=4096)
-def get_candidates(hand: tuple[int, ...]):
-    all_candidates = set()
-    for tile in hand:
-        all_candidates.add(tile)
-        if get_tile_type(tile) in HONOR_TYPES:
-            continue
-        if get_tile_idx(tile) != 1:
-            all_candidates.add(tile - 1)
-        if get_tile_idx(tile) != 9:
-            all_candidates.add(tile + 1)
+@cache.lru_cache(maxsize=4096, name="engine.get_candidates")
+def get_candidates(hand: tuple[int, ...]) -> list[int]:
+    return HandCounts(hand).candidates()
+
 
-    candidates = []
-    for c in all_candidates:
-        for _hand in reduce_hand(tuple(sorted(hand + (c,)))):
-            if len(_hand) == 2 and _hand[0] == _hand[1]:
-                candidates.append(c)
-                break
-    return candidates
+def get_payments(
+    banker: int, winner: int, losers: tuple[int, ...], game_result: tuple[list, list]
+) -> dict[int, int]:
+    """
+    :param banker: banker of the game, which is the pid of the END state
+    :param game_result: see MahjongGame.game_result()
+    :return: {loser: points paid to the winner}. banker points are only paid between the banker and the other side
+    """
+    points, points_banker = game_result
+    base = sum(p for p, _, _ in points)
+    extra = sum(p for p, _, _ in points_banker)
+    return {loser: base + (extra if banker in (winner, loser) else 0) for loser in losers}
 
 
 class GameState(IntEnum):
@@ -178,7 +880,7 @@ class GameState(IntEnum):
     CHECK_DRAW_ACTION = 500  # self-goal, self-kong, extend-kong, flower
     CHECK_DISCARD_ACTION = 600  # goal, kong, pong, chow. This state is not used in the state machine, only for communication
 
-    ACTION_ACCEPTED = 700
+    ACTION_ACCEPTED = 700  # yielded after the action changed the game, e.g. the claimed tile left the discards
     ACTION_PENDING = 701
     END = 800  # game result
 
@@ -189,15 +891,36 @@ class GameState(IntEnum):
 class PlayerTiles:
     def __init__(self):
         # change the following lists in-place to keep reference
-        self.hand: list[int] = []
+        self._hand: list[int] = []
+        self.counts: HandCounts = HandCounts()  # always the same tiles as hand
+        self._waits: frozenset[int] | None = None  # candidates of hand, None until asked after a change of hand
         self.shown_chow: list[int] = []
         self.shown_pong: list[int] = []
         self.shown_kong: list[int] = []
         self.self_kong: list[int] = []
         self.flowers: list[int] = []
         self.discarded: list[int] = []
+        self.discarded_counts: bytearray = bytearray(NUMBER_SLOTS)  # always the same tiles as discarded, per slot
         self.display_tiles: list[int] = []  # from left to right, from the earliest action to latest
         self.recent_tile: int = 0
+        self.exposed: HandCounts = HandCounts()  # discarded and shown tiles, visible to every player
+
+    def copy(self) -> "PlayerTiles":
+        other = PlayerTiles.__new__(PlayerTiles)
+        other._hand = self._hand.copy()
+        other.counts = self.counts.copy()
+        other._waits = self._waits
+        other.shown_chow = self.shown_chow.copy()
+        other.shown_pong = self.shown_pong.copy()
+        other.shown_kong = self.shown_kong.copy()
+        other.self_kong = self.self_kong.copy()
+        other.flowers = self.flowers.copy()
+        other.discarded = self.discarded.copy()
+        other.discarded_counts = self.discarded_counts[:]
+        other.display_tiles = self.display_tiles.copy()
+        other.recent_tile = self.recent_tile
+        other.exposed = self.exposed.copy()
+        return other
 
     def clear(self):
         # do not use clear() because of race condition
@@ -208,11 +931,42 @@ class PlayerTiles:
         self.self_kong = []
         self.flowers = []
         self.discarded = []
+        self.discarded_counts = bytearray(NUMBER_SLOTS)
         self.display_tiles = []
         self.recent_tile = 0
+        self.exposed = HandCounts()
+
+    @property
+    def hand(self) -> list[int]:
+        return self._hand
+
+    @hand.setter
+    def hand(self, tiles: list[int]):
+        self._hand = tiles
+        self.counts = HandCounts(tiles)
+        self._waits = None
+
+    def _add_hand(self, tile: int):
+        self._hand.append(tile)
+        self.counts.add(tile)
+        self._waits = None
+
+    def _remove_hand(self, tile: int):
+        self._hand.remove(tile)
+        self.counts.remove(tile)
+        self._waits = None
+
+    @property
+    def waits(self) -> frozenset[int]:
+        """
+        :return: tiles to goal with, empty if not ready. computed once until the hand changes
+        """
+        if self._waits is None:
+            self._waits = frozenset(self.counts.candidates())
+        return self._waits
 
     def append_hand(self, tile: int):
-        self.hand.append(tile)
+        self._add_hand(tile)
         self.recent_tile = tile
 
     def sort(self):
@@ -221,14 +975,29 @@ class PlayerTiles:
     def check_flowers(self) -> int:
         flower_count = 0
         for t in self.hand:
-            if get_tile_type(t) == TileType.FLOWER:
+            if t in FLOWER_TILES:
                 flower_count += 1
                 self.flowers.append(t)
         if flower_count > 0:
             for t in self.flowers[-flower_count:]:
-                self.hand.remove(t)
+                self._remove_hand(t)
         return flower_count
 
+    @property
+    def melds_needed(self) -> int:
+        return MAX_MELDS - len(self.shown_chow) // 3 - len(self.shown_pong) - len(self.shown_kong) - len(self.self_kong)
+
+    def get_shanten(self) -> int:
+        return self.counts.shanten(self.melds_needed)
+
+    def _show(self, *tiles: int):
+        for t in tiles:
+            self.exposed.add(t)
+
+    def _hide(self, *tiles: int):
+        for t in tiles:
+            self.exposed.remove(t)
+
     @property
     def total_tiles(self) -> int:
         return len(self.hand) + len(self.shown_chow) + 3 * len(self.shown_pong + self.shown_kong + self.self_kong)
@@ -236,9 +1005,11 @@ class PlayerTiles:
     def undo(self, action, target):
         match action:
             case Action.CHOW_LEFT | Action.CHOW_MIDDLE | Action.CHOW_RIGHT | Action.CHOW:
-                self.hand.append(self.shown_chow.pop(-1))
-                assert target == self.shown_chow.pop(-1)
-                self.hand.append(self.shown_chow.pop(-1))
+                self._add_hand(self.shown_chow[-1])
+                self._add_hand(self.shown_chow[-3])
+                self._hide(*self.shown_chow[-3:])
+                assert target == self.shown_chow[-2]
+                del self.shown_chow[-3:]
                 self.display_tiles.pop(-1)
                 self.display_tiles.pop(-1)
                 self.display_tiles.pop(-1)
@@ -246,7 +1017,8 @@ class PlayerTiles:
             case Action.PONG:
                 assert target == self.shown_pong.pop(-1)
                 for _ in range(2):
-                    self.hand.append(target)
+                    self._add_hand(target)
+                self._hide(target, target, target)
                 self.display_tiles.pop(-1)
                 self.display_tiles.pop(-1)
                 self.display_tiles.pop(-1)
@@ -254,7 +1026,8 @@ class PlayerTiles:
             case Action.KONG:
                 assert target == self.shown_kong.pop(-1)
                 for _ in range(3):
-                    self.hand.append(target)
+                    self._add_hand(target)
+                self._hide(target, target, target, target)
                 self.display_tiles.pop(-1)
                 self.display_tiles.pop(-1)
                 self.display_tiles.pop(-1)
@@ -263,7 +1036,8 @@ class PlayerTiles:
             case Action.SELF_KONG:
                 assert target == self.self_kong.pop(-1)
                 for _ in range(4):
-                    self.hand.append(target)
+                    self._add_hand(target)
+                self._hide(target, target, target, target)
                 self.display_tiles.pop(-1)
                 self.display_tiles.pop(-1)
                 self.display_tiles.pop(-1)
@@ -271,34 +1045,44 @@ class PlayerTiles:
                 self.display_tiles.pop(-1)  # space
             case Action.EXTEND_KONG:
                 assert target == self.shown_kong.pop(-1)
-                self.hand.append(target)
+                self._add_hand(target)
+                self._hide(target)
                 self.shown_pong.append(target)
                 self.display_tiles.remove(target)
             case Action.GOAL:
-                assert target == self.hand.pop(-1)
+                assert target == self.hand[-1]
+                self._remove_hand(target)
             case Action.SELF_GOAL | Action.PASS:
                 pass
             case Action.DISCARD:
                 assert target == self.discarded.pop(-1)
-                self.hand.append(target)
+                self.discarded_counts[_TILE_SLOT[target]] -= 1
+                self._add_hand(target)
+                self._hide(target)
             case _:
                 raise NotImplementedError
         self.hand.sort()
 
     def do_discard(self, target) -> bool:
-        if self.total_tiles != NUMBER_TILES_IN_HAND + 1 or target not in self.hand:
+        if self.total_tiles != NUMBER_TILES_IN_HAND + 1 or target not in self.counts:
             return False
-        self.hand.remove(target)
+        self._remove_hand(target)
         self.discarded.append(target)
+        self.discarded_counts[_TILE_SLOT[target]] += 1
+        self._show(target)
         return True
 
     def pop_discard(self):
         # someone else chow/pong/kong/goal
-        self.discarded.pop(-1)
+        tile = self.discarded.pop(-1)
+        self.discarded_counts[_TILE_SLOT[tile]] -= 1
+        self._hide(tile)
 
     def append_discard(self, tile):
         # for undo
         self.discarded.append(tile)
+        self.discarded_counts[_TILE_SLOT[tile]] += 1
+        self._show(tile)
 
     def do_goal(self, target) -> bool:
         if self.total_tiles != NUMBER_TILES_IN_HAND:
@@ -306,16 +1090,17 @@ class PlayerTiles:
         actions = self.get_discard_actions(target, 3, True)
         if (Action.GOAL, target) not in actions:
             return False
-        self.hand.append(target)
+        self._add_hand(target)
         self.recent_tile = target
         return True
 
     def do_self_kong(self, target) -> bool:
-        if self.total_tiles != NUMBER_TILES_IN_HAND + 1 or self.hand.count(target) != 4:
+        if self.total_tiles != NUMBER_TILES_IN_HAND + 1 or self.counts.count(target) != 4:
             return False
         for _ in range(4):
-            self.hand.remove(target)
+            self._remove_hand(target)
         self.self_kong.append(target)
+        self._show(target, target, target, target)  # one tile is shown, so everyone knows where all 4 are
         self.display_tiles.append(0)
         self.display_tiles.append(0)
         self.display_tiles.append(target)
@@ -324,26 +1109,29 @@ class PlayerTiles:
         return True
 
     def do_extend_kong(self, target) -> bool:
-        if self.total_tiles != NUMBER_TILES_IN_HAND + 1 or target not in self.hand or target not in self.shown_pong:
+        if self.total_tiles != NUMBER_TILES_IN_HAND + 1 or target not in self.counts or target not in self.shown_pong:
             return False
-        self.hand.remove(target)
+        self._remove_hand(target)
         self.shown_pong.remove(target)
         self.shown_kong.append(target)
+        self._show(target)
         self.display_tiles.insert(self.display_tiles.index(target), target)
         return True
 
     def pop_extend_kong(self):
         # someone goal to this tile
         target = self.shown_kong.pop(-1)
+        self._hide(target)
         self.shown_pong.append(target)
         self.display_tiles.remove(target)
 
     def do_kong(self, target) -> bool:
-        if self.total_tiles != NUMBER_TILES_IN_HAND or self.hand.count(target) != 3:
+        if self.total_tiles != NUMBER_TILES_IN_HAND or self.counts.count(target) != 3:
             return False
         for _ in range(3):
-            self.hand.remove(target)
+            self._remove_hand(target)
         self.shown_kong.append(target)
+        self._show(target, target, target, target)
         self.display_tiles.append(target)
         self.display_tiles.append(target)
         self.display_tiles.append(target)
@@ -352,11 +1140,12 @@ class PlayerTiles:
         return True
 
     def do_pong(self, target) -> bool:
-        if self.total_tiles != NUMBER_TILES_IN_HAND or self.hand.count(target) < 2:
+        if self.total_tiles != NUMBER_TILES_IN_HAND or self.counts.count(target) < 2:
             return False
         for _ in range(2):
-            self.hand.remove(target)
+            self._remove_hand(target)
         self.shown_pong.append(target)
+        self._show(target, target, target)
         self.display_tiles.append(target)
         self.display_tiles.append(target)
         self.display_tiles.append(target)
@@ -364,13 +1153,14 @@ class PlayerTiles:
         return True
 
     def do_chow_left(self, target) -> bool:
-        if self.total_tiles != NUMBER_TILES_IN_HAND or target + 1 not in self.hand or target + 2 not in self.hand:
+        if self.total_tiles != NUMBER_TILES_IN_HAND or target + 1 not in self.counts or target + 2 not in self.counts:
             return False
-        self.hand.remove(target + 1)
-        self.hand.remove(target + 2)
+        self._remove_hand(target + 1)
+        self._remove_hand(target + 2)
         self.shown_chow.append(target + 1)
         self.shown_chow.append(target)
         self.shown_chow.append(target + 2)
+        self._show(target, target + 1, target + 2)
         self.display_tiles.append(target + 1)
         self.display_tiles.append(target)
         self.display_tiles.append(target + 2)
@@ -378,13 +1168,14 @@ class PlayerTiles:
         return True
 
     def do_chow_middle(self, target) -> bool:
-        if self.total_tiles != NUMBER_TILES_IN_HAND or target -1 not in self.hand or target + 1 not in self.hand:
+        if self.total_tiles != NUMBER_TILES_IN_HAND or target -1 not in self.counts or target + 1 not in self.counts:
             return False
-        self.hand.remove(target - 1)
-        self.hand.remove(target + 1)
+        self._remove_hand(target - 1)
+        self._remove_hand(target + 1)
         self.shown_chow.append(target - 1)
         self.shown_chow.append(target)
         self.shown_chow.append(target + 1)
+        self._show(target - 1, target, target + 1)
         self.display_tiles.append(target - 1)
         self.display_tiles.append(target)
         self.display_tiles.append(target + 1)
@@ -392,13 +1183,14 @@ class PlayerTiles:
         return True
 
     def do_chow_right(self, target) -> bool:
-        if self.total_tiles != NUMBER_TILES_IN_HAND or target - 2 not in self.hand or target - 1 not in self.hand:
+        if self.total_tiles != NUMBER_TILES_IN_HAND or target - 2 not in self.counts or target - 1 not in self.counts:
             return False
-        self.hand.remove(target - 2)
-        self.hand.remove(target - 1)
+        self._remove_hand(target - 2)
+        self._remove_hand(target - 1)
         self.shown_chow.append(target - 2)
         self.shown_chow.append(target)
         self.shown_chow.append(target - 1)
+        self._show(target - 2, target - 1, target)
         self.display_tiles.append(target - 2)
         self.display_tiles.append(target)
         self.display_tiles.append(target - 1)
@@ -407,57 +1199,141 @@ class PlayerTiles:
 
     def get_draw_actions(self, can_goal: bool, can_kong: bool) -> list[tuple[Action, int]]:
         actions: list[tuple[Action, int]] = []
-        tile_counter = get_tile_counter(self.hand)
 
         # SELF GOAL
-        if can_goal:
-            self.hand.remove(self.recent_tile)
-            if self.recent_tile in get_candidates(tuple(self.hand)):
-                actions.append((Action.SELF_GOAL, self.recent_tile))
-            self.hand.append(self.recent_tile)
-            self.sort()
+        if can_goal and self.counts.is_goal():
+            actions.append((Action.SELF_GOAL, self.recent_tile))
 
         # KONG
         if can_kong:
-            for t, c in tile_counter.items():
+            for t, c in self.counts.items():
                 if c == 4:
                     actions.append((Action.SELF_KONG, t))
 
             for tile in self.shown_pong:
-                if tile_counter.get(tile, 0) == 1:
+                if self.counts.count(tile) == 1:
                     actions.append((Action.EXTEND_KONG, tile))
         return actions
 
     def get_discard_actions(self, target: int, owner: int, can_goal: bool) -> list[tuple[Action, int]]:
         actions: list[tuple[Action, int]] = []
 
-        tile_counter = get_tile_counter(self.hand)
-        tile_type = get_tile_type(target)
+        counts = self.counts
 
         # GOAL
-        if can_goal and target in get_candidates(tuple(self.hand)):
+        if can_goal and target in self.waits:
             actions.append((Action.GOAL, target))
 
         # PONG
-        if tile_counter.get(target, 0) >= 2:
+        if counts.count(target) >= 2:
             actions.append((Action.PONG, target))
 
         # KONG
-        if tile_counter.get(target, 0) == 3:
+        if counts.count(target) == 3:
             actions.append((Action.KONG, target))
 
-        if owner == 3 and tile_type in SUIT_TYPES:
-            if tile_counter.get(target + 1, 0) > 0 and tile_counter.get(target + 2, 0):
+        if owner == 3 and target in SUIT_TILES:
+            if counts.count(target + 1) > 0 and counts.count(target + 2):
                 actions.append((Action.CHOW_LEFT, target))
-            if tile_counter.get(target - 1, 0) > 0 and tile_counter.get(target + 1, 0):
+            if counts.count(target - 1) > 0 and counts.count(target + 1):
                 actions.append((Action.CHOW_MIDDLE, target))
-            if tile_counter.get(target - 2, 0) > 0 and tile_counter.get(target - 1, 0):
+            if counts.count(target - 2) > 0 and counts.count(target - 1):
                 actions.append((Action.CHOW_RIGHT, target))
         return actions
 
+    def get_draw_action_mask(self, can_goal: bool, can_kong: bool, out: bytearray | None = None) -> bytearray:
+        """
+        Same as get_draw_actions() plus a discard of every tile in hand, as bits over the action space.
+        :param out: bytearray of ACTION_SPACE_SIZE to write into
+        :return: 1 for legal actions, see action_to_index()
+        """
+        mask = out if out is not None else bytearray(ACTION_SPACE_SIZE)
+        counts = self.counts.counts
+        mask[ACTION_DISCARD:ACTION_SELF_KONG] = counts.translate(_NONZERO_BIT)
+        if can_kong:
+            mask[ACTION_SELF_KONG:ACTION_EXTEND_KONG] = counts.translate(_FOUR_BIT)
+            mask[ACTION_EXTEND_KONG:3 * NUMBER_SLOTS] = bytes(NUMBER_SLOTS)
+            for tile in self.shown_pong:
+                slot = _TILE_SLOT[tile]
+                mask[ACTION_EXTEND_KONG + slot] = counts[slot] == 1
+        else:
+            mask[ACTION_SELF_KONG:3 * NUMBER_SLOTS] = bytes(2 * NUMBER_SLOTS)
+        mask[3 * NUMBER_SLOTS:] = bytes(len(_TARGET_ACTIONS))
+        mask[_TARGET_ACTION_INDEX[Action.SELF_GOAL]] = can_goal and self.counts.is_goal()
+        return mask
+
+    def get_discard_action_mask(
+        self, target: int, owner: int, can_goal: bool, out: bytearray | None = None
+    ) -> bytearray:
+        """
+        Same as get_discard_actions() plus pass, as bits over the action space.
+        :param out: bytearray of ACTION_SPACE_SIZE to write into
+        :return: 1 for legal actions, see action_to_index()
+        """
+        if out is None:
+            mask = bytearray(ACTION_SPACE_SIZE)
+        else:
+            mask = out
+            mask[:] = bytes(ACTION_SPACE_SIZE)
+        mask[_TARGET_ACTION_INDEX[Action.PASS]] = 1
+        slot = _TILE_SLOT.get(target)
+        if slot is None:
+            return mask
+        counts = self.counts.counts
+        c = counts[slot]
+        index = _TARGET_ACTION_INDEX
+        mask[index[Action.GOAL]] = can_goal and target in self.waits
+        mask[index[Action.PONG]] = c >= 2
+        mask[index[Action.KONG]] = c == 3
+        if owner == 3 and slot < 27:  # suits
+            digit = slot % 9
+            mask[index[Action.CHOW_LEFT]] = digit <= 6 and counts[slot + 1] > 0 and counts[slot + 2] > 0
+            mask[index[Action.CHOW_MIDDLE]] = 1 <= digit <= 7 and counts[slot - 1] > 0 and counts[slot + 1] > 0
+            mask[index[Action.CHOW_RIGHT]] = digit >= 2 and counts[slot - 2] > 0 and counts[slot - 1] > 0
+        return mask
+
+
+class GameSnapshot:
+    """
+    Everything MahjongGame needs to continue a game. It can be pickled, unlike the state machine itself.
+    """
+    _ATTRIBUTES = (
+        "round", "banker", "running", "_current_pid",
+        "_state", "_can_kong", "_kong_goal_available", "_init_step", "_resupply", "_pending_source", "_pending_target",
+        "_winner", "_losers", "_settled", "_end_banker", "_preset_tiles", "_preset_dice",
+    )
+
+    def __init__(self, mj_game: "MahjongGame"):
+        self.player_count = mj_game.player_count
+        self.random_state = mj_game.random.getstate()
+        self.dice_result = tuple(mj_game.dice_result)
+        self.tiles = tuple(mj_game.tiles)
+        self.player_tiles = [pt.copy() for pt in mj_game.player_tiles]
+        self.can_goal = tuple(mj_game._can_goal)
+        self.pending = None if mj_game._pending is None else tuple(mj_game._pending)
+        self.game_result = copy.deepcopy(mj_game._game_result)
+        self.values = {k: getattr(mj_game, k) for k in self._ATTRIBUTES}
+
+    def apply(self, mj_game: "MahjongGame"):
+        assert mj_game.player_count == self.player_count
+        mj_game.random.setstate(self.random_state)
+        mj_game.dice_result = list(self.dice_result)
+        mj_game.tiles = deque(self.tiles)
+        mj_game.player_tiles = [pt.copy() for pt in self.player_tiles]
+        mj_game._can_goal = list(self.can_goal)
+        mj_game._pending = None if self.pending is None else list(self.pending)
+        mj_game._game_result = copy.deepcopy(self.game_result)
+        for k, v in self.values.items():
+            setattr(mj_game, k, v)
+
 
 class MahjongGame:
-    def __init__(self, player_count: int, rules, seed: int = 0):
+    def __init__(self, player_count: int, rules, seed: int = 0, recorder=None, headless: bool = False):
+        """
+        :param recorder: receives every state and action, e.g. recorder.GameRecorder
+        :param headless: only stop at CHECK_DRAW_ACTION, CHECK_DISCARD_ACTION and END, for callers without UI.
+            get_next_state() and perform_action() skip START, ROLL_DICE, INIT_*, DRAW, SUPPLY and ACTION_ACCEPTED
+        """
         # seed = 5379031  # player 1 wins
         if seed:
             self.random = random.Random(seed)
@@ -473,19 +1349,67 @@ class MahjongGame:
         self._current_pid: int = 0
         self.dice_result: tuple[int, int, int] = (1, 1, 1)
 
-        self.tiles: Deque[int] = deque()
+        self._tiles: Deque[int] = deque()
+        self._no_flower_tiles: Deque[int] = deque()  # self.tiles without flowers, for the AI to look ahead
         self.player_tiles: list[PlayerTiles] = [PlayerTiles() for _ in range(player_count)]
+        self.recorder = recorder
+        # only yield decisions and END. informational states still go to the recorder
+        self.headless: bool = headless
+
+        # wall and dice of the next game instead of random ones, see new_game()
+        self._preset_tiles: tuple[int, ...] | None = None
+        self._preset_dice: tuple[int, int, int] | None = None
+
+        # progress of the state machine, see snapshot()
+        self._state: GameState = GameState.START
+        self._reset_progress()
 
         self._game = self._state_machine()
 
     def __del__(self):
         self._game.close()
 
+    def _reset_progress(self):
+        self._can_goal: list[bool] = [True] * self.player_count
+        self._can_kong: bool = True
+        self._kong_goal_available: bool = False
+        self._init_step: int = 0  # INIT_DRAW: number of 4-tile draws, INIT_FLOWER_SUPPLY: players checked in the round
+        self._resupply: bool = False  # INIT_FLOWER_SUPPLY: any player got flowers in the round
+
+        # CHECK_DISCARD_ACTION: (action, opponent) still to ask, None before they are collected
+        self._pending: list[tuple[Action, int]] | None = None
+        self._pending_source: Action = Action.DISCARD
+        self._pending_target: int = 0
+
+        self._winner: int = -1
+        self._losers: tuple[int, ...] = tuple()
+        self._game_result: tuple[list, list] = [], []
+        self._settled: bool = False  # banker and running are updated at the END
+        self._end_banker: int = 0
+
+    def _suppress(self, state: tuple[int, GameState, Any, Any]) -> bool:
+        """
+        :return: True if the informational state is not yielded in headless mode
+        """
+        if not self.headless:
+            return False
+        if self.recorder is not None:
+            self.recorder.on_state(self, state)
+        return True
+
     def get_next_state(self) -> tuple[int, GameState, Any, Any]:
-        return next(self._game)
+        state = next(self._game)
+        if self.recorder is not None:
+            self.recorder.on_state(self, state)
+        return state
 
     def perform_action(self, action: Action, target: int) -> tuple[int, GameState, Any, Any]:
-        return self._game.send((action, target))
+        if self.recorder is not None:
+            self.recorder.on_action(self, action, target)
+        state = self._game.send((action, target))
+        if self.recorder is not None:
+            self.recorder.on_state(self, state)
+        return state
 
     def close_game(self):
         self._game.close()
@@ -494,10 +1418,83 @@ class MahjongGame:
     def current_player(self) -> PlayerTiles:
         return self.player_tiles[self._current_pid]
 
-    def new_game(self):
+    @property
+    def tiles(self) -> Deque[int]:
+        """
+        the wall. Draw from the left and supply from the right. Don't modify it in place, assign a new one instead
+        """
+        return self._tiles
+
+    @tiles.setter
+    def tiles(self, tiles: Deque[int]):
+        self._tiles = tiles
+        self._no_flower_tiles = deque(t for t in tiles if t not in FLOWER_TILES)
+
+    def _draw(self) -> int:
+        tile = self._tiles.popleft()
+        if tile not in FLOWER_TILES:
+            self._no_flower_tiles.popleft()
+        return tile
+
+    def _supply(self) -> int:
+        tile = self._tiles.pop()
+        if tile not in FLOWER_TILES:
+            self._no_flower_tiles.pop()
+        return tile
+
+    def get_upcoming_tiles(self, look_ahead: int) -> list[int]:
+        """
+        :return: the next look_ahead tiles to draw, without flowers and the supply tile
+        """
+        return list(islice(self._no_flower_tiles, min(look_ahead, len(self._no_flower_tiles) - 1)))
+
+    def get_supply_tile(self) -> int:
+        """
+        :return: the next tile to supply, without flowers
+        """
+        return self._no_flower_tiles[-1]
+
+    def get_visible_tiles(self) -> HandCounts:
+        """
+        :return: discarded and shown tiles of all players
+        """
+        counts = bytearray(NUMBER_SLOTS)
+        for pt in self.player_tiles:
+            for slot, c in enumerate(pt.exposed.counts):
+                counts[slot] += c
+        return HandCounts.from_counts(counts)
+
+    def new_game(self, tiles: Iterable[int] | None = None, dice: Iterable[int] | None = None):
+        """
+        :param tiles: the wall to use instead of shuffling, e.g. to replay a recorded game
+        :param dice: the dice result to use instead of rolling
+        """
+        self._preset_tiles = None if tiles is None else tuple(tiles)
+        self._preset_dice = None if dice is None else tuple(dice)
+        self._game.close()
+        self._state = GameState.START
+        self._game = self._state_machine()
+
+    def snapshot(self) -> "GameSnapshot":
+        """
+        Copy the game, including the progress of the state machine. The snapshot can be restored many times.
+        """
+        return GameSnapshot(self)
+
+    def restore(self, snapshot: "GameSnapshot"):
+        """
+        Continue from the snapshot. Call get_next_state() afterwards to get the next state,
+        which is the same CHECK_DRAW_ACTION/CHECK_DISCARD_ACTION if the snapshot was taken while waiting for an action.
+        """
         self._game.close()
+        snapshot.apply(self)
         self._game = self._state_machine()
 
+    def clone(self) -> "MahjongGame":
+        mj_game = MahjongGame(self.player_count, self.rules, headless=self.headless)
+        mj_game.restore(self.snapshot())
+        return mj_game
+
     def game_result(
         self,
         winner: int,
@@ -531,12 +1528,14 @@ class MahjongGame:
                     raise NotImplementedError
 
         _hand_without_goal_tile = tiles.hand.copy()
+        _counts_without_goal_tile = tiles.counts.copy()
         try:
             _hand_without_goal_tile.remove(tiles.recent_tile)
+            _counts_without_goal_tile.remove(tiles.recent_tile)
         except ValueError:  # 7 flowers. winner may not have that recent_tile
             return points, points_banker  # not goal yet
 
-        candidates = get_candidates(tuple(_hand_without_goal_tile))
+        candidates = _counts_without_goal_tile.candidates()
         if tiles.recent_tile not in candidates:
             return points, points_banker  # not goal yet
 
@@ -575,15 +1574,15 @@ class MahjongGame:
             if all((TileType.FLOWER.value + f) in tiles.flowers for f in range(4, 8)):
                 points.append((1, _key(PointType.FLOWER_KONG), tuple()))
 
-        tile_counter = get_tile_counter(tiles.hand)
+        counts = tiles.counts
         def has_3(_t):
-            return _t in tiles.shown_pong + tiles.shown_kong + tiles.self_kong or tile_counter.get(_t, 0) >= 3
+            return _t in tiles.shown_pong + tiles.shown_kong + tiles.self_kong or counts.count(_t) >= 3
 
         has_wind = [has_3(w) for w in range(TileType.WIND.value, TileType.WIND.value + 4)]
         if sum(has_wind) == 4:
             points.append((16, _key(PointType.BIG_WIND), tuple()))
         else:
-            if sum(has_wind) == 3 and tile_counter.get(has_wind.index(False) + TileType.WIND.value, 0) == 2:
+            if sum(has_wind) == 3 and counts.count(has_wind.index(False) + TileType.WIND.value) == 2:
                 points.append((8, _key(PointType.SMALL_WIND), tuple()))
 
             if has_3(TileType.WIND.value + self.round):
@@ -595,7 +1594,7 @@ class MahjongGame:
         if sum(has_dragon) == 3:
             points.append((8, _key(PointType.BIG_DRAGON), tuple()))
         else:
-            if sum(has_dragon) == 2 and tile_counter.get(has_dragon.index(False) + TileType.DRAGON.value, 0) == 2:
+            if sum(has_dragon) == 2 and counts.count(has_dragon.index(False) + TileType.DRAGON.value) == 2:
                 points.append((4, _key(PointType.SMALL_DRAGON), tuple()))
             else:
                 for i, h in enumerate(has_dragon):
@@ -621,7 +1620,7 @@ class MahjongGame:
         elif cover_pong == 3:
             points.append((2, _key(PointType.COVER_PONG3), ()))
 
-        _new_pong = int(tile_counter.get(tiles.recent_tile, 0) == 3)
+        _new_pong = int(counts.count(tiles.recent_tile) == 3)
         if cover_pong + len(tiles.shown_pong) + len(tiles.shown_kong) + _new_pong == 5 and sum(has_wind) != 4:
             points.append((4, _key(PointType.ALL_PONG), ()))
 
@@ -633,7 +1632,7 @@ class MahjongGame:
             len(tiles.shown_kong) == 0,
             len(tiles.shown_pong) == 0,
             len(tiles.self_kong) == 0,
-            all(get_tile_type(t) not in HONOR_TYPES for t in tiles.hand),
+            all(t not in HONOR_TILES for t in tiles.hand),
             len(tiles.flowers) == 0,
             len(candidates) > 1,
             len(losers) == 1,
@@ -641,109 +1640,130 @@ class MahjongGame:
             points.append((2, _key(PointType.SEQUENCE), ()))
 
         _all_tiles = tiles.hand + tiles.shown_pong + tiles.shown_chow + tiles.shown_kong + tiles.self_kong
-        if all(get_tile_type(t) in HONOR_TYPES for t in _all_tiles):
+        if all(t in HONOR_TILES for t in _all_tiles):
             points.append((8, _key(PointType.ONLY_HONOR), ()))
         else:
+            _types = {TILE_INFO[t].type_value for t in _all_tiles}
             for suit in SUIT_TYPES:
-                if all(get_tile_type(t) == suit for t in _all_tiles):
+                if _types == {suit.value}:
                     points.append((8, _key(PointType.ONE_SUIT), ()))
                     break
             else:
                 for suit in SUIT_TYPES:
-                    if all(get_tile_type(t) in (suit, TileType.DRAGON, TileType.WIND) for t in _all_tiles):
+                    if _types <= {suit.value, TileType.DRAGON.value, TileType.WIND.value}:
                         points.append((4, _key(PointType.ONE_SUIT_MIX), ()))
                         break
 
         return points, points_banker
 
     def _state_machine(self):
-        state: GameState = GameState.START
-        self._current_pid: int = self.banker
-
-        can_goal = [True, True, True, True]
-        can_kong = True
-        kong_goal_available = False
-
-        winner = -1
-        losers = tuple()
-        game_result = [], []
-
         def next_player():
             self._current_pid = (self._current_pid + 1) % self.player_count
 
-        while state != GameState.END:
-            match state:
+        # every state keeps its progress in self before it yields, so a restored game can continue from self._state.
+        # hence ACTION_ACCEPTED is yielded after the action is done, e.g. for goal and claims do_goal(), pop_discard()
+        # and the move of the turn are done before it
+        while True:
+            match self._state:
                 case GameState.START:
-                    winner = -1
-                    losers = tuple()
-                    game_result = [], []
+                    self._reset_progress()
+                    self._current_pid = self.banker
 
                     for pt in self.player_tiles:
                         pt.clear()
-                    _tiles = list(ALL_TILES)
-
-                    self.random.shuffle(_tiles)
+                    if self._preset_tiles is None:
+                        _tiles = list(ALL_TILES)
+                        self.random.shuffle(_tiles)
+                    else:
+                        _tiles = self._preset_tiles
+                        self._preset_tiles = None
                     self.tiles = deque(_tiles)
                     del _tiles
-                    yield self.banker, state, self.running, None
-                    state += 1
+                    self._state = GameState.ROLL_DICE
+                    info = self.banker, GameState.START, self.running, None
+                    if not self._suppress(info):
+                        yield info
 
                 case GameState.ROLL_DICE:  # dice result doesn't matter in real random. It's for UI only
-                    self.dice_result = [self.random.randint(1, 6), self.random.randint(1, 6), self.random.randint(1, 6)]
-                    yield self.banker, state, self.dice_result, None
-                    state += 1
-
-                case GameState.INIT_DRAW:
-                    for _ in range(4):  # 4 rounds
-                        for _ in range(self.player_count):
-                            for _ in range(4):
-                                self.current_player.append_hand(self.tiles.popleft())
-                            yield self._current_pid, state, self.current_player.hand[-4:], None
-                            self.current_player.sort()
-                            next_player()
-                    state += 1
+                    if self._preset_dice is None:
+                        self.dice_result = [self.random.randint(1, 6), self.random.randint(1, 6), self.random.randint(1, 6)]
+                    else:
+                        self.dice_result = list(self._preset_dice)
+                        self._preset_dice = None
+                    self._state = GameState.INIT_DRAW
+                    info = self.banker, GameState.ROLL_DICE, self.dice_result, None
+                    if not self._suppress(info):
+                        yield info
+
+                case GameState.INIT_DRAW:  # 4 rounds, 4 tiles for each player in each round
+                    pid = self._current_pid
+                    for _ in range(4):
+                        self.current_player.append_hand(self._draw())
+                    new_tiles = self.current_player.hand[-4:]
+                    self.current_player.sort()
+                    next_player()
+                    self._init_step += 1
+                    if self._init_step == 4 * self.player_count:
+                        self._state = GameState.INIT_BANKER_DRAW
+                    info = pid, GameState.INIT_DRAW, new_tiles, None
+                    if not self._suppress(info):
+                        yield info
 
                 case GameState.INIT_BANKER_DRAW:
                     assert self._current_pid == self.banker
-                    new_tile = self.tiles.popleft()
+                    new_tile = self._draw()
                     self.current_player.append_hand(new_tile)
                     for p in self.player_tiles:
                         p.sort()
-                    yield self._current_pid, state, new_tile, None
-                    state += 1
-
-                case GameState.INIT_FLOWER_SUPPLY:
-                    resupply = False
-                    for _ in range(self.player_count):
-                        flower_count = self.current_player.check_flowers()
-                        if flower_count:
-                            resupply = True
-                            for _ in range(flower_count):
-                                self.current_player.append_hand(self.tiles.pop())
-                            new_tiles = self.current_player.hand[-flower_count:]
-                            self.current_player.sort()
-                            yield self._current_pid, state, new_tiles, None
-                        next_player()
-
-                    if not resupply:
-                        state = GameState.CHECK_DRAW_ACTION  # banker already drawn 1 extra tile in the beginning
+                    self._init_step = 0
+                    self._state = GameState.INIT_FLOWER_SUPPLY
+                    info = self._current_pid, GameState.INIT_BANKER_DRAW, new_tile, None
+                    if not self._suppress(info):
+                        yield info
+
+                case GameState.INIT_FLOWER_SUPPLY:  # one player at a time, until nobody has flowers in a round
+                    pid = self._current_pid
+                    flower_count = self.current_player.check_flowers()
+                    new_tiles = []
+                    if flower_count:
+                        self._resupply = True
+                        for _ in range(flower_count):
+                            self.current_player.append_hand(self._supply())
+                        new_tiles = self.current_player.hand[-flower_count:]
+                        self.current_player.sort()
+                    next_player()
+
+                    self._init_step += 1
+                    if self._init_step == self.player_count:
+                        if not self._resupply:
+                            self._state = GameState.CHECK_DRAW_ACTION  # banker already drawn 1 extra tile in the beginning
+                        self._init_step = 0
+                        self._resupply = False
+                    if flower_count:
+                        info = pid, GameState.INIT_FLOWER_SUPPLY, new_tiles, None
+                        if not self._suppress(info):
+                            yield info
 
                 case GameState.DRAW:
-                    kong_goal_available = False
-                    self.current_player.append_hand(self.tiles.popleft())
+                    self._kong_goal_available = False
+                    self.current_player.append_hand(self._draw())
                     if len(self.tiles) < RESERVED_TILES:
-                        state = GameState.END
+                        self._state = GameState.END
                     else:
-                        yield self._current_pid, state, self.current_player.recent_tile, None
-                        state = GameState.CHECK_DRAW_ACTION
+                        self._state = GameState.CHECK_DRAW_ACTION
+                        info = self._current_pid, GameState.DRAW, self.current_player.recent_tile, None
+                        if not self._suppress(info):
+                            yield info
 
                 case GameState.SUPPLY:
-                    self.current_player.append_hand(self.tiles.pop())
+                    self.current_player.append_hand(self._supply())
                     if len(self.tiles) < RESERVED_TILES and sum(len(p.flowers) for p in self.player_tiles) != 8:
-                        state = GameState.END
+                        self._state = GameState.END
                     else:
-                        yield self._current_pid, state, self.current_player.recent_tile, None
-                        state = GameState.CHECK_DRAW_ACTION
+                        self._state = GameState.CHECK_DRAW_ACTION
+                        info = self._current_pid, GameState.SUPPLY, self.current_player.recent_tile, None
+                        if not self._suppress(info):
+                            yield info
 
                 case GameState.CHECK_DRAW_ACTION:  # self-goal, self-kong, extend-kong, flower
                     assert self.current_player.total_tiles == NUMBER_TILES_IN_HAND + 1
@@ -752,32 +1772,24 @@ class MahjongGame:
                     if flower_count:
                         assert flower_count == 1
 
-                        state = GameState.SUPPLY
+                        self._state = GameState.SUPPLY
                         for i in range(1, self.player_count):
                             opponent = (self._current_pid + i) % self.player_count
                             if len(self.player_tiles[opponent].flowers) == 7:
-                                state = GameState.END
-                                winner = opponent
-                                losers = (self._current_pid, )
-                                game_result = self.game_result(winner, losers, extra_points=(PointType.FLOWER_7,))
+                                self._end(opponent, (self._current_pid, ), (PointType.FLOWER_7,))
                                 break
                         continue
 
                     if len(self.current_player.flowers) == 8:
-                        state = GameState.END
-                        winner = self._current_pid
-                        losers = tuple(i for i in range(self.player_count) if i != self._current_pid)
-                        game_result = self.game_result(winner, losers)
+                        self._end(self._current_pid, tuple(i for i in range(self.player_count) if i != self._current_pid))
                         continue
 
                     if len(self.current_player.flowers) == 7 and sum(len(p.flowers) for p in self.player_tiles) == 8:
-                        state = GameState.END
-                        winner = self._current_pid
                         losers = (next(i for i in range(4) if len(self.player_tiles[i].flowers) == 1), )
-                        game_result = self.game_result(winner, losers, extra_points=(PointType.FLOWER_7,))
+                        self._end(self._current_pid, losers, (PointType.FLOWER_7,))
                         continue
 
-                    actions = self.current_player.get_draw_actions(can_goal[self._current_pid], can_kong)
+                    actions = self.current_player.get_draw_actions(self._can_goal[self._current_pid], self._can_kong)
                     self.current_player.sort()
 
                     _r = yield self._current_pid, GameState.CHECK_DRAW_ACTION, 0, actions
@@ -786,184 +1798,182 @@ class MahjongGame:
                         case Action.SELF_GOAL:
                             if (Action.SELF_GOAL, target) not in actions:
                                 continue
-                            yield self._current_pid, GameState.ACTION_ACCEPTED, target, action
-                            state = GameState.END
-                            winner = self._current_pid
                             losers = tuple(i for i in range(self.player_count) if i != self._current_pid)
-                            if kong_goal_available:
-                                game_result = self.game_result(winner, losers, extra_points=(PointType.KONG_GOAL,))
+                            if self._kong_goal_available:
+                                self._end(self._current_pid, losers, (PointType.KONG_GOAL,))
                             else:
-                                game_result = self.game_result(winner, losers)
+                                self._end(self._current_pid, losers)
+                            info = self._current_pid, GameState.ACTION_ACCEPTED, target, action
+                            if not self._suppress(info):
+                                yield info
 
                         case Action.SELF_KONG:
-                            if not can_kong or not self.current_player.do_self_kong(target):
+                            if not self._can_kong or not self.current_player.do_self_kong(target):
                                 continue
-                            yield self._current_pid, GameState.ACTION_ACCEPTED, target, action
-                            kong_goal_available = True
-                            state = GameState.SUPPLY
+                            self._kong_goal_available = True
+                            self._state = GameState.SUPPLY
+                            info = self._current_pid, GameState.ACTION_ACCEPTED, target, action
+                            if not self._suppress(info):
+                                yield info
 
                         case Action.EXTEND_KONG:
-                            if not can_kong or not self.current_player.do_extend_kong(target):
+                            if not self._can_kong or not self.current_player.do_extend_kong(target):
                                 continue
-                            yield self._current_pid, GameState.ACTION_ACCEPTED, target, action
-                            can_goal[self._current_pid] = True
+                            self._can_goal[self._current_pid] = True
                             # check if the rest 3 players have goal to this self-kong tile
-                            opponents = []
-                            for i in range(1, self.player_count):
-                                opponent = (self._current_pid + i) % self.player_count
-
-                                assert self.player_tiles[opponent].total_tiles == NUMBER_TILES_IN_HAND
-
-                                owner = (self.player_count + self._current_pid - opponent) % self.player_count  # get_actions() assume owner in [1, 2, 3]
-                                opponent_actions = self.player_tiles[opponent].get_discard_actions(target, owner, can_goal[opponent])
-
-                                if opponent_actions and opponent_actions[0] == (Action.GOAL, target):
-                                    opponents.append(opponent)
-
-                            opponents.sort(reverse=True, key=lambda x: (self._current_pid - x) % self.player_count)
-
-                            state = GameState.SUPPLY
-                            for opponent in opponents:
-                                _r = yield opponent, GameState.CHECK_DISCARD_ACTION, self._current_pid, [(Action.GOAL, target), (Action.PASS, target)]
-                                opponent_action, _ = _r
-                                if opponent_action != Action.GOAL:
-                                    can_goal[opponent] = False
-                                else:
-                                    yield opponent, GameState.ACTION_ACCEPTED, target, opponent_action
-                                    self.player_tiles[opponent].do_goal(target)
-                                    self.current_player.pop_extend_kong()
-                                    winner = opponent
-                                    losers = (self._current_pid,)
-                                    game_result = self.game_result(winner, losers, extra_points=(PointType.EXTEND_KONG_GOAL,))
-                                    self._current_pid = opponent  # move the turn to opponent
-                                    state = GameState.END
-                                    break
-                            kong_goal_available = True
+                            self._state = GameState.CHECK_DISCARD_ACTION
+                            self._pending_source = Action.EXTEND_KONG
+                            self._pending_target = target
+                            self._pending = None
+                            info = self._current_pid, GameState.ACTION_ACCEPTED, target, action
+                            if not self._suppress(info):
+                                yield info
 
                         case Action.DISCARD:
                             if not self.current_player.do_discard(target):
                                 continue
-                            yield self._current_pid, GameState.ACTION_ACCEPTED, target, action
-                            can_goal[self._current_pid] = True
-                            can_kong = True
-
+                            self._can_goal[self._current_pid] = True
+                            self._can_kong = True
                             # check if the rest 3 players have actions to this discarded tile
-                            opponent_actions_in_sequence = []
-                            for i in range(1, self.player_count):
-                                opponent = (self._current_pid + i) % self.player_count
-
-                                assert self.player_tiles[opponent].total_tiles == NUMBER_TILES_IN_HAND
-
-                                owner = (self.player_count + self._current_pid - opponent) % self.player_count  # get_actions() assume owner in [1, 2, 3]
-                                for action, _ in self.player_tiles[opponent].get_discard_actions(target, owner, can_goal[opponent]):
-                                    opponent_actions_in_sequence.append((action, opponent))
-
-                            # GOAL -> KONG/PONG -> CHOW, if multiple players can goal, the one who comes next does
-                            opponent_actions_in_sequence.sort(key=lambda x: (x[0], (self._current_pid - x[1]) % self.player_count))
-                            while opponent_actions_in_sequence:
-                                _opponent_action, opponent = opponent_actions_in_sequence.pop(-1)
-                                opponent_actions = [(_opponent_action, target)]
-                                while opponent_actions_in_sequence and opponent_actions_in_sequence[-1][1] == opponent:
-                                    _opponent_action, opponent = opponent_actions_in_sequence.pop(-1)
-                                    opponent_actions.append((_opponent_action, target))
-                                opponent_actions.append((Action.PASS, target))
-
-                                _r = yield opponent, GameState.CHECK_DISCARD_ACTION, self._current_pid, opponent_actions
-                                opponent_action, _ = _r
-                                if (Action.GOAL, target) in opponent_actions and opponent_action != Action.GOAL:
-                                    can_goal[opponent] = False
-
-                                match opponent_action:
-                                    case Action.GOAL:
-                                        if (Action.GOAL, target) not in opponent_actions:
-                                            continue
-                                        yield opponent, GameState.ACTION_ACCEPTED, target, opponent_action
-                                        self.player_tiles[opponent].do_goal(target)
-                                        self.current_player.pop_discard()
-                                        winner = opponent
-                                        losers = (self._current_pid,)
-                                        game_result = self.game_result(winner, losers)
-                                        self._current_pid = opponent  # move the turn to opponent
-                                        state = GameState.END
-                                        break
-
-                                    case Action.KONG:
-                                        if not self.player_tiles[opponent].do_kong(target):
-                                            continue
-                                        yield opponent, GameState.ACTION_ACCEPTED, target, opponent_action
-                                        self.current_player.pop_discard()
-                                        self._current_pid = opponent  # move the turn to opponent
-                                        state = GameState.SUPPLY
-                                        kong_goal_available = True
-                                        break
-
-                                    case Action.PONG:
-                                        if not self.player_tiles[opponent].do_pong(target):
-                                            continue
-                                        yield opponent, GameState.ACTION_ACCEPTED, target, opponent_action
-                                        can_kong = False
-                                        self.current_player.pop_discard()
-                                        self._current_pid = opponent  # move the turn to opponent
-                                        self.current_player.recent_tile = self.current_player.hand[-1]
-                                        state = GameState.CHECK_DRAW_ACTION
-                                        break
-
-                                    case Action.CHOW_LEFT:
-                                        if not self.player_tiles[opponent].do_chow_left(target):
-                                            continue
-                                        yield opponent, GameState.ACTION_ACCEPTED, target, opponent_action
-                                        can_kong = False
-                                        self.current_player.pop_discard()
-                                        self._current_pid = opponent  # move the turn to opponent
-                                        self.current_player.recent_tile = self.current_player.hand[-1]
-                                        state = GameState.CHECK_DRAW_ACTION
-                                        break
-
-                                    case Action.CHOW_MIDDLE:
-                                        if not self.player_tiles[opponent].do_chow_middle(target):
-                                            continue
-                                        yield opponent, GameState.ACTION_ACCEPTED, target, opponent_action
-                                        can_kong = False
-                                        self.current_player.pop_discard()
-                                        self._current_pid = opponent  # move the turn to opponent
-                                        self.current_player.recent_tile = self.current_player.hand[-1]
-                                        state = GameState.CHECK_DRAW_ACTION
-                                        break
-
-                                    case Action.CHOW_RIGHT:
-                                        if not self.player_tiles[opponent].do_chow_right(target):
-                                            continue
-                                        yield opponent, GameState.ACTION_ACCEPTED, target, opponent_action
-                                        can_kong = False
-                                        self.current_player.pop_discard()
-                                        self._current_pid = opponent  # move the turn to opponent
-                                        self.current_player.recent_tile = self.current_player.hand[-1]
-                                        state = GameState.CHECK_DRAW_ACTION
-                                        break
-
-                                    case Action.PASS:
-                                        yield opponent, GameState.ACTION_ACCEPTED, target, opponent_action
-
-                                    case _:
-                                        print("unexpected opponent_action", opponent_action)
-                                        break
-                            else:
-                                state = GameState.DRAW
-                                next_player()
+                            self._state = GameState.CHECK_DISCARD_ACTION
+                            self._pending_source = Action.DISCARD
+                            self._pending_target = target
+                            self._pending = None
+                            info = self._current_pid, GameState.ACTION_ACCEPTED, target, action
+                            if not self._suppress(info):
+                                yield info
+
                         case _:
                             print("unexpected action", action)
                             continue
+
+                case GameState.CHECK_DISCARD_ACTION:  # goal, kong, pong, chow of the discarded or extend-kong tile
+                    target = self._pending_target
+                    if self._pending is None:
+                        self._pending = self._get_opponent_actions(target, self._pending_source)
+
+                    if not self._pending:  # nobody takes the tile
+                        if self._pending_source == Action.EXTEND_KONG:
+                            self._kong_goal_available = True
+                            self._state = GameState.SUPPLY
+                        else:
+                            self._state = GameState.DRAW
+                            next_player()
+                        continue
+
+                    opponent = self._pending[-1][1]
+                    n = 0
+                    opponent_actions = []
+                    while n < len(self._pending) and self._pending[-1 - n][1] == opponent:
+                        opponent_actions.append((self._pending[-1 - n][0], target))
+                        n += 1
+                    opponent_actions.append((Action.PASS, target))
+
+                    _r = yield opponent, GameState.CHECK_DISCARD_ACTION, self._current_pid, opponent_actions
+                    opponent_action, _ = _r
+                    del self._pending[-n:]
+                    if (Action.GOAL, target) in opponent_actions and opponent_action != Action.GOAL:
+                        self._can_goal[opponent] = False
+
+                    if self._pending_source == Action.EXTEND_KONG:
+                        if opponent_action == Action.GOAL:
+                            self.player_tiles[opponent].do_goal(target)
+                            self.current_player.pop_extend_kong()
+                            self._end(opponent, (self._current_pid,), (PointType.EXTEND_KONG_GOAL,))
+                            self._current_pid = opponent  # move the turn to opponent
+                            info = opponent, GameState.ACTION_ACCEPTED, target, opponent_action
+                            if not self._suppress(info):
+                                yield info
+                        continue
+
+                    match opponent_action:
+                        case Action.GOAL:
+                            if (Action.GOAL, target) not in opponent_actions:
+                                continue
+                            self.player_tiles[opponent].do_goal(target)
+                            self.current_player.pop_discard()
+                            self._end(opponent, (self._current_pid,))
+                            self._current_pid = opponent  # move the turn to opponent
+
+                        case Action.KONG:
+                            if not self.player_tiles[opponent].do_kong(target):
+                                continue
+                            self.current_player.pop_discard()
+                            self._current_pid = opponent  # move the turn to opponent
+                            self._state = GameState.SUPPLY
+                            self._kong_goal_available = True
+
+                        case Action.PONG | Action.CHOW_LEFT | Action.CHOW_MIDDLE | Action.CHOW_RIGHT:
+                            match opponent_action:
+                                case Action.PONG:
+                                    accepted = self.player_tiles[opponent].do_pong(target)
+                                case Action.CHOW_LEFT:
+                                    accepted = self.player_tiles[opponent].do_chow_left(target)
+                                case Action.CHOW_MIDDLE:
+                                    accepted = self.player_tiles[opponent].do_chow_middle(target)
+                                case _:
+                                    accepted = self.player_tiles[opponent].do_chow_right(target)
+                            if not accepted:
+                                continue
+                            self._can_kong = False
+                            self.current_player.pop_discard()
+                            self._current_pid = opponent  # move the turn to opponent
+                            self.current_player.recent_tile = self.current_player.hand[-1]
+                            self._state = GameState.CHECK_DRAW_ACTION
+
+                        case Action.PASS:
+                            pass
+
+                        case _:
+                            print("unexpected opponent_action", opponent_action)
+                            continue
+                    info = opponent, GameState.ACTION_ACCEPTED, target, opponent_action
+                    if not self._suppress(info):
+                        yield info
+
+                case GameState.END:
+                    if not self._settled:
+                        self._settled = True
+                        self._end_banker = self.banker
+                        if self._winner not in [-1, self.banker]:
+                            if self.banker == self.player_count - 1:
+                                self.round = (self.round + 1) % 4
+                            self.running = 0
+                            self.banker = (self.banker + 1) % self.player_count
+                        else:
+                            self.running += 1
+
+                    yield self._end_banker, GameState.END, (self._winner, self._losers), self._game_result
+                    return
+
                 case _:
                     raise NotImplementedError
 
-        banker = self.banker
-        if winner not in [-1, self.banker]:
-            if self.banker == self.player_count - 1:
-                self.round = (self.round + 1) % 4
-            self.running = 0
-            self.banker = (self.banker + 1) % self.player_count
-        else:
-            self.running += 1
+    def _end(self, winner: int, losers: tuple[int, ...], extra_points: tuple[PointType, ...] = tuple()):
+        self._state = GameState.END
+        self._winner = winner
+        self._losers = losers
+        self._game_result = self.game_result(winner, losers, extra_points)
 
-        # make sure this yield is at the end in case it ends before finalization
-        yield banker, state, (winner, losers), game_result
+    def _get_opponent_actions(self, target: int, source: Action) -> list[tuple[Action, int]]:
+        """
+        :return: (action, opponent) of all opponents to the discarded or extend-kong tile, the last one goes first
+        """
+        opponent_actions_in_sequence = []
+        for i in range(1, self.player_count):
+            opponent = (self._current_pid + i) % self.player_count
+
+            assert self.player_tiles[opponent].total_tiles == NUMBER_TILES_IN_HAND
+
+            owner = (self.player_count + self._current_pid - opponent) % self.player_count  # get_actions() assume owner in [1, 2, 3]
+            opponent_actions = self.player_tiles[opponent].get_discard_actions(target, owner, self._can_goal[opponent])
+            if source == Action.EXTEND_KONG:  # only goal is allowed to an extend-kong tile
+                if opponent_actions and opponent_actions[0] == (Action.GOAL, target):
+                    opponent_actions_in_sequence.append((Action.GOAL, opponent))
+                continue
+            for action, _ in opponent_actions:
+                opponent_actions_in_sequence.append((action, opponent))
+
+        # GOAL -> KONG/PONG -> CHOW, if multiple players can goal, the one who comes next does
+        opponent_actions_in_sequence.sort(key=lambda x: (x[0], (self._current_pid - x[1]) % self.player_count))
+        return opponent_actions_in_sequence
@@ -0,0 +1,237 @@
+"""
+Counters and timers of the hot paths of the engine and the AI, off by default.
+
+    metrics.enable()
+    ...
+    print(metrics.export_text())  # or metrics.snapshot()
+
+enable() rebinds the measured functions to instrumented wrappers and disable() puts the originals back,
+so there is no cost at all while disabled. Recursive functions are timed at the outermost call only.
+Not thread-safe: measure one thread at a time.
+"""
+import heapq
+import time
+from collections import deque
+from functools import update_wrapper
+from typing import Callable
+
+from . import ai, engine
+
+SAMPLE_SIZE = 4096  # percentiles are of the most recent samples
+WORST_SIZE = 10
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class Distribution:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: deque = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.samples.append(value)
+
+    def summary(self) -> dict:
+        samples = sorted(self.samples)
+        summary = {"count": self.count, "total": self.total, "mean": self.total / self.count if self.count else 0.0}
+        for q in PERCENTILES:
+            summary[f"p{q * 100:g}"] = samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+        summary["max"] = self.max
+        return summary
+
+
+calls: dict[str, int] = {}
+timers: dict[str, Distribution] = {}  # seconds
+values: dict[str, Distribution] = {}  # e.g. branches of _evaluate()
+transitions: dict[str, int] = {}  # states of MahjongGame entered
+worst_evaluations: list[tuple[int, float, tuple[int, ...], int]] = []  # min-heap of (branches, seconds, hand, depth)
+
+_originals: list[tuple[object, str, Callable]] = []
+_search = [0, 0, 0]  # branches, depth, max depth of the running _evaluate()
+
+
+def _get(table: dict[str, Distribution], name: str) -> Distribution:
+    distribution = table.get(name)
+    if distribution is None:
+        distribution = table[name] = Distribution()
+    return distribution
+
+
+def _wraps(wrapper: Callable, func: Callable) -> Callable:
+    return update_wrapper(wrapper, func)  # also copies cache_clear() etc. of cache.lru_cache
+
+
+def _timed(name: str, func: Callable) -> Callable:
+    timer = _get(timers, name)
+    depth = [0]
+    calls[name] = calls.get(name, 0)
+
+    def wrapper(*args, **kwargs):
+        calls[name] += 1
+        if depth[0]:
+            return func(*args, **kwargs)
+        depth[0] = 1
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timer.add(time.perf_counter() - t0)
+            depth[0] = 0
+    return _wraps(wrapper, func)
+
+
+def _evaluate(func: Callable) -> Callable:
+    timer = _get(timers, "ai._evaluate")
+    branches = _get(values, "ai._evaluate.branches")
+    depths = _get(values, "ai._evaluate.depth")
+    calls["ai._evaluate"] = calls.get("ai._evaluate", 0)
+
+    def wrapper(hand, draw_no_flowers):
+        calls["ai._evaluate"] += 1
+        _search[:] = 0, 0, 0
+        t0 = time.perf_counter()
+        score = func(hand, draw_no_flowers)
+        seconds = time.perf_counter() - t0
+        timer.add(seconds)
+        branches.add(_search[0])
+        depths.add(_search[2])
+        record = (_search[0], seconds, tuple(hand), _search[2])
+        if len(worst_evaluations) < WORST_SIZE:
+            heapq.heappush(worst_evaluations, record)
+        elif record > worst_evaluations[0]:
+            heapq.heapreplace(worst_evaluations, record)
+        return score
+    return _wraps(wrapper, func)
+
+
+def _evaluate_hand(func: Callable) -> Callable:
+    """
+    _evaluate_hand() is the recursion of _evaluate(). Every call is a branch, including cache hits
+    """
+    def wrapper(hand):
+        _search[0] += 1
+        _search[1] += 1
+        if _search[1] > _search[2]:
+            _search[2] = _search[1]
+        try:
+            return func(hand)
+        finally:
+            _search[1] -= 1
+    return _wraps(wrapper, func)
+
+
+def _step(name: str, func: Callable) -> Callable:
+    timer = _get(timers, name)
+
+    def wrapper(self, *args):
+        t0 = time.perf_counter()
+        state = func(self, *args)
+        timer.add(time.perf_counter() - t0)
+        key = state[1].name
+        transitions[key] = transitions.get(key, 0) + 1
+        return state
+    return _wraps(wrapper, func)
+
+
+def _suppress(func: Callable) -> Callable:
+    def wrapper(self, state):
+        if self.headless:  # otherwise the state is counted when get_next_state() returns it
+            key = state[1].name
+            transitions[key] = transitions.get(key, 0) + 1
+        return func(self, state)
+    return _wraps(wrapper, func)
+
+
+_INSTRUMENTS: tuple[tuple[object, str, Callable[[Callable], Callable]], ...] = (
+    (engine, "reduce_hand", lambda f: _timed("engine.reduce_hand", f)),
+    (engine, "get_candidates", lambda f: _timed("engine.get_candidates", f)),
+    (engine.HandCounts, "candidates", lambda f: _timed("engine.HandCounts.candidates", f)),
+    (engine.HandCounts, "shanten", lambda f: _timed("engine.HandCounts.shanten", f)),
+    (engine.PlayerTiles, "waits", lambda p: property(_timed("engine.PlayerTiles.waits", p.fget))),
+    (engine.MahjongGame, "game_result", lambda f: _timed("engine.MahjongGame.game_result", f)),
+    (engine.MahjongGame, "get_next_state", lambda f: _step("engine.MahjongGame.get_next_state", f)),
+    (engine.MahjongGame, "perform_action", lambda f: _step("engine.MahjongGame.perform_action", f)),
+    (engine.MahjongGame, "_suppress", _suppress),
+    (ai, "_evaluate", _evaluate),
+    (ai, "_evaluate_hand", _evaluate_hand),
+    (ai, "_evaluate_reduced", lambda f: _timed("ai._evaluate_reduced", f)),
+    (ai, "get_draw_action", lambda f: _timed("ai.get_draw_action", f)),
+    (ai, "get_discard_action", lambda f: _timed("ai.get_discard_action", f)),
+)
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable():
+    if _originals:
+        return
+    for owner, name, instrument in _INSTRUMENTS:
+        func = owner.__dict__[name]
+        _originals.append((owner, name, func))
+        setattr(owner, name, instrument(func))
+
+
+def disable():
+    """
+    stop measuring. the numbers are kept until reset()
+    """
+    while _originals:
+        owner, name, func = _originals.pop()
+        setattr(owner, name, func)
+
+
+def reset():
+    for counter in (calls, transitions):
+        for name in counter:
+            counter[name] = 0
+    for table in (timers, values):
+        for name in table:
+            table[name].__init__()
+    worst_evaluations.clear()
+
+
+def snapshot() -> dict:
+    """
+    :return: {"enabled", "calls", "timers", "values", "transitions", "worst_evaluations"}.
+        timers and values are summaries of {"count", "total", "mean", "p50", "p90", "p99", "max"}
+    """
+    return {
+        "enabled": is_enabled(),
+        "calls": dict(calls),
+        "timers": {name: t.summary() for name, t in timers.items()},
+        "values": {name: v.summary() for name, v in values.items()},
+        "transitions": dict(transitions),
+        "worst_evaluations": [
+            {"hand": list(hand), "branches": branches, "depth": depth, "seconds": seconds}
+            for branches, seconds, hand, depth in sorted(worst_evaluations, reverse=True)
+        ],
+    }
+
+
+def export_text(prefix: str = "mahjong16tw") -> str:
+    """
+    :return: the snapshot in the Prometheus text format
+    """
+    data = snapshot()
+    lines = [f"# TYPE {prefix}_calls_total counter"]
+    lines += [f'{prefix}_calls_total{{name="{name}"}} {n}' for name, n in data["calls"].items()]
+    lines.append(f"# TYPE {prefix}_transitions_total counter")
+    lines += [f'{prefix}_transitions_total{{state="{state}"}} {n}' for state, n in data["transitions"].items()]
+    for metric, table in (("seconds", data["timers"]), ("value", data["values"])):
+        lines.append(f"# TYPE {prefix}_{metric} summary")
+        for name, summary in table.items():
+            for q in PERCENTILES:
+                lines.append(f'{prefix}_{metric}{{name="{name}",quantile="{q:g}"}} {summary[f"p{q * 100:g}"]:g}')
+            lines.append(f'{prefix}_{metric}_sum{{name="{name}"}} {summary["total"]:g}')
+            lines.append(f'{prefix}_{metric}_count{{name="{name}"}} {summary["count"]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,48 @@
+"""
+Encode what a player can see of a MahjongGame into a fixed-shape numpy array, for training.
+Every row has one column per slot (see engine.SLOT_TILES). Players are ordered from the viewer: self, next, ...
+    0                   concealed tiles in hand
+    1 .. P              discarded tiles of each player, those taken by others excluded
+    P + 1 .. 2P         shown tiles of each player, one tile for a self-kong
+    2P + 1 .. 3P        flowers of each player, column i for flower 100 + i
+    3P + 1              column 0: tiles in the wall, 1: round, 2: running, 3 + i: 1 if player i is the banker
+The array is written in place, so one buffer can be reused for every step.
+"""
+import numpy as np
+
+from . import engine
+
+
+def get_observation_shape(player_count: int = 4) -> tuple[int, int]:
+    return 3 * player_count + 2, engine.NUMBER_SLOTS
+
+
+def encode_observation(mj_game: "engine.MahjongGame", pid: int, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    :param pid: the viewer
+    :param out: array of get_observation_shape() to write into, any numeric dtype. float32 if not given
+    :return: out
+    """
+    n = mj_game.player_count
+    if out is None:
+        out = np.empty(get_observation_shape(n), dtype=np.float32)
+    out[2 * n + 1:] = 0
+
+    out[0] = np.frombuffer(mj_game.player_tiles[pid].counts.counts, dtype=np.uint8)
+    for i in range(n):
+        pt = mj_game.player_tiles[(pid + i) % n]
+        discarded = np.frombuffer(pt.discarded_counts, dtype=np.uint8)
+        out[1 + i] = discarded
+        shown = out[n + 1 + i]
+        np.subtract(np.frombuffer(pt.exposed.counts, dtype=np.uint8), discarded, out=shown)
+        for t in pt.self_kong:  # exposed has all 4 tiles of a self-kong
+            shown[engine._TILE_SLOT[t]] -= 3
+        for f in pt.flowers:
+            out[2 * n + 1 + i, f - engine.TileType.FLOWER.value] = 1
+
+    info = out[3 * n + 1]
+    info[0] = len(mj_game.tiles)
+    info[1] = mj_game.round
+    info[2] = mj_game.running
+    info[3 + (mj_game.banker - pid) % n] = 1
+    return out
@@ -0,0 +1,215 @@
+"""
+Record games in a compact binary format and replay them.
+
+    with open("games.mjr", "wb") as f:
+        mj_game = MahjongGame(4, {}, recorder=GameRecorder(f))
+        ...
+        mj_game.recorder.flush()
+
+    with open("games.mjr", "rb") as f:
+        for recorded in read_games(f):
+            mj_game = replay(recorded)
+
+The stream is MAGIC followed by records of 1-byte tag and a fixed-size payload:
+    G  game start: player count, banker, round, running, wall size and the wall in tile codes
+    R  dice result
+    T  transition: pid, state
+    D  decision: pid, action, target
+    E  end: winner (-1 for draw), bitmask of losers
+A tile code is the index in engine.VALID_TILES, 255 for anything else.
+"""
+import struct
+from typing import BinaryIO, Iterator, NamedTuple
+
+from . import engine
+
+MAGIC = b"MJ16REC\x01"
+
+_GAME = struct.Struct("<BBBHB")
+_DICE = struct.Struct("<BBB")
+_TRANSITION = struct.Struct("<BH")
+_DECISION = struct.Struct("<BBB")
+_END = struct.Struct("<bB")
+
+_TILE_CODES = {t: i for i, t in enumerate(engine.VALID_TILES)}
+_NO_TILE = 255
+
+
+def _encode_tile(tile) -> int:
+    return _TILE_CODES.get(tile, _NO_TILE)
+
+
+def _decode_tile(code: int) -> int:
+    return engine.VALID_TILES[code] if code != _NO_TILE else 0
+
+
+class Transition(NamedTuple):
+    pid: int
+    state: engine.GameState
+
+
+class Decision(NamedTuple):
+    pid: int
+    action: engine.Action
+    target: int
+
+
+class RecordedGame(NamedTuple):
+    player_count: int
+    banker: int
+    round: int
+    running: int
+    tiles: tuple[int, ...]
+    dice: tuple[int, int, int] | None
+    records: list[Transition | Decision]
+    winner: int | None  # None if the game didn't end in the record
+    losers: tuple[int, ...]
+
+    @property
+    def decisions(self) -> list[Decision]:
+        return [r for r in self.records if isinstance(r, Decision)]
+
+
+class GameRecorder:
+    """
+    Give it to MahjongGame(recorder=...). Records are buffered and written at the end of every game
+    """
+    def __init__(self, stream: BinaryIO, buffer_size: int = 1 << 16):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._buffer = bytearray(MAGIC)
+        self._pid = 0  # pid of the last state, who makes the next decision
+
+    def on_state(self, mj_game: "engine.MahjongGame", state: tuple):
+        pid, game_state, target, _ = state
+        self._pid = pid
+        buffer = self._buffer
+        if game_state == engine.GameState.START:
+            tiles = mj_game.tiles
+            buffer += b"G"
+            buffer += _GAME.pack(mj_game.player_count, mj_game.banker, mj_game.round, mj_game.running, len(tiles))
+            buffer += bytes(_encode_tile(t) for t in tiles)
+        buffer += b"T"
+        buffer += _TRANSITION.pack(pid, game_state)
+        if game_state == engine.GameState.ROLL_DICE:
+            buffer += b"R"
+            buffer += _DICE.pack(*target)
+        elif game_state == engine.GameState.END:
+            winner, losers = target
+            buffer += b"E"
+            buffer += _END.pack(winner, sum(1 << loser for loser in losers))
+            self.flush()
+            return
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def on_action(self, mj_game: "engine.MahjongGame", action: engine.Action, target: int):
+        self._buffer += b"D"
+        self._buffer += _DECISION.pack(self._pid, action, _encode_tile(target))
+
+    def flush(self):
+        self.stream.write(self._buffer)
+        self.stream.flush()
+        self._buffer.clear()
+
+
+def read_games(stream: BinaryIO) -> Iterator[RecordedGame]:
+    """
+    :raise ValueError: the stream is not a record of this version or is broken
+    """
+    data = stream.read()
+    if not data.startswith(MAGIC):
+        raise ValueError("not a game record")
+
+    game = None
+    pos = len(MAGIC)
+    while pos < len(data):
+        tag = data[pos:pos + 1]
+        pos += 1
+        match tag:
+            case b"G":
+                if game is not None:
+                    yield RecordedGame(**game)
+                player_count, banker, _round, running, size = _GAME.unpack_from(data, pos)
+                pos += _GAME.size
+                game = {
+                    "player_count": player_count, "banker": banker, "round": _round, "running": running,
+                    "tiles": tuple(_decode_tile(c) for c in data[pos:pos + size]), "dice": None, "records": [],
+                    "winner": None, "losers": (),
+                }
+                pos += size
+            case b"R":
+                game["dice"] = _DICE.unpack_from(data, pos)
+                pos += _DICE.size
+            case b"T":
+                pid, state = _TRANSITION.unpack_from(data, pos)
+                game["records"].append(Transition(pid, engine.GameState(state)))
+                pos += _TRANSITION.size
+            case b"D":
+                pid, action, target = _DECISION.unpack_from(data, pos)
+                game["records"].append(Decision(pid, engine.Action(action), _decode_tile(target)))
+                pos += _DECISION.size
+            case b"E":
+                winner, losers = _END.unpack_from(data, pos)
+                game["winner"] = winner
+                game["losers"] = tuple(i for i in range(game["player_count"]) if losers >> i & 1)
+                pos += _END.size
+            case _:
+                raise ValueError(f"unknown record {tag} at {pos - 1}")
+    if game is not None:
+        yield RecordedGame(**game)
+
+
+def _new_game(recorded: RecordedGame) -> "engine.MahjongGame":
+    mj_game = engine.MahjongGame(recorded.player_count, {})
+    mj_game.banker = recorded.banker
+    mj_game.round = recorded.round
+    mj_game.running = recorded.running
+    mj_game.new_game(recorded.tiles, recorded.dice)
+    return mj_game
+
+
+def replay(recorded: RecordedGame, verify: bool = True) -> "engine.MahjongGame":
+    """
+    Play the recorded decisions again on the recorded wall and dice.
+    :param verify: check every transition against the record
+    :return: the game after the last record
+    :raise ValueError: the replay doesn't match the record
+    """
+    mj_game = _new_game(recorded)
+
+    decision = None
+    for i, record in enumerate(recorded.records):
+        if isinstance(record, Decision):
+            decision = record
+            continue
+        if decision is None:
+            state = mj_game.get_next_state()
+        else:
+            state = mj_game.perform_action(decision.action, decision.target)
+            decision = None
+        if verify and (state[0], state[1]) != record:
+            raise ValueError(f"record {i}: expected {record}, got {state[:2]}")
+    return mj_game
+
+
+def replay_to_move(recorded: RecordedGame, move: int | None = None) -> tuple["engine.MahjongGame", tuple]:
+    """
+    Replay the first decisions without stopping at informational states. The game is left headless.
+    :param move: number of decisions to replay, all by default
+    :return: the game and its state, which waits for the decision at index move (END after all decisions)
+    :raise ValueError: a decision is not made by the player the state is waiting for
+    """
+    mj_game = _new_game(recorded)
+    mj_game.headless = True
+    decisions = recorded.decisions
+    if move is None:
+        move = len(decisions)
+
+    state = mj_game.get_next_state()
+    for i, decision in enumerate(decisions[:move]):
+        if state[1] not in (engine.GameState.CHECK_DRAW_ACTION, engine.GameState.CHECK_DISCARD_ACTION) \
+                or state[0] != decision.pid:
+            raise ValueError(f"decision {i}: {decision} at {state[:2]}")
+        state = mj_game.perform_action(decision.action, decision.target)
+    return mj_game, state
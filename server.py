@@ -0,0 +1,317 @@
+"""
+Many tables in one asyncio event loop, with remote players over a JSON-lines TCP protocol.
+
+python -m mahjong16tw_core.server --port 8616 --move-timeout 15
+python -m mahjong16tw_core.server --capacity 1000
+
+Every line is a JSON object. A client plays seat 0 of a new table, the AI plays the other seats:
+    client  {"op": "join", "games": 2}
+    server  {"type": "seated", "table": 1, "pid": 0}
+    server  {"type": "decide", "table": 1, "move": 7, "pid": 0, "state": "CHECK_DISCARD_ACTION", "hand": [...],
+             "actions": [["PONG", 205], ["PASS", 205]], "timeout": 15}
+    client  {"op": "action", "move": 7, "action": "PONG", "target": 205}
+    server  {"type": "end", "table": 1, "winner": 2, "losers": [0], "points": [-30, 0, 30, 0]}
+    server  {"type": "done", "table": 1}
+At CHECK_DRAW_ACTION, DISCARD of any tile in hand is legal too. A decision not made in move timeout, or not legal,
+is made by the AI instead. Late replies are ignored by their move number.
+games is clamped to the max games of the server, and a table stops after the game in progress if the client leaves.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from . import ai, engine, warmup
+
+DECISIONS = (engine.GameState.CHECK_DRAW_ACTION, engine.GameState.CHECK_DISCARD_ACTION)
+
+
+class RemotePlayer:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.connected = True
+
+    async def send(self, message: dict):
+        try:
+            self.writer.write(json.dumps(message).encode() + b"\n")
+            await self.writer.drain()
+        except ConnectionError:
+            self.connected = False
+
+    async def receive(self) -> dict | None:
+        """
+        :return: the next message, None if disconnected
+        """
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                self.connected = False
+                return None
+            try:
+                return json.loads(line)
+            except ValueError:
+                await self.send({"type": "error", "error": "not json"})
+
+    async def decide(self, message: dict) -> tuple[engine.Action, int]:
+        """
+        :raise ValueError: the reply is not an object, or not an action
+        :raise ConnectionError: disconnected
+        """
+        await self.send(message)
+        while True:
+            reply = await self.receive() if self.connected else None
+            if reply is None:
+                raise ConnectionError("disconnected")
+            if not isinstance(reply, dict):
+                raise ValueError("not an object")
+            if reply.get("op") == "action" and reply.get("move") == message["move"]:
+                return parse_action(reply)
+
+
+def parse_action(reply: dict) -> tuple[engine.Action, int]:
+    """
+    :raise ValueError: no action name or no integer target
+    """
+    action, target = reply.get("action"), reply.get("target")
+    if not isinstance(action, str) or action not in engine.Action.__members__:
+        raise ValueError(f"invalid action {action!r}")
+    if not isinstance(target, int) or isinstance(target, bool):
+        raise ValueError(f"invalid target {target!r}")
+    return engine.Action[action], target
+
+
+def is_legal(mj_game: "engine.MahjongGame", state: tuple, action: engine.Action, target: int) -> bool:
+    pid, game_state, _, actions = state
+    if (action, target) in actions:
+        return True
+    return game_state == engine.GameState.CHECK_DRAW_ACTION and action == engine.Action.DISCARD \
+        and target not in engine.FLOWER_TILES and target in mj_game.player_tiles[pid].counts
+
+
+class Table:
+    def __init__(
+        self, table_id: int, seats: list[RemotePlayer | None], stats: dict,
+        move_timeout: float = 15.0, seed: int = 0, temperature: float = 0.1,
+    ):
+        """
+        :param seats: a remote player or None for the AI of each seat
+        :param stats: counters shared by the tables, see MatchServer.stats
+        """
+        self.table_id = table_id
+        self.seats = seats
+        self.stats = stats
+        self.move_timeout = move_timeout
+        self.temperature = temperature
+        self.mj_game = engine.MahjongGame(len(seats), {}, seed, headless=True)
+        self.move = 0
+
+    async def _broadcast(self, message: dict):
+        for seat in self.seats:
+            if seat is not None and seat.connected:
+                await seat.send(message)
+
+    def _ai_decide(self, state: tuple) -> tuple[engine.Action, int]:
+        pid, game_state, target, actions = state
+        if game_state == engine.GameState.CHECK_DRAW_ACTION:
+            return ai.get_draw_action(pid, actions, self.mj_game, self.temperature)
+        return ai.get_discard_action(pid, actions, target, self.mj_game)
+
+    async def _decide(self, state: tuple) -> tuple[engine.Action, int]:
+        pid, game_state, target, actions = state
+        self.move += 1
+        self.stats["decisions"] += 1
+        seat = self.seats[pid]
+        if seat is not None and seat.connected:
+            self.stats["remote_decisions"] += 1
+            message = {
+                "type": "decide", "table": self.table_id, "move": self.move, "pid": pid, "state": game_state.name,
+                "hand": self.mj_game.player_tiles[pid].hand, "actions": [[a.name, t] for a, t in actions],
+                "timeout": self.move_timeout,
+            }
+            try:
+                action, tile = await asyncio.wait_for(seat.decide(message), self.move_timeout)
+                if is_legal(self.mj_game, state, action, tile):
+                    return action, tile
+                self.stats["illegal"] += 1
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+            except ValueError:
+                self.stats["illegal"] += 1
+            except ConnectionError:
+                self.stats["disconnects"] += 1
+        decision = self._ai_decide(state)
+        await asyncio.sleep(0)  # let other tables run between AI decisions
+        return decision
+
+    async def play_game(self) -> tuple[int, tuple[int, ...], dict[int, int]]:
+        """
+        :return: winner (-1 for draw), losers, points won (negative if paid) by each player
+        """
+        mj_game = self.mj_game
+        banker = mj_game.banker
+        mj_game.new_game()
+        state = mj_game.get_next_state()
+        while state[1] != engine.GameState.END:
+            if state[1] in DECISIONS:
+                state = mj_game.perform_action(*await self._decide(state))
+            else:
+                state = mj_game.get_next_state()
+
+        _, _, (winner, losers), game_result = state
+        points = dict.fromkeys(range(mj_game.player_count), 0)
+        if winner >= 0:
+            for loser, paid in engine.get_payments(banker, winner, losers, game_result).items():
+                points[loser] -= paid
+                points[winner] += paid
+        self.stats["games"] += 1
+        await self._broadcast({
+            "type": "end", "table": self.table_id, "winner": winner, "losers": list(losers),
+            "points": list(points.values()),
+        })
+        return winner, losers, points
+
+    def has_remote_players(self) -> bool:
+        """
+        :return: whether a remote player is still connected, always True for a table of AI only
+        """
+        remotes = [seat for seat in self.seats if seat is not None]
+        return not remotes or any(seat.connected for seat in remotes)
+
+    async def play(self, games: int) -> list[tuple[int, tuple[int, ...], dict[int, int]]]:
+        """
+        :param games: fewer games are played if all remote players disconnect. the game in progress is finished by AI
+        """
+        results = []
+        while len(results) < games and self.has_remote_players():
+            results.append(await self.play_game())
+        return results
+
+
+class MatchServer:
+    def __init__(self, move_timeout: float = 15.0, seed: int = 0, player_count: int = 4, max_games: int = 100):
+        """
+        :param seed: table i uses seed + i, random if 0
+        :param max_games: max games a client can ask for in one join
+        """
+        self.move_timeout = move_timeout
+        self.max_games = max_games
+        self.seed = seed
+        self.player_count = player_count
+        self.tables: dict[int, Table] = {}
+        self.stats = {
+            "tables": 0, "games": 0, "decisions": 0, "remote_decisions": 0,
+            "timeouts": 0, "illegal": 0, "disconnects": 0,
+        }
+        self._next_id = 0
+
+    def new_table(self, seats: list[RemotePlayer | None] | None = None) -> Table:
+        """
+        :param seats: AI on every seat by default
+        """
+        self._next_id += 1
+        table = Table(
+            self._next_id, seats or [None] * self.player_count, self.stats, self.move_timeout,
+            self.seed + self._next_id if self.seed else 0,
+        )
+        self.tables[table.table_id] = table
+        self.stats["tables"] += 1
+        return table
+
+    async def run_table(self, table: Table, games: int) -> list:
+        try:
+            return await table.play(games)
+        finally:
+            del self.tables[table.table_id]
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        player = RemotePlayer(reader, writer)
+        try:
+            message = await player.receive()
+            if not isinstance(message, dict) or message.get("op") != "join":
+                await player.send({"type": "error", "error": "join first"})
+                return
+            games = message.get("games", 1)
+            if not isinstance(games, int) or isinstance(games, bool):
+                await player.send({"type": "error", "error": "games must be an integer"})
+                return
+            table = self.new_table([player] + [None] * (self.player_count - 1))
+            await player.send({"type": "seated", "table": table.table_id, "pid": 0})
+            await self.run_table(table, min(max(1, games), self.max_games))
+            if player.connected:
+                await player.send({"type": "done", "table": table.table_id})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8616) -> asyncio.Server:
+        return await asyncio.start_server(self.handle_client, host, port)
+
+
+def measure_capacity(tables: int = 100, games: int = 1, seed: int = 612116, decision_interval: float = 1.0) -> dict:
+    """
+    Play AI tables concurrently in one event loop and measure the CPU time per decision.
+    :param decision_interval: seconds between decisions of a table with remote players
+    :return: throughput, the max delay of the event loop, and the number of such tables a core can serve
+    """
+    async def run() -> tuple[float, dict]:
+        server = MatchServer(seed=seed)
+        lag = 0.0
+        done = asyncio.Event()
+
+        async def tick():  # the event loop is blocked by AI decisions, which delays everything else
+            nonlocal lag
+            while not done.is_set():
+                t = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lag = max(lag, time.perf_counter() - t - 0.01)
+
+        ticker = asyncio.create_task(tick())
+        await asyncio.gather(*(server.run_table(server.new_table(), games) for _ in range(tables)))
+        done.set()
+        await ticker
+        return lag, server.stats
+
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    lag, stats = asyncio.run(run())
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - t0
+    decisions_per_second = stats["decisions"] / cpu if cpu else 0.0
+    return {
+        "tables": tables,
+        "games": stats["games"],
+        "decisions": stats["decisions"],
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "decisions_per_cpu_second": decisions_per_second,
+        "max_loop_lag": lag,
+        "tables_per_core": int(decisions_per_second * decision_interval),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio match server of many tables")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8616)
+    parser.add_argument("--move-timeout", type=float, default=15.0, help="seconds before the AI decides instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-games", type=int, default=100, help="max games of a client in one join")
+    parser.add_argument("--capacity", type=int, metavar="TABLES", help="measure the capacity with AI tables and exit")
+    parser.add_argument("--decision-interval", type=float, default=1.0, help="seconds between decisions of a table")
+    args = parser.parse_args()
+
+    warmup.load()
+    if args.capacity:
+        report = measure_capacity(args.capacity, seed=args.seed or 612116, decision_interval=args.decision_interval)
+        print(json.dumps(report, indent=2))
+        return
+
+    async def serve():
+        server = await MatchServer(args.move_timeout, args.seed, max_games=args.max_games).serve(args.host, args.port)
+        async with server:
+            await server.serve_forever()
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Headless self-play with AI players on all seats.
+
+python -m mahjong16tw_core.simulate --games 1000 --workers 8 --seed 612116
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import ai, engine, warmup
+
+
+def play_game(
+    mj_game: engine.MahjongGame, temperature: float = 0.1, avoid: bool = False, look_ahead: int = 0
+) -> tuple[int, tuple[int, ...], tuple[list, list]]:
+    """
+    :return: winner (-1 for draw), losers, game_result() of the winner
+    """
+    mj_game.new_game()
+    pid, state, target, actions = mj_game.get_next_state()
+    while state != engine.GameState.END:
+        match state:
+            case engine.GameState.CHECK_DRAW_ACTION:
+                action, target = ai.get_draw_action(pid, actions, mj_game, temperature, avoid, look_ahead)
+                pid, state, target, actions = mj_game.perform_action(action, target)
+            case engine.GameState.CHECK_DISCARD_ACTION:
+                action, target = ai.get_discard_action(pid, actions, target, mj_game, look_ahead)
+                pid, state, target, actions = mj_game.perform_action(action, target)
+            case _:
+                pid, state, target, actions = mj_game.get_next_state()
+
+    winner, losers = target
+    return winner, losers, actions
+
+
+def new_tally(player_count: int = 4) -> dict:
+    return {
+        "games": 0,
+        "draws": 0,
+        "wins": [0] * player_count,
+        "loses": [0] * player_count,
+        "points": [0] * player_count,
+        "seconds": 0.0,
+    }
+
+
+def merge_tally(tally: dict, other: dict) -> dict:
+    for key in ("games", "draws", "seconds"):
+        tally[key] += other[key]
+    for key in ("wins", "loses", "points"):
+        tally[key] = [a + b for a, b in zip(tally[key], other[key])]
+    return tally
+
+
+def run_games(seed: int, games: int, temperature: float = 0.1, avoid: bool = False, look_ahead: int = 0) -> dict:
+    """
+    play games in a row with the same MahjongGame, so banker and round move on like a real table
+    """
+    t0 = time.perf_counter()
+    random.seed(seed)  # for the temperature of ai
+    mj_game = engine.MahjongGame(4, {}, seed, headless=True)
+    tally = new_tally(mj_game.player_count)
+    for _ in range(games):
+        banker = mj_game.banker
+        winner, losers, game_result = play_game(mj_game, temperature, avoid, look_ahead)
+        tally["games"] += 1
+        if winner < 0:
+            tally["draws"] += 1
+            continue
+        tally["wins"][winner] += 1
+        for loser, paid in engine.get_payments(banker, winner, losers, game_result).items():
+            tally["loses"][loser] += 1
+            tally["points"][loser] -= paid
+            tally["points"][winner] += paid
+    tally["seconds"] = time.perf_counter() - t0
+    return tally
+
+
+def simulate(
+    games: int, workers: int = 0, seed: int | None = None, chunk_size: int = 50,
+    temperature: float = 0.1, avoid: bool = False, look_ahead: int = 0,
+) -> dict:
+    """
+    :param workers: number of processes. 0 for os.cpu_count(), 1 for the current process
+    :param seed: chunk i uses seed + i. random if None
+    :param chunk_size: games per job
+    Every process warms up its caches with warmup.load() first.
+    """
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(1, 2 ** 31)
+    chunks = [min(chunk_size, games - i) for i in range(0, games, chunk_size)]
+
+    tally = new_tally()
+    t0 = time.perf_counter()
+    if workers == 1:
+        warmup.load()
+        for i, n in enumerate(chunks):
+            merge_tally(tally, run_games(seed + i, n, temperature, avoid, look_ahead))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=warmup.load) as executor:
+            futures = [
+                executor.submit(run_games, seed + i, n, temperature, avoid, look_ahead)
+                for i, n in enumerate(chunks)
+            ]
+            for future in futures:
+                merge_tally(tally, future.result())
+    wall_seconds = time.perf_counter() - t0
+
+    tally["seed"] = seed
+    tally["workers"] = workers
+    tally["wall_seconds"] = wall_seconds
+    tally["games_per_second"] = tally["games"] / wall_seconds if wall_seconds else 0.0
+    return tally
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless self-play of 4 AI players")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=0, help="0 for all cores, 1 for no process pool")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=50, help="games per job")
+    parser.add_argument("--temperature", type=float, default=0.1)
+    parser.add_argument("--avoid", action="store_true", help="avoid discarding tiles other players are waiting for")
+    parser.add_argument("--look-ahead", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the result as json")
+    args = parser.parse_args()
+
+    tally = simulate(
+        args.games, args.workers, args.seed, args.chunk_size, args.temperature, args.avoid, args.look_ahead
+    )
+    if args.json:
+        print(json.dumps(tally))
+        return
+
+    print(f"games: {tally['games']}, draws: {tally['draws']}, seed: {tally['seed']}, workers: {tally['workers']}")
+    for pid in range(len(tally["wins"])):
+        print(f"player{pid}\twins: {tally['wins'][pid]}\tloses: {tally['loses'][pid]}\tpoints: {tally['points'][pid]}")
+    print(f"{tally['wall_seconds']:.2f}s, {tally['games_per_second']:.2f} games/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Build the tables file read by engine.load_tables(), so new processes don't build the tables themselves.
+
+python -m mahjong16tw_core.tables --output tables.bin
+"""
+import argparse
+import os
+import time
+
+from . import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build the tables of engine.load_tables()")
+    parser.add_argument("--output", default=engine.DEFAULT_TABLES_PATH)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    engine.save_tables(args.output)
+    print(f"{args.output}: {os.path.getsize(args.output)} bytes, {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
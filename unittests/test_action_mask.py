@@ -0,0 +1,51 @@
+import unittest
+
+from mahjong16tw_core import engine
+from mahjong16tw_core.benchmarks import corpus
+from mahjong16tw_core.engine import Action, PlayerTiles, action_to_index
+
+
+def to_indexes(mask):
+    return {i for i, bit in enumerate(mask) if bit}
+
+
+class MyTestCase(unittest.TestCase):
+    def test_draw_mask(self):
+        players = corpus.get_player_tiles(200)
+        pt = PlayerTiles()
+        pt.hand = [201, 201, 201, 201, 202, 203, 204, 205, 206, 207, 208, 209, 300, 300]
+        pt.shown_pong = [205, 310]
+        players.append(pt)
+
+        out = bytearray([1]) * engine.ACTION_SPACE_SIZE
+        for pt in players:
+            for can_goal in (True, False):
+                for can_kong in (True, False):
+                    expected = {action_to_index(*a) for a in pt.get_draw_actions(can_goal, can_kong)}
+                    expected |= {action_to_index(Action.DISCARD, t) for t in pt.hand}
+                    self.assertEqual(to_indexes(pt.get_draw_action_mask(can_goal, can_kong)), expected)
+                    self.assertIs(pt.get_draw_action_mask(can_goal, can_kong, out), out)
+                    self.assertEqual(to_indexes(out), expected)
+        self.assertEqual(
+            to_indexes(pt.get_draw_action_mask(False, True)),
+            {action_to_index(Action.SELF_KONG, 201), action_to_index(Action.EXTEND_KONG, 205)} |
+            {action_to_index(Action.DISCARD, t) for t in pt.hand},
+        )
+
+    def test_discard_mask(self):
+        out = bytearray([1]) * engine.ACTION_SPACE_SIZE
+        for hand in corpus.get_hands(16, 100):
+            pt = PlayerTiles()
+            pt.hand = list(hand)
+            for target in engine.SLOT_TILES:
+                for owner in (1, 3):
+                    for can_goal in (True, False):
+                        expected = {action_to_index(*a) for a in pt.get_discard_actions(target, owner, can_goal)}
+                        expected.add(action_to_index(Action.PASS, target))
+                        self.assertEqual(to_indexes(pt.get_discard_action_mask(target, owner, can_goal)), expected)
+                        pt.get_discard_action_mask(target, owner, can_goal, out)
+                        self.assertEqual(to_indexes(out), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
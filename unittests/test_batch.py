@@ -0,0 +1,39 @@
+import importlib.util
+import unittest
+
+from mahjong16tw_core import ai
+from mahjong16tw_core.engine import get_candidates
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        from mahjong16tw_core.benchmarks import corpus
+        self.hands = []
+        for size in (1, 4, 7, 10, 13, 16, 17):
+            self.hands += corpus.get_hands(size, 100, seed=size)
+            self.hands += corpus.get_hands(size, 50, seed=size, noise=size)
+
+    def test_evaluate_reduced(self):
+        from mahjong16tw_core import batch
+        scores = batch.evaluate_reduced(batch.hands_to_counts(self.hands))
+        self.assertEqual(scores.tolist(), [ai._evaluate_reduced(hand) for hand in self.hands])
+
+    def test_win_masks(self):
+        from mahjong16tw_core import batch
+        scores, ready, masks = batch.evaluate_hands(batch.hands_to_counts(self.hands))
+        candidates = [get_candidates(hand) for hand in self.hands]
+        self.assertEqual(batch.masks_to_tiles(masks), candidates)
+        self.assertEqual(ready.tolist(), [bool(c) for c in candidates])
+        self.assertTrue(ready.any())
+
+    def test_overflow(self):
+        from mahjong16tw_core import batch
+        counts = batch.hands_to_counts([[201] * 5 + [202, 203, 300, 300, 300]])
+        self.assertFalse(batch.get_win_masks(counts).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import importlib.util
+import random
+import unittest
+
+from mahjong16tw_core import engine
+from mahjong16tw_core.engine import Action, action_to_index, index_to_action
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+class MyTestCase(unittest.TestCase):
+    def test_action_space(self):
+        indexes = set()
+        for tile in engine.SLOT_TILES:
+            for action in (Action.DISCARD, Action.SELF_KONG, Action.EXTEND_KONG):
+                index = action_to_index(action, tile)
+                self.assertEqual(index_to_action(index, 0), (action, tile))
+                indexes.add(index)
+        for action in engine._TARGET_ACTIONS:
+            index = action_to_index(action, 219)
+            self.assertEqual(index_to_action(index, 219), (action, 219))
+            indexes.add(index)
+        self.assertEqual(indexes, set(range(engine.ACTION_SPACE_SIZE)))
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_step(self):
+        import numpy as np
+        from mahjong16tw_core.batch_game import BatchMahjongGame
+
+        games = BatchMahjongGame(8, seed=612116)
+        games.reset()
+        rng = np.random.default_rng(612116)
+        finished = 0
+        for _ in range(400):
+            masks = games.legal_actions()
+            self.assertTrue(masks.any(axis=1).all())
+            actions = np.array([rng.choice(np.flatnonzero(row)) for row in masks])
+            rewards, dones = games.step(actions)
+            self.assertEqual(rewards.sum(axis=1).tolist(), [0] * 8)
+            self.assertFalse(rewards[~dones].any())
+            finished += dones.sum()
+        self.assertGreater(finished, 0)
+
+        counts = games.get_hand_counts()
+        for i, mj_game in enumerate(games.games):
+            for pid, pt in enumerate(mj_game.player_tiles):
+                self.assertEqual(counts[i, pid].sum(), len(pt.hand))
+        self.assertEqual(games.get_wall_sizes().tolist(), [len(mj_game.tiles) for mj_game in games.games])
+        observations = games.get_observations()
+        self.assertEqual(observations[:, 0].tolist(), counts[np.arange(8), games.pids].tolist())
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_same_as_game(self):
+        import numpy as np
+        from mahjong16tw_core.batch_game import BatchMahjongGame
+
+        games = BatchMahjongGame(1, seed=612116)
+        games.reset()
+        mj_game = engine.MahjongGame(4, {}, seed=612116, headless=True)
+        mj_game.new_game()
+        state = mj_game.get_next_state()
+        rng = random.Random(612116)
+        while state[1] != engine.GameState.END:
+            self.assertEqual(games.states[0], state)
+            legal = {action_to_index(*a) for a in state[3]}
+            if state[1] == engine.GameState.CHECK_DRAW_ACTION:
+                legal.update(action_to_index(Action.DISCARD, t) for t in set(mj_game.player_tiles[state[0]].hand))
+            self.assertEqual(set(np.flatnonzero(games.legal_actions()[0]).tolist()), legal)
+            index = rng.choice(np.flatnonzero(games.legal_actions()[0]).tolist())
+            rewards, dones = games.step([index])
+            if state[1] == engine.GameState.CHECK_DRAW_ACTION and index < engine.ACTION_SELF_KONG:
+                action = (Action.DISCARD, engine.SLOT_TILES[index])
+            else:
+                action = next(a for a in state[3] if action_to_index(*a) == index)
+            state = mj_game.perform_action(*action)
+        self.assertTrue(dones[0])
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_illegal_action(self):
+        from mahjong16tw_core.batch_game import BatchMahjongGame
+
+        games = BatchMahjongGame(2, seed=612116)
+        games.reset()
+        with self.assertRaises(ValueError):
+            games.step([action_to_index(Action.PONG, 0)] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
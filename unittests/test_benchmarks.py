@@ -0,0 +1,28 @@
+import unittest
+
+from mahjong16tw_core.benchmarks import bench, corpus
+
+
+class MyTestCase(unittest.TestCase):
+    def test_corpus(self):
+        hands = corpus.get_hands(16, 50)
+        self.assertEqual(hands, corpus.get_hands(16, 50))
+        for hand in hands:
+            self.assertEqual(len(hand), 16)
+            self.assertEqual(hand, tuple(sorted(hand)))
+            self.assertTrue(all(hand.count(t) <= 4 for t in hand))
+
+        for pt in corpus.get_player_tiles(10):
+            self.assertEqual(len(pt.hand), 17)
+            self.assertIn(pt.recent_tile, pt.hand)
+
+    def test_run(self):
+        result = bench.run(["get_candidates", "get_draw_actions"], repeat=2)
+        self.assertEqual(set(result["benchmarks"]), {"get_candidates", "get_draw_actions"})
+        for r in result["benchmarks"].values():
+            self.assertGreater(r["ops"], 0)
+            self.assertLessEqual(r["best"], r["median"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+from mahjong16tw_core import ai, cache, engine
+from mahjong16tw_core.benchmarks import corpus
+from mahjong16tw_core.cache import LRUCache, lru_cache
+
+
+class MyTestCase(unittest.TestCase):
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put(1, "a")
+        cache.put(2, "b")
+        self.assertEqual(cache.get(1), "a")
+        cache.put(3, "c")  # 2 is the least recently used
+        self.assertNotIn(2, cache)
+        self.assertEqual(cache.get(2, "x"), "x")
+        self.assertEqual(cache.info(), (1, 1, 2, 2))
+
+        cache.resize(1)
+        self.assertEqual(len(cache), 1)
+        self.assertIn(3, cache)
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, 1, 0))
+
+    def test_decorator(self):
+        calls = []
+
+        @lru_cache(maxsize=2)
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual([square(2), square(2), square(3), square(4), square(2)], [4, 4, 9, 16, 4])
+        self.assertEqual(calls, [2, 3, 4, 2])
+        self.assertEqual(square.cache_info(), (1, 4, 2, 2))
+
+    def test_evaluate_cache(self):
+        ai.clear_cache()
+        hand = (201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 217, 300, 300)
+        scores = ai.get_discard(hand, [], tuple())
+        self.assertEqual(scores[0][1], 217)
+        self.assertEqual(ai.get_discard(hand, [], tuple()), scores)
+        info = ai.get_cache_info()["evaluate"]
+        self.assertGreater(info.hits, 0)
+        self.assertGreater(info.currsize, 0)
+
+        # the upcoming draws are not part of the cache
+        self.assertGreater(ai._evaluate(hand[:-3] + hand[-2:], [216]), ai._evaluate(hand[:-3] + hand[-2:], []))
+        self.assertEqual(ai._evaluate(hand[:-3] + hand[-2:], [201]), ai._evaluate(hand[:-3] + hand[-2:], []))
+
+        ai.set_cache_size(10)
+        self.assertLessEqual(ai.get_cache_info()["evaluate"].currsize, 10)
+        cache.set_memory_budget(None)  # the size set by the ai is kept
+        self.assertEqual(ai.get_cache_info()["evaluate"].maxsize, 10)
+        ai.set_cache_size(65536)
+        ai.clear_cache()
+        self.assertEqual(ai.get_cache_info()["evaluate"].currsize, 0)
+
+    def test_registry(self):
+        names = {"engine.reduce_hand", "engine.get_candidates", "engine._get_group_shapes",
+                 "engine._get_tail_shapes", "ai._evaluate_hand", "ai._evaluate_reduced"}
+        self.assertEqual(set(cache.get_caches()), names)
+        with self.assertRaises(ValueError):
+            cache.register("engine.reduce_hand", LRUCache())
+
+        cache.clear_caches()
+        hand = (201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 217, 300, 300)
+        ai.get_discard(hand, [], tuple())
+        stats = cache.get_stats()
+        self.assertEqual(set(stats), names)
+        for name in ("engine.reduce_hand", "ai._evaluate_hand", "ai._evaluate_reduced"):
+            self.assertGreater(stats[name]["misses"], 0)
+            self.assertGreater(stats[name]["bytes"], 0)
+        self.assertGreater(stats["ai._evaluate_hand"]["hit_rate"], 0)
+        self.assertEqual(cache.get_total_bytes(), sum(s["bytes"] for s in stats.values()))
+
+        cache.resize_cache("engine.reduce_hand", 2)
+        self.assertEqual(engine.reduce_hand.cache_info().currsize, 2)
+        cache.clear_caches("engine.reduce_hand")
+        self.assertEqual(engine.reduce_hand.cache_info(), (0, 0, 2, 0))
+        cache.set_memory_budget(None)
+        self.assertEqual(engine.reduce_hand.cache_info().maxsize, 2)
+        cache.resize_cache("engine.reduce_hand", 8192)
+
+    def test_memory_budget(self):
+        cache.clear_caches()
+        for hand in corpus.get_hands(17, 50):
+            ai.get_discard(hand, [], tuple())
+        budget = cache.get_total_bytes() // 4
+        cache.set_memory_budget(budget)
+        try:
+            self.assertEqual(cache.get_memory_budget(), budget)
+            caches = cache.get_caches()
+            full = sum(c.maxsize * c.entry_bytes() for c in caches.values())
+            self.assertLessEqual(full, budget * 1.01)
+            self.assertLessEqual(cache.get_total_bytes(), budget * 1.01)
+            scores = [ai._evaluate(hand, []) for hand in corpus.get_hands(16, 50)]
+        finally:
+            cache.set_memory_budget(None)
+        self.assertEqual(caches["engine.reduce_hand"].maxsize, 8192)
+        cache.clear_caches()
+        self.assertEqual([ai._evaluate(hand, []) for hand in corpus.get_hands(16, 50)], scores)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import random
+import unittest
+from collections import Counter
+
+from mahjong16tw_core.engine import (
+    MahjongGame, GameState, Action, HandCounts, get_effective_tiles, get_discard_effective_tiles
+)
+from mahjong16tw_core.unittests.test_shanten import UNIVERSE, brute_force_shanten
+
+
+class MyTestCase(unittest.TestCase):
+    def test_effective_tiles(self):
+        hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 216, 300]
+        self.assertEqual(get_effective_tiles(hand), ([300], 3))
+        self.assertEqual(get_effective_tiles(hand, HandCounts([300, 300])), ([300], 1))
+
+        hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 215, 216, 300, 300]
+        self.assertEqual(get_effective_tiles(hand), ([214, 217], 8))
+        self.assertEqual(get_effective_tiles(hand, HandCounts([214, 217, 217])), ([214, 217], 5))
+
+    def test_quad_in_hand(self):
+        hand = [205, 205, 205, 205, 212, 212, 212]
+        self.assertEqual(get_effective_tiles(hand), ([203, 204, 206, 207, 211, 213, 214], 28))
+        self.assertEqual(get_discard_effective_tiles(hand + [213])[213], get_effective_tiles(hand))
+
+        rng = random.Random(612116)
+        for _ in range(30):
+            hand = [rng.choice(UNIVERSE)] * 4 + [rng.choice(UNIVERSE) for _ in range(3)]
+            if any(hand.count(t) > 4 for t in hand):
+                continue
+            shanten = brute_force_shanten(hand, 2)
+            expected = [t for t in UNIVERSE if hand.count(t) < 4 and brute_force_shanten(hand + [t], 2) < shanten]
+            self.assertEqual(get_effective_tiles(hand)[0], expected, hand)
+            discard = rng.choice(UNIVERSE)
+            self.assertEqual(get_discard_effective_tiles(hand + [discard])[discard][0], expected, hand)
+
+    def test_discard_effective_tiles(self):
+        hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 216, 300, 310]
+        effective_tiles = get_discard_effective_tiles(hand)
+        self.assertEqual(effective_tiles[300], ([310], 3))
+        self.assertEqual(effective_tiles[310], ([300], 3))
+
+    def test_visible_tiles(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        mj_game.new_game()
+
+        pid, state, target, actions = mj_game.get_next_state()
+        for _ in range(200):
+            if state == GameState.END:
+                break
+            if state == GameState.CHECK_DRAW_ACTION:
+                pid, state, target, actions = mj_game.perform_action(Action.DISCARD, mj_game.player_tiles[pid].hand[0])
+            elif state == GameState.CHECK_DISCARD_ACTION:
+                pid, state, target, actions = mj_game.perform_action(*actions[0])
+            else:
+                pid, state, target, actions = mj_game.get_next_state()
+
+            visible = Counter()
+            for pt in mj_game.player_tiles:
+                visible.update(pt.discarded)
+                visible.update(t for t in pt.display_tiles if t > 0)
+            self.assertEqual(mj_game.get_visible_tiles().items(), sorted(visible.items()))
+
+    def test_self_kong_visible(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        for pt in mj_game.player_tiles:
+            pt.clear()
+        pt = mj_game.player_tiles[0]
+        pt.hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 300, 300, 300, 300, 310]
+        self.assertTrue(pt.do_self_kong(300))
+        self.assertEqual(mj_game.get_visible_tiles().count(300), 4)
+
+        hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 216, 300]
+        self.assertEqual(get_effective_tiles(hand, mj_game.get_visible_tiles()), ([300], 0))
+
+        pt.undo(Action.SELF_KONG, 300)
+        self.assertEqual(mj_game.get_visible_tiles().count(300), 0)
+        self.assertEqual(pt.hand.count(300), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
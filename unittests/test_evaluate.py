@@ -0,0 +1,16 @@
+import unittest
+
+from mahjong16tw_core import ai
+
+
+class MyTestCase(unittest.TestCase):
+    def test_dead_wait(self):
+        for tile in (205, 300):
+            self.assertEqual(ai._evaluate((tile,) * 4, []), 0)
+            self.assertEqual(ai._evaluate((tile,) * 4, [tile, 201]), 0)
+        self.assertEqual(ai._evaluate((205, 205, 205, 212), []), 8000 * 3)
+        self.assertGreater(ai._evaluate((205, 205, 205, 212, 212), []), ai._evaluate((205, 205, 205, 205, 212), []))
+
+
+if __name__ == '__main__':
+    unittest.main()
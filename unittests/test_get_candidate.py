@@ -1,6 +1,7 @@
+import random
 import unittest
 
-from mahjong16tw_core.engine import get_candidates
+from mahjong16tw_core.engine import get_candidates, is_goal, reduce_hand, ALL_TILES_WITHOUT_FLOWERS
 
 
 class MyTestCase(unittest.TestCase):
@@ -19,6 +20,40 @@ class MyTestCase(unittest.TestCase):
         candidates = get_candidates(tuple(hand))
         self.assertEqual(candidates, [223, 226])
 
+    def test_is_goal(self):
+        self.assertTrue(is_goal([205, 205, 205, 206, 207, 215, 215, 215, 221, 222, 223, 225, 225, 225, 226, 227, 228]))
+        self.assertTrue(is_goal([300, 300, 300, 310, 310]))
+        self.assertTrue(is_goal([300, 300]))
+        self.assertFalse(is_goal([205, 205, 206, 207, 209, 215, 215, 215, 221, 222, 223, 225, 225, 225, 226, 227, 228]))
+        self.assertFalse(is_goal([300, 301, 302, 310, 310]))
+        self.assertFalse(is_goal([100, 101]))
+
+    def test_candidates_same_as_reduce_hand(self):
+        rng = random.Random(612116)
+        suits = [t for t in set(ALL_TILES_WITHOUT_FLOWERS) if t < 300]
+        honors = [t for t in set(ALL_TILES_WITHOUT_FLOWERS) if t >= 300]
+        for _ in range(500):
+            hand = [rng.choice(suits + honors)] * 2
+            for _ in range(rng.randint(0, 5)):
+                if rng.random() < 0.5:
+                    hand += [rng.choice(suits + honors)] * 3
+                else:
+                    t = rng.choice([t for t in suits if t % 10 <= 7])
+                    hand += [t, t + 1, t + 2]
+            hand.pop(rng.randrange(len(hand)))
+            if rng.random() < 0.3:
+                hand[rng.randrange(len(hand))] = rng.choice(suits + honors)
+            if any(hand.count(t) > 4 for t in hand):
+                continue
+            hand = tuple(sorted(hand))
+            expected = []
+            for c in sorted(set(ALL_TILES_WITHOUT_FLOWERS)):
+                if hand.count(c) == 4:
+                    continue
+                if any(len(_h) == 2 and _h[0] == _h[1] for _h in reduce_hand(tuple(sorted(hand + (c,))))):
+                    expected.append(c)
+            self.assertEqual(get_candidates(hand), expected, hand)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from mahjong16tw_core.engine import Action, HandCounts, PlayerTiles, get_candidates
+
+
+class MyTestCase(unittest.TestCase):
+    def test_add_remove(self):
+        counts = HandCounts([311, 201, 100, 201, 229])
+        self.assertEqual(len(counts), 5)
+        self.assertEqual(counts.tiles(), (100, 201, 201, 229, 311))
+        self.assertEqual(counts.count(201), 2)
+        self.assertEqual(counts.count(100), 1)
+        self.assertEqual(counts.count(101), 0)
+        self.assertNotIn(0, counts)
+
+        counts.remove(201)
+        counts.remove(100)
+        counts.add(228)
+        self.assertEqual(counts.tiles(), (201, 228, 229, 311))
+        self.assertEqual(counts.items(), [(201, 1), (228, 1), (229, 1), (311, 1)])
+        self.assertRaises(ValueError, counts.remove, 202)
+        self.assertRaises(ValueError, counts.remove, 100)
+        self.assertRaises(ValueError, counts.remove, 0)
+
+    def test_copy(self):
+        counts = HandCounts([201, 202, 203, 300])
+        other = counts.copy()
+        other.remove(300)
+        other.add(300)
+        other.add(300)
+        self.assertEqual(counts.tiles(), (201, 202, 203, 300))
+        self.assertEqual(other.tiles(), (201, 202, 203, 300, 300))
+        self.assertTrue(other.is_goal())
+        self.assertFalse(counts.is_goal())
+
+    def test_candidates(self):
+        hand = (202, 203, 204, 207, 208, 209, 214, 215, 216, 223, 223, 224, 225)
+        self.assertEqual(HandCounts(hand).candidates(), get_candidates(hand))
+        self.assertEqual(HandCounts(hand).candidates(), [223, 226])
+
+    def test_player_tiles(self):
+        tiles = PlayerTiles()
+        tiles.hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 216, 300]
+        tiles.append_hand(300)
+        self.assertEqual(tiles.counts.count(300), 2)
+        self.assertTrue(tiles.do_discard(201))
+        self.assertEqual(tiles.counts.count(201), 0)
+        self.assertTrue(tiles.do_pong(300))
+        self.assertEqual(tiles.counts.tiles(), tuple(sorted(tiles.hand)))
+        tiles.undo(Action.PONG, 300)
+        tiles.undo(Action.DISCARD, 201)
+        self.assertEqual(tiles.counts.tiles(), tuple(sorted(tiles.hand)))
+        self.assertEqual(len(tiles.counts), 17)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from mahjong16tw_core import ai
+from mahjong16tw_core.engine import MahjongGame, GameState
+
+DECISIONS = (GameState.CHECK_DRAW_ACTION, GameState.CHECK_DISCARD_ACTION, GameState.END)
+
+
+def play(mj_game, games):
+    states = []
+    for _ in range(games):
+        mj_game.new_game()
+        pid, state, target, actions = mj_game.get_next_state()
+        while True:
+            states.append((pid, state, target, actions))
+            if state == GameState.END:
+                break
+            if state == GameState.CHECK_DRAW_ACTION:
+                pid, state, target, actions = mj_game.perform_action(*ai.get_draw_action(pid, actions, mj_game, 0))
+            elif state == GameState.CHECK_DISCARD_ACTION:
+                pid, state, target, actions = mj_game.perform_action(*ai.get_discard_action(pid, actions, target, mj_game))
+            else:
+                pid, state, target, actions = mj_game.get_next_state()
+    return states
+
+
+class MyTestCase(unittest.TestCase):
+    def test_headless(self):
+        states = play(MahjongGame(4, {}, seed=612116), 3)
+        headless = play(MahjongGame(4, {}, seed=612116, headless=True), 3)
+        self.assertEqual(headless, [s for s in states if s[1] in DECISIONS])
+        self.assertLess(len(headless), len(states) // 2)
+
+    def test_clone(self):
+        mj_game = MahjongGame(4, {}, seed=612116, headless=True)
+        mj_game.new_game()
+        self.assertEqual(mj_game.get_next_state()[1], GameState.CHECK_DRAW_ACTION)
+        self.assertTrue(mj_game.clone().headless)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from mahjong16tw_core import ai
+from mahjong16tw_core.engine import MahjongGame, GameState, Action
+
+
+class MyTestCase(unittest.TestCase):
+    def test_draw_action_mc(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        mj_game.new_game()
+        pid, state, target, actions = mj_game.get_next_state()
+        while state != GameState.CHECK_DRAW_ACTION:
+            pid, state, target, actions = mj_game.get_next_state()
+
+        hand = mj_game.player_tiles[pid].hand.copy()
+        tiles = list(mj_game.tiles)
+        action, discard = ai.get_draw_action_mc(pid, actions, mj_game, rollouts=2, time_budget=0, seed=1)
+        self.assertEqual(action, Action.DISCARD)
+        self.assertIn(discard, hand)
+        self.assertEqual(ai.get_draw_action_mc(pid, actions, mj_game, rollouts=2, time_budget=0, seed=1), (action, discard))
+
+        # the game is untouched
+        self.assertEqual(mj_game.player_tiles[pid].hand, hand)
+        self.assertEqual(list(mj_game.tiles), tiles)
+
+    def test_deadline(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        mj_game.new_game()
+        pid, state, target, actions = mj_game.get_next_state()
+        while state != GameState.CHECK_DRAW_ACTION:
+            pid, state, target, actions = mj_game.get_next_state()
+
+        snapshot = mj_game.snapshot()
+        discard = mj_game.player_tiles[pid].hand[-1]
+        self.assertIsNone(ai._rollout(snapshot, pid, discard, 1, deadline=time.time()))
+        self.assertIsInstance(ai._rollout(snapshot, pid, discard, 1, deadline=time.time() + 60), int)
+
+        # games still running when the budget is over stop soon after it
+        with ThreadPoolExecutor(2) as executor:
+            t0 = time.perf_counter()
+            action, discard = ai.get_draw_action_mc(
+                pid, actions, mj_game, rollouts=1000, time_budget=0.05, executor=executor, seed=1,
+            )
+            executor.shutdown(wait=True)
+            self.assertLess(time.perf_counter() - t0, 1.0)
+        self.assertEqual(action, Action.DISCARD)
+
+    def test_determinize(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        mj_game.new_game()
+        pid, state, target, actions = mj_game.get_next_state()
+        while state != GameState.CHECK_DRAW_ACTION:
+            pid, state, target, actions = mj_game.get_next_state()
+
+        clone = mj_game.clone()
+        ai._determinize(clone, pid, ai.random.Random(1))
+        self.assertEqual(clone.player_tiles[pid].hand, mj_game.player_tiles[pid].hand)
+        self.assertEqual([len(pt.hand) for pt in clone.player_tiles], [len(pt.hand) for pt in mj_game.player_tiles])
+        self.assertEqual([t for t in clone.tiles if t < 200], [t for t in mj_game.tiles if t < 200])
+
+        def all_tiles(game):
+            return sorted(sum((pt.hand for pt in game.player_tiles), list(game.tiles)))
+        self.assertEqual(all_tiles(clone), all_tiles(mj_game))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from mahjong16tw_core import ai, engine, metrics
+from mahjong16tw_core.engine import MahjongGame, GameState
+
+
+def play(mj_game):
+    mj_game.new_game()
+    pid, state, target, actions = mj_game.get_next_state()
+    states = []
+    while state != GameState.END:
+        states.append((pid, state, target, actions))
+        if state == GameState.CHECK_DRAW_ACTION:
+            pid, state, target, actions = mj_game.perform_action(*ai.get_draw_action(pid, actions, mj_game, 0))
+        elif state == GameState.CHECK_DISCARD_ACTION:
+            pid, state, target, actions = mj_game.perform_action(*ai.get_discard_action(pid, actions, target, mj_game))
+        else:
+            pid, state, target, actions = mj_game.get_next_state()
+    return states
+
+
+class MyTestCase(unittest.TestCase):
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_enable(self):
+        reduce_hand = engine.reduce_hand
+        get_next_state = MahjongGame.get_next_state
+        metrics.enable()
+        self.assertTrue(metrics.is_enabled())
+        self.assertIsNot(engine.reduce_hand, reduce_hand)
+        self.assertIsNot(MahjongGame.get_next_state, get_next_state)
+        metrics.disable()
+        self.assertFalse(metrics.is_enabled())
+        self.assertIs(engine.reduce_hand, reduce_hand)
+        self.assertIs(MahjongGame.get_next_state, get_next_state)
+        self.assertIsInstance(engine.PlayerTiles.__dict__["waits"], property)
+
+    def test_same_game(self):
+        ai.clear_cache()
+        expected = play(MahjongGame(4, {}, seed=612116))
+        ai.clear_cache()
+        metrics.enable()
+        self.assertEqual(play(MahjongGame(4, {}, seed=612116)), expected)
+        self.assertIn("evaluate", ai.get_cache_info())
+
+    def test_snapshot(self):
+        metrics.enable()
+        ai.clear_cache()
+        states = play(MahjongGame(4, {}, seed=612116))
+        play(MahjongGame(4, {}, seed=612116, headless=True))
+        snapshot = metrics.snapshot()
+
+        decisions = sum(s[1] == GameState.CHECK_DRAW_ACTION for s in states)
+        self.assertEqual(snapshot["transitions"]["CHECK_DRAW_ACTION"], 2 * decisions)
+        self.assertEqual(snapshot["transitions"]["END"], 2)
+        self.assertEqual(sum(snapshot["transitions"].values()), 2 * (len(states) + 1))
+        self.assertEqual(snapshot["timers"]["ai.get_draw_action"]["count"], 2 * decisions)
+        self.assertGreater(snapshot["calls"]["engine.reduce_hand"], 0)
+        self.assertGreater(snapshot["calls"]["engine.MahjongGame.game_result"], 0)
+        self.assertGreater(snapshot["calls"]["engine.HandCounts.candidates"], 0)
+        self.assertGreater(snapshot["calls"]["engine.PlayerTiles.waits"], 0)
+        self.assertEqual(engine.get_shanten([201, 202, 203, 204]), 0)  # not used by the default AI
+        self.assertEqual(metrics.snapshot()["calls"]["engine.HandCounts.shanten"], 1)
+
+        branches = snapshot["values"]["ai._evaluate.branches"]
+        self.assertEqual(branches["count"], snapshot["calls"]["ai._evaluate"])
+        self.assertGreaterEqual(branches["max"], branches["p99"])
+        self.assertGreater(snapshot["values"]["ai._evaluate.depth"]["max"], 1)
+        worst = snapshot["worst_evaluations"]
+        self.assertEqual(len(worst), metrics.WORST_SIZE)
+        self.assertEqual(worst[0]["branches"], branches["max"])
+
+        text = metrics.export_text()
+        self.assertIn('mahjong16tw_transitions_total{state="END"} 2\n', text)
+        self.assertIn('mahjong16tw_seconds{name="ai._evaluate",quantile="0.99"}', text)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()["transitions"]["END"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import importlib.util
+import unittest
+from collections import Counter
+
+from mahjong16tw_core import ai
+from mahjong16tw_core.engine import MahjongGame, GameState, SLOT_TILES
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+def play(mj_game, on_decision):
+    mj_game.new_game()
+    pid, state, target, actions = mj_game.get_next_state()
+    while state != GameState.END:
+        on_decision(pid)
+        if state == GameState.CHECK_DRAW_ACTION:
+            pid, state, target, actions = mj_game.perform_action(*ai.get_draw_action(pid, actions, mj_game, 0))
+        else:
+            pid, state, target, actions = mj_game.perform_action(*ai.get_discard_action(pid, actions, target, mj_game))
+
+
+def to_counts(tiles):
+    counter = Counter(tiles)
+    return [counter[t] for t in SLOT_TILES]
+
+
+class MyTestCase(unittest.TestCase):
+    def test_discarded_counts(self):
+        mj_game = MahjongGame(4, {}, seed=612116, headless=True)
+
+        def check(_):
+            for pt in mj_game.player_tiles:
+                self.assertEqual(list(pt.discarded_counts), to_counts(pt.discarded))
+                self.assertEqual(list(pt.copy().discarded_counts), to_counts(pt.discarded))
+        for _ in range(3):
+            play(mj_game, check)
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_encode(self):
+        import numpy as np
+        from mahjong16tw_core.observation import encode_observation, get_observation_shape
+
+        mj_game = MahjongGame(4, {}, seed=612116, headless=True)
+        out = np.full(get_observation_shape(), 99, dtype=np.int16)
+
+        def check(pid):
+            self.assertIs(encode_observation(mj_game, pid, out), out)
+            self.assertEqual(out[0].tolist(), to_counts(mj_game.player_tiles[pid].hand))
+            for i in range(4):
+                pt = mj_game.player_tiles[(pid + i) % 4]
+                self.assertEqual(out[1 + i].tolist(), to_counts(pt.discarded))
+                shown = [t for t in pt.display_tiles if t > 0]
+                self.assertEqual(out[5 + i].tolist(), to_counts(shown))
+                self.assertEqual(out[9 + i, :8].tolist(), [int(100 + f in pt.flowers) for f in range(8)])
+                self.assertFalse(out[9 + i, 8:].any())
+            self.assertEqual(out[13, :3].tolist(), [len(mj_game.tiles), mj_game.round, mj_game.running])
+            self.assertEqual(out[13, 3:7].tolist(), [int((pid + i) % 4 == mj_game.banker) for i in range(4)])
+            self.assertFalse(out[13, 7:].any())
+        for _ in range(3):
+            play(mj_game, check)
+
+        self.assertEqual(encode_observation(mj_game, 0).dtype, np.float32)
+
+        pt = mj_game.player_tiles[1]  # one tile is encoded for a self-kong, as displayed
+        pt.clear()
+        pt.hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 300, 300, 300, 300, 310]
+        self.assertTrue(pt.do_self_kong(300))
+        encode_observation(mj_game, 0, out)
+        self.assertEqual(out[6].tolist(), to_counts(t for t in pt.display_tiles if t > 0))
+        self.assertEqual(out[6, SLOT_TILES.index(300)], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import io
+import unittest
+
+from mahjong16tw_core import ai
+from mahjong16tw_core.engine import MahjongGame, GameState
+from mahjong16tw_core.recorder import GameRecorder, Decision, read_games, replay, replay_to_move
+
+
+def play(mj_game):
+    mj_game.new_game()
+    pid, state, target, actions = mj_game.get_next_state()
+    while state != GameState.END:
+        if state == GameState.CHECK_DRAW_ACTION:
+            pid, state, target, actions = mj_game.perform_action(*ai.get_draw_action(pid, actions, mj_game, 0))
+        elif state == GameState.CHECK_DISCARD_ACTION:
+            pid, state, target, actions = mj_game.perform_action(*ai.get_discard_action(pid, actions, target, mj_game))
+        else:
+            pid, state, target, actions = mj_game.get_next_state()
+    return target, actions
+
+
+class MyTestCase(unittest.TestCase):
+    def test_record_and_replay(self):
+        stream = io.BytesIO()
+        mj_game = MahjongGame(4, {}, seed=612116, recorder=GameRecorder(stream))
+        results = []
+        for _ in range(3):
+            results.append(play(mj_game))
+            results[-1] += ([(pt.hand, pt.discarded, pt.flowers) for pt in mj_game.player_tiles], mj_game.banker)
+
+        stream.seek(0)
+        games = list(read_games(stream))
+        self.assertEqual(len(games), 3)
+        self.assertLess(len(stream.getvalue()), 3 * 4096)
+        for recorded, ((winner, losers), _, player_tiles, banker) in zip(games, results):
+            self.assertEqual((recorded.winner, recorded.losers), (winner, losers))
+            self.assertTrue(recorded.decisions)
+            self.assertIsInstance(recorded.decisions[0], Decision)
+
+            replayed = replay(recorded)
+            self.assertEqual([(pt.hand, pt.discarded, pt.flowers) for pt in replayed.player_tiles], player_tiles)
+            self.assertEqual(replayed.banker, banker)
+
+    def test_replay_mismatch(self):
+        stream = io.BytesIO()
+        mj_game = MahjongGame(4, {}, seed=612116, recorder=GameRecorder(stream))
+        play(mj_game)
+        stream.seek(0)
+        recorded = next(read_games(stream))
+        tiles = list(recorded.tiles)
+        tiles[0], tiles[-1] = tiles[-1], tiles[0]
+        with self.assertRaises(ValueError):
+            replay(recorded._replace(tiles=tuple(tiles)))
+
+    def test_replay_to_move(self):
+        stream = io.BytesIO()
+        mj_game = MahjongGame(4, {}, seed=612116, recorder=GameRecorder(stream))
+        states = []
+        mj_game.new_game()
+        state = mj_game.get_next_state()
+        while state[1] != GameState.END:
+            pid, game_state, target, actions = state
+            if game_state == GameState.CHECK_DRAW_ACTION:
+                states.append(state)
+                state = mj_game.perform_action(*ai.get_draw_action(pid, actions, mj_game, 0))
+            elif game_state == GameState.CHECK_DISCARD_ACTION:
+                states.append(state)
+                state = mj_game.perform_action(*ai.get_discard_action(pid, actions, target, mj_game))
+            else:
+                state = mj_game.get_next_state()
+        states.append(state)
+
+        stream.seek(0)
+        recorded = next(read_games(stream))
+        self.assertEqual(len(recorded.decisions) + 1, len(states))
+        for move in (0, 1, len(states) // 2, len(states) - 1):
+            replayed, state = replay_to_move(recorded, move)
+            self.assertEqual(state[:3], states[move][:3])
+            self.assertEqual(state[3], states[move][3])
+        self.assertEqual(replay_to_move(recorded)[1][1], GameState.END)
+
+        # the informational states still go to the recorder in headless mode
+        stream2 = io.BytesIO()
+        replayed, _ = replay_to_move(recorded, 0)
+        replayed.recorder = GameRecorder(stream2)
+        replayed.banker, replayed.round, replayed.running = recorded.banker, recorded.round, recorded.running
+        replayed.new_game(recorded.tiles, recorded.dice)
+        state = replayed.get_next_state()
+        for decision in recorded.decisions:
+            state = replayed.perform_action(decision.action, decision.target)
+        self.assertEqual(state[1], GameState.END)
+        stream2.seek(0)
+        self.assertEqual(next(read_games(stream2)).records, recorded.records)
+
+    def test_not_a_record(self):
+        with self.assertRaises(ValueError):
+            list(read_games(io.BytesIO(b"hello")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import unittest
+
+from mahjong16tw_core import engine
+from mahjong16tw_core.server import MatchServer, is_legal, measure_capacity
+
+
+async def play_client(port, games, decide):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(json.dumps({"op": "join", "games": games}).encode() + b"\n")
+    messages = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        message = json.loads(line)
+        messages.append(message)
+        if message["type"] == "done":
+            break
+        if message["type"] == "decide":
+            reply = decide(message)
+            if reply is not None:
+                writer.write(json.dumps(reply).encode() + b"\n")
+    writer.close()
+    return messages
+
+
+def first_action(message):
+    if message["state"] == "CHECK_DRAW_ACTION":
+        action, target = "DISCARD", message["hand"][-1]
+    else:
+        action, target = message["actions"][-1]  # PASS
+    return {"op": "action", "move": message["move"], "action": action, "target": target}
+
+
+class MyTestCase(unittest.TestCase):
+    def run_server(self, games, decide, move_timeout=1.0, max_games=100):
+        async def run():
+            server = MatchServer(move_timeout, seed=612116, max_games=max_games)
+            tcp = await server.serve("127.0.0.1", 0)
+            port = tcp.sockets[0].getsockname()[1]
+            async with tcp:
+                messages = await play_client(port, games, decide)
+            return server, messages
+        return asyncio.run(run())
+
+    def test_remote_player(self):
+        server, messages = self.run_server(2, first_action)
+        self.assertEqual(messages[0], {"type": "seated", "table": 1, "pid": 0})
+        ends = [m for m in messages if m["type"] == "end"]
+        self.assertEqual(len(ends), 2)
+        for end in ends:
+            self.assertEqual(sum(end["points"]), 0)
+        self.assertEqual(messages[-1]["type"], "done")
+        self.assertEqual(server.stats["games"], 2)
+        self.assertEqual(server.stats["remote_decisions"], sum(m["type"] == "decide" for m in messages))
+        self.assertEqual(server.stats["timeouts"] + server.stats["illegal"], 0)
+        self.assertEqual(server.tables, {})
+
+    def test_fallback(self):
+        def decide(message):
+            if message["move"] % 3 == 0:
+                return None  # too late
+            if message["move"] % 3 == 1:
+                return {"op": "action", "move": message["move"], "action": "KONG", "target": 0}
+            return first_action(message)
+
+        server, messages = self.run_server(1, decide, move_timeout=0.05)
+        self.assertEqual(messages[-1]["type"], "done")
+        self.assertGreater(server.stats["timeouts"], 0)
+        self.assertGreater(server.stats["illegal"], 0)
+
+    def test_malformed(self):
+        def decide(message):
+            if message["move"] % 3 == 0:
+                return {"op": "action", "move": message["move"], "action": "PASS", "target": None}
+            if message["move"] % 3 == 1:
+                return ["action", message["move"]]  # not an object
+            return first_action(message)
+
+        server, messages = self.run_server(1, decide)
+        self.assertEqual(messages[-1]["type"], "done")
+        self.assertEqual(server.stats["games"], 1)
+        self.assertEqual(server.stats["illegal"], sum(m["type"] == "decide" and m["move"] % 3 != 2 for m in messages))
+        self.assertEqual(server.stats["disconnects"], 0)
+
+    def test_bad_join(self):
+        async def run(join):
+            server = MatchServer(seed=612116)
+            tcp = await server.serve("127.0.0.1", 0)
+            async with tcp:
+                reader, writer = await asyncio.open_connection("127.0.0.1", tcp.sockets[0].getsockname()[1])
+                writer.write(json.dumps(join).encode() + b"\n")
+                reply = json.loads(await reader.readline())
+                writer.close()
+            return server, reply
+
+        for join in (["join"], {"op": "join", "games": "two"}, {"op": "join", "games": None}):
+            server, reply = asyncio.run(run(join))
+            self.assertEqual(reply["type"], "error")
+            self.assertEqual(server.stats["tables"], 0)
+
+    def test_max_games(self):
+        server, messages = self.run_server(10 ** 9, first_action, max_games=2)
+        self.assertEqual(sum(m["type"] == "end" for m in messages), 2)
+        self.assertEqual(messages[-1]["type"], "done")
+
+    def test_leave(self):
+        async def run():
+            server = MatchServer(seed=612116)
+            tcp = await server.serve("127.0.0.1", 0)
+            async with tcp:
+                reader, writer = await asyncio.open_connection("127.0.0.1", tcp.sockets[0].getsockname()[1])
+                writer.write(json.dumps({"op": "join", "games": 10 ** 9}).encode() + b"\n")
+                while json.loads(await reader.readline())["type"] != "decide":
+                    pass
+                writer.close()  # leave without replying
+                while not server.stats["tables"] or server.tables:
+                    await asyncio.sleep(0.01)
+            return server
+
+        server = asyncio.run(asyncio.wait_for(run(), 30))
+        self.assertEqual(server.stats["games"], 1)
+        self.assertEqual(server.stats["disconnects"], 1)
+
+    def test_is_legal(self):
+        mj_game = engine.MahjongGame(4, {}, seed=612116, headless=True)
+        mj_game.new_game()
+        state = mj_game.get_next_state()
+        tile = mj_game.player_tiles[state[0]].hand[0]
+        self.assertTrue(is_legal(mj_game, state, engine.Action.DISCARD, tile))
+        self.assertFalse(is_legal(mj_game, state, engine.Action.PONG, tile))
+
+    def test_capacity(self):
+        report = measure_capacity(tables=4, games=1)
+        self.assertEqual(report["games"], 4)
+        self.assertGreater(report["decisions"], 0)
+        self.assertGreater(report["tables_per_core"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
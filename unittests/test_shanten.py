@@ -0,0 +1,94 @@
+import random
+import unittest
+from collections import Counter
+from functools import lru_cache
+from itertools import combinations_with_replacement
+
+from mahjong16tw_core.engine import PlayerTiles, get_candidates, get_shanten, ALL_TILES_WITHOUT_FLOWERS
+
+UNIVERSE = (201, 202, 203, 204, 205, 206, 207, 208, 209, 300, 301)
+_MELDS = [(t, t, t) for t in UNIVERSE] + [(t, t + 1, t + 2) for t in UNIVERSE if t < 208] + [()]  # () is elsewhere
+_PAIRS = [(t, t) for t in UNIVERSE] + [()]
+
+
+@lru_cache
+def _complete_hands(melds):
+    complete_hands = set()
+    for combination in combinations_with_replacement(_MELDS, melds):
+        for pair in _PAIRS:
+            complete = Counter(pair)
+            for meld in combination:
+                complete.update(meld)
+            if all(c <= 4 for c in complete.values()):
+                complete_hands.add(tuple(sorted(complete.items())))
+    return complete_hands
+
+
+def brute_force_shanten(hand, melds):
+    """
+    :param hand: tiles of UNIVERSE
+    :return: fewest tiles to draw to complete the hand, less one, over all complete hands with at most 4 copies
+    """
+    counts = Counter(hand)
+    used = max(sum(min(c, counts[t]) for t, c in complete) for complete in _complete_hands(melds))
+    return 3 * melds + 1 - used
+
+
+class MyTestCase(unittest.TestCase):
+    def test_shanten(self):
+        self.assertEqual(get_shanten([201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 216, 300, 300]), -1)
+        self.assertEqual(get_shanten([201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 216, 300]), 0)
+        self.assertEqual(get_shanten([201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 217, 300]), 1)
+        self.assertEqual(get_shanten([201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 217, 301, 300]), 1)
+        self.assertEqual(get_shanten([201, 204, 207, 211, 214, 217, 221, 224, 227, 300, 301, 302, 303, 310, 311, 312]), 10)
+        self.assertEqual(get_shanten([300]), 0)
+        self.assertEqual(get_shanten([300, 301, 301, 301]), 0)
+        self.assertEqual(get_shanten([300, 301, 302, 303]), 2)
+        self.assertEqual(get_shanten([205, 205, 205, 205, 212, 212, 212]), 1)  # 205 can't be waited for
+        self.assertEqual(get_candidates((205, 205, 205, 205, 212, 212, 212)), [])
+        self.assertEqual(get_shanten([300, 300, 300, 300]), 1)
+
+    def test_brute_force(self):
+        rng = random.Random(612116)
+        for _ in range(300):
+            size = rng.choice((4, 7))
+            hand = [rng.choice(UNIVERSE)] * rng.randint(1, 4)
+            while len(hand) < size:
+                hand.append(rng.choice(UNIVERSE))
+            del hand[size:]
+            if any(hand.count(t) > 4 for t in hand):
+                continue
+            self.assertEqual(get_shanten(hand), brute_force_shanten(hand, size // 3), hand)
+
+    def test_player_tiles(self):
+        tiles = PlayerTiles()
+        tiles.shown_pong = [300]
+        tiles.shown_chow = [201, 202, 203]
+        tiles.hand = [204, 205, 206, 207, 208, 209, 211, 212, 213, 214]
+        self.assertEqual(tiles.get_shanten(), 0)
+        tiles.hand = [204, 205, 206, 207, 208, 209, 211, 212, 214, 216]
+        self.assertEqual(tiles.get_shanten(), 1)
+
+    def test_ready_same_as_candidates(self):
+        rng = random.Random(612116)
+        suits = [t for t in set(ALL_TILES_WITHOUT_FLOWERS) if t < 300]
+        honors = [t for t in set(ALL_TILES_WITHOUT_FLOWERS) if t >= 300]
+        for _ in range(500):
+            hand = [rng.choice(suits + honors)] * 2
+            for _ in range(5):
+                if rng.random() < 0.3:
+                    hand += [rng.choice(suits + honors)] * 3
+                else:
+                    t = rng.choice([t for t in suits if t % 10 <= 7])
+                    hand += [t, t + 1, t + 2]
+            hand.pop(rng.randrange(len(hand)))
+            for _ in range(rng.randint(0, 2)):
+                hand[rng.randrange(len(hand))] = rng.choice(suits + honors)
+            if any(hand.count(t) > 4 for t in hand):
+                continue
+            hand = tuple(sorted(hand))
+            self.assertEqual(get_shanten(hand) == 0, bool(get_candidates(hand)), hand)
+
+
+if __name__ == '__main__':
+    unittest.main()
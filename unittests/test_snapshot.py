@@ -0,0 +1,93 @@
+import pickle
+import unittest
+
+from mahjong16tw_core import ai
+from mahjong16tw_core.engine import MahjongGame, GameState, Action
+
+
+def play(mj_game, state_tuple, steps=10000):
+    states = []
+    pid, state, target, actions = state_tuple
+    for _ in range(steps):
+        states.append((pid, state, target, actions))
+        if state == GameState.END or len(states) == steps:
+            break
+        if state == GameState.CHECK_DISCARD_ACTION:
+            pid, state, target, actions = mj_game.perform_action(*ai.get_discard_action(pid, actions, target, mj_game, 0))
+        elif state == GameState.CHECK_DRAW_ACTION:
+            pid, state, target, actions = mj_game.perform_action(*ai.get_draw_action(pid, actions, mj_game, 0, False, 0))
+        else:
+            pid, state, target, actions = mj_game.get_next_state()
+    return states
+
+
+class MyTestCase(unittest.TestCase):
+    def test_restore(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        mj_game.new_game()
+        states = play(mj_game, mj_game.get_next_state(), 150)
+        while states[-1][1] != GameState.CHECK_DISCARD_ACTION:
+            states += play(mj_game, states[-1], 2)[1:]
+
+        snapshot = mj_game.snapshot()
+        expected = play(mj_game, states[-1])
+        self.assertEqual(expected[-1][1], GameState.END)
+        banker = mj_game.banker
+
+        for _ in range(2):
+            mj_game.restore(snapshot)
+            self.assertEqual(play(mj_game, mj_game.get_next_state()), expected)
+            self.assertEqual(mj_game.banker, banker)
+
+        mj_game.restore(pickle.loads(pickle.dumps(snapshot)))
+        self.assertEqual(play(mj_game, mj_game.get_next_state()), expected)
+
+    def test_accepted_after_action(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        mj_game.banker = 0
+        mj_game.new_game()
+        state = mj_game.get_next_state()
+        while state[1] != GameState.CHECK_DRAW_ACTION:
+            state = mj_game.get_next_state()
+
+        mj_game.player_tiles[0].hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 300, 301, 302, 303, 310]
+        mj_game.player_tiles[1].hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 211, 213, 301, 301, 302, 303]
+        mj_game.player_tiles[2].hand = [201, 202, 203, 204, 204, 206, 207, 208, 209, 211, 212, 214, 215, 216, 300, 300]
+        mj_game.player_tiles[3].hand = [201, 201, 201, 204, 205, 206, 207, 208, 209, 211, 211, 213, 300, 301, 302, 312]
+        self.assertEqual(mj_game.perform_action(Action.DISCARD, 201)[:2], (0, GameState.ACTION_ACCEPTED))
+        self.assertEqual(mj_game.player_tiles[0].discarded[-1], 201)
+        self.assertEqual(mj_game.get_next_state()[:2], (3, GameState.CHECK_DISCARD_ACTION))
+
+        # the pong is done, the discard is taken and the turn has moved when it is accepted
+        self.assertEqual(mj_game.perform_action(Action.PONG, 201)[:2], (3, GameState.ACTION_ACCEPTED))
+        self.assertNotIn(201, mj_game.player_tiles[0].discarded)
+        self.assertEqual(mj_game.player_tiles[3].shown_pong, [201])
+        self.assertIs(mj_game.current_player, mj_game.player_tiles[3])
+
+        snapshot = mj_game.snapshot()
+        expected = mj_game.get_next_state()
+        self.assertEqual(expected[:2], (3, GameState.CHECK_DRAW_ACTION))
+        mj_game.restore(snapshot)
+        self.assertEqual(mj_game.get_next_state(), expected)
+
+    def test_clone(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        mj_game.new_game()
+        states = play(mj_game, mj_game.get_next_state(), 100)
+        while states[-1][1] != GameState.CHECK_DRAW_ACTION:
+            states += play(mj_game, states[-1], 2)[1:]
+
+        clone = mj_game.clone()
+        hand = mj_game.player_tiles[0].hand.copy()
+        clone_states = play(clone, clone.get_next_state())
+        self.assertEqual(mj_game.player_tiles[0].hand, hand)
+        self.assertEqual(play(mj_game, states[-1]), clone_states)
+
+        # the next game is the same as well
+        mj_game.new_game()
+        clone.new_game()
+        self.assertEqual(play(mj_game, mj_game.get_next_state()), play(clone, clone.get_next_state()))
+
+
+if __name__ == '__main__':
+    unittest.main()
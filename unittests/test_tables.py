@@ -0,0 +1,63 @@
+import marshal
+import os
+import tempfile
+import unittest
+
+from mahjong16tw_core import engine
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "tables.bin")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_get_table(self):
+        self.assertEqual(engine.get_table("_SUIT_TABLE"), engine._build_meld_table(9, True))
+        self.assertEqual(engine.get_table("_HONOR_TABLE"), engine._build_meld_table(7, False))
+        self.assertIs(engine._SUIT_TABLE, engine.get_table("_SUIT_TABLE"))
+        self.assertEqual(engine._GROUP_TABLES, (engine._SUIT_TABLE,) * 3 + (engine._HONOR_TABLE,))
+        with self.assertRaises(KeyError):
+            engine.get_table("_NO_TABLE")
+        with self.assertRaises(AttributeError):
+            engine._NO_TABLE
+
+    def test_save_load(self):
+        engine.save_tables(self.path)
+        tables = dict(engine._tables)
+        engine._tables.clear()
+        try:
+            self.assertTrue(engine.load_tables(self.path))
+            self.assertEqual(engine._tables, tables)
+        finally:
+            engine._tables.update(tables)
+
+    def test_load_invalid(self):
+        self.assertFalse(engine.load_tables(os.path.join(self.dir.name, "missing.bin")))
+        with open(self.path, "wb") as f:
+            f.write(b"not a tables file")
+        self.assertFalse(engine.load_tables(self.path))
+        with open(self.path, "wb") as f:
+            f.write(engine.TABLES_MAGIC + b"broken")
+        self.assertFalse(engine.load_tables(self.path))
+
+    def test_version(self):
+        version = engine.get_tables_version()
+        self.assertEqual(len(version), 64)
+        self.assertEqual(engine.get_tables_version(), version)
+        builder = engine._TABLE_BUILDERS["_HONOR_TABLE"]
+        engine._TABLE_BUILDERS["_HONOR_TABLE"] = lambda: engine._build_meld_table(7, True)  # a change of the rules
+        try:
+            self.assertNotEqual(engine.get_tables_version(), version)
+        finally:
+            engine._TABLE_BUILDERS["_HONOR_TABLE"] = builder
+        tables = {name: engine.get_table(name) for name in engine._TABLE_BUILDERS}
+        with open(self.path, "wb") as f:
+            f.write(engine.TABLES_MAGIC + marshal.dumps(("stale", tables)))
+        self.assertFalse(engine.load_tables(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
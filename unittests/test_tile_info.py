@@ -0,0 +1,32 @@
+import unittest
+
+from mahjong16tw_core.engine import (
+    TileType, TILE_INFO, VALID_TILES, get_tile_type, FLOWER_TILES, HONOR_TILES, SUIT_TILES, HONOR_TYPES, SUIT_TYPES
+)
+
+
+class MyTestCase(unittest.TestCase):
+    def test_get_tile_type(self):
+        for v in range(-20, 400):
+            try:
+                expected = TileType(v // 10 * 10)
+            except ValueError:
+                self.assertRaises(ValueError, get_tile_type, v)
+            else:
+                self.assertIs(get_tile_type(v), expected)
+
+    def test_tile_info(self):
+        self.assertEqual(sorted(TILE_INFO), list(VALID_TILES))
+        for t in VALID_TILES:
+            info = TILE_INFO[t]
+            self.assertIs(info.type, TileType(t // 10 * 10))
+            self.assertEqual(info.type_value, info.type.value)
+            self.assertEqual(info.idx, t % 10)
+            self.assertEqual(t in FLOWER_TILES, info.type == TileType.FLOWER)
+            self.assertEqual(t in HONOR_TILES, info.type in HONOR_TYPES)
+            self.assertEqual(t in SUIT_TILES, info.type in SUIT_TYPES)
+        self.assertFalse(210 in SUIT_TILES or 313 in HONOR_TILES or 108 in FLOWER_TILES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+from mahjong16tw_core import engine
+from mahjong16tw_core.benchmarks import corpus
+from mahjong16tw_core.engine import HandCounts, WaitIndex
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.hands = []
+        for size in (1, 4, 7, 10, 13, 16):
+            self.hands += corpus.get_hands(size, 200, seed=size)
+            self.hands += corpus.get_hands(size, 50, seed=size, noise=size)
+        self.hands.append((201, 201, 201, 201, 202, 203, 204))
+
+    def test_same_candidates(self):
+        index = WaitIndex.build()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "wait_index.bin")
+            index.save(path)
+            loaded = WaitIndex.load(path)
+
+            engine.unload_wait_index()
+            try:
+                expected = [HandCounts(hand).candidates() for hand in self.hands]
+                self.assertTrue(any(expected))
+                for hand, candidates in zip(self.hands, expected):
+                    keys = HandCounts(hand).keys
+                    self.assertEqual(index.candidates(keys), candidates, hand)
+                    self.assertEqual(loaded.candidates(keys), candidates, hand)
+
+                self.assertTrue(engine.load_wait_index(path))
+                self.assertEqual([HandCounts(hand).candidates() for hand in self.hands], expected)
+            finally:
+                engine.unload_wait_index()
+                engine.load_wait_index()
+                del loaded
+
+    def test_fallback(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertFalse(engine.load_wait_index(os.path.join(tmp, "missing.bin")))
+            path = os.path.join(tmp, "broken.bin")
+            with open(path, "wb") as f:
+                f.write(b"MJ16WAIT")
+            self.assertFalse(engine.load_wait_index(path))
+        self.assertEqual(HandCounts([300, 300, 301, 301]).candidates(), [300, 301])
+        engine.load_wait_index()
+
+    def test_tables_version(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "wait_index.bin")
+            WaitIndex.build().save(path)
+            with open(path, "r+b") as f:
+                f.seek(len(WaitIndex.MAGIC) + 4)
+                f.write(bytes(32))  # built from other tables
+            try:
+                self.assertFalse(engine.load_wait_index(path))
+                with self.assertRaises(ValueError):
+                    WaitIndex.load(path)
+            finally:
+                engine.load_wait_index()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from mahjong16tw_core.engine import PlayerTiles, Action
+
+
+class MyTestCase(unittest.TestCase):
+    def test_waits(self):
+        tiles = PlayerTiles()
+        tiles.hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 216, 300]
+        self.assertEqual(tiles.waits, {300})
+        self.assertEqual(tiles.get_discard_actions(300, 1, True)[0], (Action.GOAL, 300))
+
+        tiles.append_hand(310)
+        self.assertEqual(tiles.waits, set())
+        tiles.do_discard(300)
+        self.assertEqual(tiles.waits, {310})
+        self.assertEqual(tiles.get_discard_actions(300, 1, True), [])
+
+        tiles.hand = [300, 300, 301, 301]
+        self.assertEqual(tiles.waits, {300, 301})
+        self.assertEqual(tiles.copy().waits, {300, 301})
+
+    def test_self_goal(self):
+        tiles = PlayerTiles()
+        tiles.hand = [201, 202, 203, 204, 205, 206, 207, 208, 209, 211, 212, 213, 214, 215, 216, 300]
+        tiles.append_hand(300)
+        hand = tiles.hand.copy()
+        self.assertEqual(tiles.get_draw_actions(True, False), [(Action.SELF_GOAL, 300)])
+        self.assertEqual(tiles.get_draw_actions(False, False), [])
+        self.assertEqual(tiles.hand, hand)
+
+
+if __name__ == '__main__':
+    unittest.main()
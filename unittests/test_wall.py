@@ -0,0 +1,42 @@
+import unittest
+from collections import deque
+
+from mahjong16tw_core import ai
+from mahjong16tw_core.engine import MahjongGame, GameState, get_tile_type, TileType
+
+
+def get_no_flower(tiles, look_ahead):
+    no_flower = [t for t in tiles if get_tile_type(t) != TileType.FLOWER]
+    supply = no_flower.pop(-1)
+    return no_flower[:look_ahead], supply
+
+
+class MyTestCase(unittest.TestCase):
+    def test_upcoming_tiles(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        for _ in range(3):
+            mj_game.new_game()
+            pid, state, target, actions = mj_game.get_next_state()
+            while state != GameState.END:
+                if state in (GameState.CHECK_DRAW_ACTION, GameState.CHECK_DISCARD_ACTION):
+                    for look_ahead in (0, 5, 200):
+                        self.assertEqual(
+                            (mj_game.get_upcoming_tiles(look_ahead), mj_game.get_supply_tile()),
+                            get_no_flower(mj_game.tiles, look_ahead),
+                        )
+                if state == GameState.CHECK_DRAW_ACTION:
+                    pid, state, target, actions = mj_game.perform_action(*ai.get_draw_action(pid, actions, mj_game, 0, False, 5))
+                elif state == GameState.CHECK_DISCARD_ACTION:
+                    pid, state, target, actions = mj_game.perform_action(*ai.get_discard_action(pid, actions, target, mj_game, 5))
+                else:
+                    pid, state, target, actions = mj_game.get_next_state()
+
+    def test_assign_tiles(self):
+        mj_game = MahjongGame(4, {}, seed=612116)
+        mj_game.tiles = deque([100, 201, 101, 202, 203, 102])
+        self.assertEqual(mj_game.get_upcoming_tiles(5), [201, 202])
+        self.assertEqual(mj_game.get_supply_tile(), 203)
+
+
+if __name__ == '__main__':
+    unittest.main()
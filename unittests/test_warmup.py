@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from mahjong16tw_core import ai, cache, engine, warmup
+from mahjong16tw_core.benchmarks import corpus
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "cache_warmup.bin")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_save_load(self):
+        hands = corpus.get_hands(17, 20)
+        cache.clear_caches()
+        scores = [ai.get_discard(hand, [], tuple()) for hand in hands]
+        sizes = {name: s["currsize"] for name, s in cache.get_stats().items()}
+        self.assertEqual(warmup.save(self.path), sum(sizes.values()))
+        entries = engine.reduce_hand.cache.entries()
+
+        cache.clear_caches()
+        self.assertEqual(warmup.load(self.path), sum(sizes.values()))
+        self.assertEqual({name: s["currsize"] for name, s in cache.get_stats().items()}, sizes)
+        self.assertEqual(engine.reduce_hand.cache.entries(), entries)  # same order of recency
+
+        self.assertEqual([ai.get_discard(hand, [], tuple()) for hand in hands], scores)
+        self.assertEqual(ai.get_cache_info()["evaluate"].misses, 0)
+
+    def test_limit(self):
+        cache.clear_caches()
+        for hand in corpus.get_hands(17, 5):
+            ai.get_discard(hand, [], tuple())
+        recent = engine.reduce_hand.cache.entries(3)
+        self.assertEqual(recent, engine.reduce_hand.cache.entries()[-3:])
+        warmup.save(self.path, limit=3)
+        cache.clear_caches()
+        warmup.load(self.path)
+        self.assertEqual(engine.reduce_hand.cache.entries(), recent)
+
+    def test_version(self):
+        cache.save_caches(self.path, "old", ["engine.reduce_hand"])
+        self.assertEqual(cache.load_caches(self.path, "new"), 0)
+        self.assertEqual(warmup.load(self.path), 0)
+        self.assertEqual(warmup.load(os.path.join(self.dir.name, "missing.bin")), 0)
+
+        with open(self.path, "wb") as f:
+            f.write(b"MJ16CACHE\x01broken")
+        with self.assertRaises(ValueError):
+            cache.load_caches(self.path, "new")
+        self.assertEqual(warmup.load(self.path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
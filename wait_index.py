@@ -0,0 +1,26 @@
+"""
+Build the wait index file used by engine.load_wait_index(). The file is the same on every build.
+
+python -m mahjong16tw_core.wait_index --output wait_index.bin
+"""
+import argparse
+import hashlib
+import time
+
+from . import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build the wait index of engine.load_wait_index()")
+    parser.add_argument("--output", default=engine.DEFAULT_WAIT_INDEX_PATH)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    engine.WaitIndex.build().save(args.output)
+    with open(args.output, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    print(f"{args.output}: sha256 {digest}, {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Warm up the caches of the engine and the AI from a file, so a new process is as fast as a running one.
+
+python -m mahjong16tw_core.warmup --games 200 --output cache_warmup.bin
+
+The file is tied to the code of engine.py and ai.py: after a change of the rules or the heuristics it is ignored.
+"""
+import argparse
+import hashlib
+import os
+import time
+
+from . import ai, cache, engine
+
+DEFAULT_WARMUP_PATH = os.environ.get(
+    "MAHJONG16TW_CACHE_WARMUP", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_warmup.bin")
+)
+
+
+def get_code_version() -> str:
+    """
+    :return: hash of the source of engine.py and ai.py, whose results are cached
+    """
+    digest = hashlib.sha256()
+    for module in (engine, ai):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def save(path: str | None = None, limit: int | None = None) -> int:
+    """
+    :param path: DEFAULT_WARMUP_PATH by default
+    :param limit: max entries of each cache, the most recently used ones
+    :return: number of entries saved
+    """
+    return cache.save_caches(path or DEFAULT_WARMUP_PATH, get_code_version(), limit=limit)
+
+
+def load(path: str | None = None) -> int:
+    """
+    :param path: DEFAULT_WARMUP_PATH by default
+    :return: number of entries loaded, 0 if there is no file or it is of another version
+    """
+    try:
+        return cache.load_caches(path or DEFAULT_WARMUP_PATH, get_code_version())
+    except (OSError, ValueError):
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="play games and save the hot cache entries for load()")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=612116)
+    parser.add_argument("--limit", type=int, default=None, help="max entries of each cache")
+    parser.add_argument("--output", default=DEFAULT_WARMUP_PATH)
+    args = parser.parse_args()
+
+    from . import simulate  # which imports this module
+    t0 = time.perf_counter()
+    simulate.run_games(args.seed, args.games)
+    n = save(args.output, args.limit)
+    print(f"{args.output}: {n} entries, {os.path.getsize(args.output)} bytes, {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()